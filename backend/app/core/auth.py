@@ -1,3 +1,5 @@
+import secrets
+
 from fastapi import HTTPException, Security, status
 from fastapi.security.api_key import APIKeyHeader
 
@@ -9,6 +11,10 @@ api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
 
 VALID_API_KEY = settings.x_api_key
 
+# Admin-only routes (profiling) use a separate key, settings.admin_api_key
+ADMIN_KEY_NAME = "X-Admin-Key"
+admin_key_header = APIKeyHeader(name=ADMIN_KEY_NAME, auto_error=False)
+
 
 async def get_api_key(api_key: str = Security(api_key_header)):
     if api_key == VALID_API_KEY:
@@ -18,3 +24,17 @@ async def get_api_key(api_key: str = Security(api_key_header)):
         detail="Invalid or missing API Key",
         headers={"WWW-Authenticate": "API Key"},
     )
+
+
+async def get_admin_key(admin_key: str = Security(admin_key_header)):
+    if (
+        settings.admin_api_key
+        and admin_key
+        and secrets.compare_digest(admin_key.encode(), settings.admin_api_key.encode())
+    ):
+        return admin_key
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Invalid or missing admin key",
+        headers={"WWW-Authenticate": "API Key"},
+    )
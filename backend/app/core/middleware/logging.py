@@ -1,13 +1,25 @@
 import json
 import os
+import queue
+import random
+import threading
 import time
-import uuid
+from urllib.parse import parse_qs
 
 import structlog
-from fastapi import Request, Response
 from loguru import logger
+from opentelemetry import metrics
 from opentelemetry.trace import get_current_span
-from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core import request_metrics
+from app.core.settings import settings
+
+meter = metrics.get_meter(__name__)
+request_logs_dropped_total = meter.create_counter(
+    name="request_logs_dropped_total",
+    description="Request log records not written, by reason (queue_full or sampled)",
+)
 
 
 def setup_structlog():
@@ -25,58 +37,156 @@ def setup_structlog():
     )
 
 
-class RequestIdUserIdMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        # Generate or extract request_id
-        request_id = request.headers.get("X-Request-Id") or os.urandom(8).hex()
-        # Extract user_id if present (could be from auth or header)
-        user_id = request.headers.get("X-User-Id", "anonymous")
-        # Bind to structlog context for this request
-        structlog.contextvars.bind_contextvars(request_id=request_id, user_id=user_id)
-        response = await call_next(request)
-        # Unbind after request
-        structlog.contextvars.clear_contextvars()
-        return response
-
-
-async def log_requests(request: Request, call_next):
-    request_id = str(uuid.uuid4())
-    start_time = time.time()
-    # Try to extract user_id from headers or query params (if present)
-    user_id = request.headers.get("X-User-ID") or request.query_params.get("user_id")
-    # Try to extract top_k, tokens_in, tokens_out, retrieved_doc_ids from request body (if present)
-    try:
-        body = await request.json()
-    except Exception:
-        body = {}
-    top_k = body.get("top_k")
-    tokens_in = body.get("tokens_in")
-    tokens_out = body.get("tokens_out")
-    retrieved_doc_ids = body.get("retrieved_doc_ids")
-    # Route name (endpoint function name)
-    route_name = None
-    if hasattr(request, "scope") and "endpoint" in request.scope:
-        route_name = getattr(request.scope["endpoint"], "__name__", None)
-    response: Response = await call_next(request)
-    duration_ms = int((time.time() - start_time) * 1000)
-    log_data = {
-        "req_id": request_id,
-        "route": route_name or request.url.path,
-        "method": request.method,
-        "user_id": user_id,
-        "latency_ms": duration_ms,
-        "status": response.status_code,
-        "client_host": request.client.host if request.client else None,
-        "tokens_in": tokens_in,
-        "tokens_out": tokens_out,
-        "top_k": top_k,
-        "retrieved_doc_ids": retrieved_doc_ids,
-        "trace_id": (
-            format(get_current_span().get_span_context().trace_id, "032x")
-            if get_current_span()
-            else None
-        ),
-    }
-    logger.info(json.dumps(log_data))
-    response.headers["X-Request-ID"] = request_id
-    return response
+class RequestLogWriter:
+    """
+    Writes request log records from a background thread, so JSON encoding and sink I/O stay
+    off the event loop. The queue is bounded: when the writer falls behind, new records are
+    dropped and counted instead of delaying requests or growing memory.
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.queue: queue.Queue[dict | None] = queue.Queue(maxsize)
+        self.dropped = 0
+        self._thread: threading.Thread | None = None
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=self._run, name="request-log-writer", daemon=True
+            )
+            self._thread.start()
+
+    def close(self, timeout: float = 5.0) -> None:
+        """Write out what is queued and stop the thread."""
+        if self._thread is None:
+            return
+        try:
+            self.queue.put(None, timeout=timeout)
+        except queue.Full:
+            pass
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, record: dict) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+            request_logs_dropped_total.add(1, {"reason": "queue_full"})
+
+    def _run(self) -> None:
+        while (record := self.queue.get()) is not None:
+            try:
+                logger.info(json.dumps(record))
+            except Exception as e:  # a bad record must not kill the writer
+                logger.warning(f"Request log write failed: {e}")
+
+
+request_log_writer = RequestLogWriter(settings.request_log_queue_size)
+
+
+class RequestLoggingMiddleware:
+    """
+    Pure-ASGI access log. Binds request_id and user_id to the structlog context and opens the
+    request's RequestMetrics. It echoes X-Request-ID and adds Server-Timing to the response.
+    It queues one record per request, with the stage timings, for RequestLogWriter, and puts
+    the same values on the server span.
+    Request bodies are never read, so uploads stream straight through to the route.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        writer: RequestLogWriter | None = None,
+        sample_rates: dict[str, float] | None = None,
+    ):
+        self.app = app
+        self.writer = writer or request_log_writer
+        if sample_rates is None:
+            sample_rates = settings.request_log_sample_rates_map
+        # Longest prefix first, so "/documents/search" takes precedence over "/documents"
+        self.sample_rates = sorted(sample_rates.items(), key=lambda item: -len(item[0]))
+
+    def _sampled(self, path: str) -> bool:
+        for prefix, rate in self.sample_rates:
+            if path.startswith(prefix):
+                return rate >= 1 or random.random() < rate
+        return True
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_id = user_id = None
+        for name, value in scope["headers"]:
+            if name == b"x-request-id":
+                request_id = value.decode("latin-1")
+            elif name == b"x-user-id":
+                user_id = value.decode("latin-1")
+        query_string = scope.get("query_string", b"")
+        if user_id is None and b"user_id=" in query_string:
+            user_id = parse_qs(query_string.decode("latin-1")).get("user_id", [None])[0]
+        request_id = request_id or os.urandom(8).hex()
+        status = 500  # if the app raises before responding, the error handler answers 500
+
+        with request_metrics.bind() as stats:
+
+            async def send_with_headers(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-request-id", request_id.encode("latin-1")))
+                    # Stages finished before the response started (all of them, unless streaming)
+                    headers.append((b"server-timing", stats.server_timing().encode("latin-1")))
+                    message["headers"] = headers
+                await send(message)
+
+            tokens = structlog.contextvars.bind_contextvars(
+                request_id=request_id, user_id=user_id or "anonymous"
+            )
+            try:
+                await self.app(scope, receive, send_with_headers)
+            finally:
+                structlog.contextvars.reset_contextvars(**tokens)
+                self._finish(scope, stats, request_id, user_id, status)
+
+    def _finish(
+        self,
+        scope: Scope,
+        stats: request_metrics.RequestMetrics,
+        request_id: str,
+        user_id: str | None,
+        status: int,
+    ) -> None:
+        latency_ms = round((time.perf_counter() - stats.start_time) * 1000, 2)
+        timings_ms = stats.timings_ms()
+        span = get_current_span()
+        if span.is_recording():
+            for name, ms in timings_ms.items():
+                span.set_attribute(f"request.stage.{name}.ms", ms)
+            for name, value in stats.values.items():
+                if value is not None:
+                    span.set_attribute(f"request.{name}", value)
+        if status < 500 and not self._sampled(scope["path"]):
+            request_logs_dropped_total.add(1, {"reason": "sampled"})
+            return
+        span_context = span.get_span_context()
+        endpoint = scope.get("endpoint")  # set by the router once a route matched
+        client = scope.get("client")
+        self.writer.submit(
+            {
+                "req_id": request_id,
+                "route": getattr(endpoint, "__name__", None) or scope["path"],
+                "method": scope["method"],
+                "user_id": user_id,
+                "latency_ms": latency_ms,
+                "status": status,
+                "client_host": client[0] if client else None,
+                "trace_id": (
+                    format(span_context.trace_id, "032x") if span_context.is_valid else None
+                ),
+                "stages_ms": timings_ms,
+                **stats.values,
+            }
+        )
@@ -0,0 +1,284 @@
+"""
+On-demand CPU and memory profiling for a live worker, behind the admin key.
+
+* Per request: send `X-Profile: speedscope` (or `html`, `text`) with `X-Admin-Key` and the
+  request runs under pyinstrument. The response is the profile instead of the normal body,
+  and the route's own status is in X-Profiled-Status. Load speedscope output into
+  https://www.speedscope.app.
+* Worker-wide: StackSampler samples every thread's stack with sys._current_frames() for a
+  time-boxed session and returns collapsed stacks (flamegraph.pl / speedscope format).
+* Memory: MemoryProfiler starts tracemalloc, keeps a baseline snapshot and reports the top-N
+  allocation growth since then.
+
+Nothing here is installed unless PROFILING_ENABLED is set (see setup_profiling). Sessions
+and snapshots are per process, so with several uvicorn workers each worker is profiled on
+its own; responses carry the worker pid.
+"""
+
+import json
+import os
+import resource
+import secrets
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from types import FrameType
+from typing import Any
+
+from fastapi import FastAPI
+from loguru import logger
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.settings import settings
+
+_RENDERERS = {"1", "true", "speedscope", "html", "text"}
+
+
+class RequestProfilerMiddleware:
+    """Profiles requests that carry X-Profile and a valid X-Admin-Key; others pass straight on."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        mode = admin_key = None
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                mode = value.decode("latin-1").lower()
+            elif name == b"x-admin-key":
+                admin_key = value.decode("latin-1")
+        if mode is None:
+            await self.app(scope, receive, send)
+            return
+        if not admin_key or not secrets.compare_digest(
+            admin_key.encode(), settings.admin_api_key.encode()
+        ):
+            await _send_json(send, 401, {"detail": "X-Profile requires a valid X-Admin-Key"})
+            return
+        if mode not in _RENDERERS:
+            await _send_json(
+                send, 400, {"detail": f"X-Profile must be one of {sorted(_RENDERERS)}"}
+            )
+            return
+        try:
+            from pyinstrument import Profiler
+            from pyinstrument.renderers import SpeedscopeRenderer
+        except ImportError:
+            await _send_json(send, 501, {"detail": "pyinstrument is not installed"})
+            return
+
+        status = 500
+
+        async def discard(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = Profiler(
+            interval=settings.profiling_request_interval_ms / 1000, async_mode="enabled"
+        )
+        profiler.start()
+        try:
+            await self.app(scope, receive, discard)
+        finally:
+            profiler.stop()
+        if mode == "html":
+            body, content_type = profiler.output_html(), "text/html; charset=utf-8"
+        elif mode == "text":
+            body, content_type = profiler.output_text(), "text/plain; charset=utf-8"
+        else:
+            body, content_type = profiler.output(SpeedscopeRenderer()), "application/json"
+        await _send(
+            send,
+            200,
+            body.encode(),
+            [
+                (b"content-type", content_type.encode()),
+                (b"x-profiled-status", str(status).encode()),
+                (b"x-worker-pid", str(os.getpid()).encode()),
+            ],
+        )
+
+
+async def _send(send: Send, status: int, body: bytes, headers: list[tuple[bytes, bytes]]) -> None:
+    headers = [*headers, (b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _send_json(send: Send, status: int, payload: dict) -> None:
+    await _send(
+        send, status, json.dumps(payload).encode(), [(b"content-type", b"application/json")]
+    )
+
+
+class StackSampler:
+    """
+    Worker-wide sampling profiler. A daemon thread snapshots every other thread's stack each
+    interval and counts identical stacks, rooted at the thread name. It stops by itself when
+    the session's duration runs out.
+    """
+
+    def __init__(self) -> None:
+        self._thread: threading.Thread | None = None
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._labels: dict[Any, str] = {}  # code object -> frame label
+        self._prefixes: list[str] = []  # import roots stripped from file names, longest first
+        self.counts: Counter[str] = Counter()
+        self.samples = 0
+        self.started_at: float | None = None
+        self.duration_s = 0.0
+        self.interval_s = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration_s: float, interval_s: float) -> None:
+        if self.running:
+            raise RuntimeError("A sampling session is already running")
+        self.counts = Counter()
+        self.samples = 0
+        self.started_at = time.time()
+        self.duration_s = duration_s
+        self.interval_s = interval_s
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "running": self.running,
+            "pid": os.getpid(),
+            "started_at": self.started_at,
+            "duration_s": self.duration_s,
+            "interval_ms": self.interval_s * 1000,
+            "samples": self.samples,
+            "stacks": len(self.counts),
+        }
+
+    def collapsed(self) -> str:
+        """One `root;caller;...;leaf count` line per distinct stack, most frequent first."""
+        with self._lock:
+            lines = [f"{stack} {count}" for stack, count in self.counts.most_common()]
+        return "\n".join(lines) + "\n" if lines else ""
+
+    def _label(self, code: Any) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            path = code.co_filename
+            for prefix in self._prefixes:
+                if path.startswith(prefix):
+                    path = path[len(prefix) :].lstrip(os.sep)
+                    break
+            label = f"{code.co_name} ({path}:{code.co_firstlineno})".replace(";", ",")
+            self._labels[code] = label
+        return label
+
+    def _run(self) -> None:
+        own = threading.get_ident()
+        roots = {p for p in sys.path if os.path.isabs(p)} | {os.getcwd()}
+        self._prefixes = sorted(roots, key=len, reverse=True)
+        deadline = time.monotonic() + self.duration_s
+        while not self._stop.wait(self.interval_s) and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            stacks: list[str] = []
+            for ident, top in sys._current_frames().items():
+                if ident == own:
+                    continue
+                labels = []
+                frame: FrameType | None = top
+                while frame is not None:
+                    labels.append(self._label(frame.f_code))
+                    frame = frame.f_back
+                labels.append(names.get(ident, f"thread-{ident}"))
+                stacks.append(";".join(reversed(labels)))
+            with self._lock:
+                self.counts.update(stacks)
+                self.samples += 1
+
+
+class MemoryProfiler:
+    """tracemalloc session with a baseline snapshot to diff later snapshots against."""
+
+    def __init__(self) -> None:
+        self.baseline: tracemalloc.Snapshot | None = None
+        self.frames = 1
+
+    @property
+    def running(self) -> bool:
+        return self.baseline is not None and tracemalloc.is_tracing()
+
+    def start(self, frames: int = 1) -> None:
+        if self.running:
+            raise RuntimeError("tracemalloc is already tracing")
+        self.frames = frames
+        tracemalloc.start(frames)
+        self.baseline = self._snapshot()
+
+    def stop(self) -> None:
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.baseline = None
+
+    @staticmethod
+    def _snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces(
+            (
+                tracemalloc.Filter(False, tracemalloc.__file__),
+                tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+                tracemalloc.Filter(False, "<unknown>"),
+            )
+        )
+
+    def diff(self, top: int = 20, key_type: str = "lineno", reset: bool = False) -> dict:
+        """Top allocation growth since the baseline; reset moves the baseline to now."""
+        if self.baseline is None:
+            raise RuntimeError("tracemalloc is not running")
+        snapshot = self._snapshot()
+        stats = snapshot.compare_to(self.baseline, key_type)[:top]
+        current, peak = tracemalloc.get_traced_memory()
+        if reset:
+            self.baseline = snapshot
+        top_stats = []
+        for stat in stats:
+            entry = {
+                "location": str(stat.traceback),
+                "size_diff_kb": round(stat.size_diff / 1024, 1),
+                "count_diff": stat.count_diff,
+                "size_kb": round(stat.size / 1024, 1),
+                "count": stat.count,
+            }
+            if key_type == "traceback":
+                entry["traceback"] = stat.traceback.format()
+            top_stats.append(entry)
+        return {
+            "pid": os.getpid(),
+            "traced_mb": round(current / 2**20, 2),
+            "traced_peak_mb": round(peak / 2**20, 2),
+            # ru_maxrss is in KiB on Linux
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "top": top_stats,
+        }
+
+
+stack_sampler = StackSampler()
+memory_profiler = MemoryProfiler()
+
+
+def setup_profiling(app: FastAPI) -> None:
+    if not settings.admin_api_key:
+        raise ValueError("ADMIN_API_KEY must be set when PROFILING_ENABLED is true")
+    app.add_middleware(RequestProfilerMiddleware)
+    logger.info("Profiling enabled: X-Profile header and /admin/profiling routes (admin key)")
@@ -0,0 +1,91 @@
+"""
+Per-request stage timings and counters.
+
+RequestLoggingMiddleware opens a RequestMetrics for every HTTP request. Services add to it
+through stage() and record() without having to pass it around, since the context variable
+follows the request into to_thread calls and streaming-response tasks. At the end of the
+request the collected values go into the request log line, the Server-Timing header and the
+server span. Outside a request (bulk loads, benchmarks) both helpers do nothing.
+"""
+
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+
+class RequestMetrics:
+    __slots__ = ("start_time", "timings", "values")
+
+    def __init__(self) -> None:
+        self.start_time = time.perf_counter()
+        self.timings: dict[str, float] = {}  # stage -> seconds, summed over repeated calls
+        self.values: dict[str, Any] = {}
+
+    def add_time(self, name: str, seconds: float) -> None:
+        self.timings[name] = self.timings.get(name, 0.0) + seconds
+
+    def record(self, name: str, value: Any) -> None:
+        """Numbers add up across calls (e.g. tokens of several LLM calls); the rest overwrite."""
+        current = self.values.get(name)
+        if isinstance(value, (int, float)) and not isinstance(value, bool) and current is not None:
+            self.values[name] = current + value
+        else:
+            self.values[name] = value
+
+    def timings_ms(self) -> dict[str, float]:
+        return {name: round(seconds * 1000, 2) for name, seconds in self.timings.items()}
+
+    def server_timing(self) -> str:
+        """Server-Timing header value: each stage so far, plus total time up to now."""
+        total = time.perf_counter() - self.start_time
+        entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in self.timings.items()]
+        entries.append(f"total;dur={total * 1000:.1f}")
+        return ", ".join(entries)
+
+
+_current: ContextVar[RequestMetrics | None] = ContextVar("request_metrics", default=None)
+
+
+def current() -> RequestMetrics | None:
+    return _current.get()
+
+
+@contextmanager
+def bind() -> Iterator[RequestMetrics]:
+    """Collect metrics for the enclosed request."""
+    metrics = RequestMetrics()
+    token = _current.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Add the enclosed block's wall time to the current request's stage."""
+    metrics = _current.get()
+    if metrics is None:
+        yield
+        return
+    start_time = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_time(name, time.perf_counter() - start_time)
+
+
+def add_time(name: str, seconds: float) -> None:
+    """For durations measured anyway, e.g. pool waits that are also recorded as a histogram."""
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.add_time(name, seconds)
+
+
+def record(**values: Any) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        for name, value in values.items():
+            metrics.record(name, value)
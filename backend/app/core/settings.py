@@ -7,6 +7,8 @@ class Settings(BaseSettings):
     app_name: str = "AI Investment Agent API"
     debug: bool = False
     openai_api_key: str = ""
+    # OpenAI-compatible endpoint override, e.g. the load-test mock (http://localhost:8100/v1)
+    openai_base_url: str | None = None
     model: str = "gpt-4o-mini"
     allowed_origins: str = "http://localhost:3000,http://127.0.0.1:3000"
 
@@ -20,6 +22,94 @@ class Settings(BaseSettings):
     pgvector_host: str = "localhost"
     pgvector_port: str = "5432"
 
+    # Async Postgres connection pool shared by the raw-document and vector stores
+    pg_pool_min_size: int = 2
+    pg_pool_max_size: int = 10
+    pg_pool_timeout_s: float = 30.0  # max wait for a free connection before erroring
+
+    # ANN index on documents.embedding: "hnsw", "ivfflat" or "none" (exact scan)
+    vector_index_type: str = "hnsw"
+    hnsw_m: int = 16
+    hnsw_ef_construction: int = 64
+    ivfflat_lists: int = 100  # rule of thumb: rows / 1000 up to 1M rows, sqrt(rows) above
+    # Search a compact expression index ("halfvec": 2x smaller, "binary": 32x smaller) instead
+    # of the float32 one, re-ranking top_k * quantization_overfetch_factor candidates exactly
+    vector_quantization: str = "none"
+    quantization_overfetch_factor: int = 4
+    # Vector reads: "postgres" (pgvector) or "local" (memory-mapped replica of documents,
+    # synced every local_index_sync_interval_s; lexical and filtered searches stay on Postgres)
+    vector_store_backend: str = "postgres"
+    local_index_path: str = "data/vector_index"
+    local_index_sync_interval_s: float = 5.0
+    local_index_hnsw: bool = False  # also keep an hnswlib graph (needs the hnswlib package)
+    local_index_compact_ratio: float = 0.25  # rewrite the files once this share is deleted
+
+    # Hybrid (vector + full-text) retrieval: rows fetched per leg, and the RRF constant
+    hybrid_candidates: int = 50
+    hybrid_rrf_k: int = 60
+    # Metadata filters: keys holding ISO dates that get a btree expression index for ranges
+    metadata_date_fields: str = "filed_at,published_at"
+    # Without pgvector >= 0.8 iterative scans, filtered HNSW searches raise ef_search to
+    # top_k * this so enough candidates survive the filter
+    filter_overfetch_factor: int = 10
+
+    # Ingestion: chunks per encoder forward pass for POST /documents
+    embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2"
+    embedding_batch_size: int = 64
+    # Encoder runtime: "torch" (SentenceTransformer) or "onnx" (ONNX Runtime, CPU). The onnx
+    # backend loads embedding_onnx_file and tokenizer.json from the embedding_onnx_path export
+    embedding_backend: str = "torch"
+    embedding_onnx_path: str | None = None
+    embedding_onnx_file: str = "model_quantized.onnx"
+    embedding_max_seq_length: int = 256  # onnx tokenizer truncation; matches all-MiniLM-L6-v2
+    embedding_intra_op_threads: int = 0  # 0 = runtime default
+    # Load and warm up the model in the background after startup (/ready reports progress);
+    # false blocks startup until the model is ready
+    embedding_background_load: bool = True
+    # Persistent chunk embedding cache (keyed by model + chunk text) to skip re-encoding
+    embedding_cache_enabled: bool = True
+    embedding_cache_max_entries: int = 2_000_000
+    # In-process LRU cache for query embeddings (/documents/search, /ai/query)
+    query_embedding_cache_size: int = 4096
+    query_embedding_cache_ttl_s: float = 3600.0
+    # Micro-batching of concurrent query embeddings (one forward pass per batch)
+    query_batch_max_size: int = 32
+    query_batch_max_wait_ms: float = 2.0
+
+    # Semantic answer cache for /ai/query (first turns only)
+    answer_cache_enabled: bool = True
+    answer_cache_similarity_threshold: float = 0.95  # cosine similarity between questions
+    answer_cache_ttl_s: float = 900.0
+    answer_cache_max_entries: int = 10_000
+
+    # Conversation memory for /ai/query: "memory" (per-worker) or "postgres" (shared)
+    memory_backend: str = "memory"
+    memory_max_conversations: int = 10_000  # in-process backend only
+    memory_idle_ttl_s: float = 86_400.0
+    memory_max_messages: int = 50  # per conversation, oldest dropped first
+
+    # /ai/query prompt budget (LLM tokens). Context gets the remainder, plus whatever the
+    # history and question sections leave unused.
+    prompt_token_budget: int = 3000
+    prompt_system_tokens: int = 200
+    prompt_history_tokens: int = 800
+    prompt_question_tokens: int = 300
+
+    # Request access log: records queued for a background writer thread (dropped when full),
+    # and per-path-prefix sample rates for noisy routes, e.g. "/health=0,/documents/search=0.1".
+    # Responses with status >= 500 are always logged.
+    request_log_queue_size: int = 10_000
+    request_log_sample_rates: str = ""
+
+    # Admin profiling surface: X-Profile per-request profiles, worker-wide stack sampling and
+    # tracemalloc diffs under /admin/profiling. Nothing is installed unless enabled; every
+    # call needs ADMIN_API_KEY in X-Admin-Key.
+    profiling_enabled: bool = False
+    admin_api_key: str = ""
+    profiling_request_interval_ms: float = 1.0  # pyinstrument interval for X-Profile requests
+    profiling_sample_interval_ms: float = 10.0  # default worker-wide sampling interval
+    profiling_max_duration_s: float = 120.0  # sampling sessions stop by themselves after this
+
     # OpenTelemetry / Tracing configuration (override via env vars)
     otel_service_name: str = "ai-investment-agent-backend"
     otlp_http_endpoint: str = "http://localhost:4318/v1/traces"  # For OTLP/HTTP
@@ -37,6 +127,19 @@ class Settings(BaseSettings):
     def allowed_origins_list(self) -> list[str]:
         return [o.strip() for o in self.allowed_origins.split(",") if o.strip()]
 
+    @property
+    def metadata_date_fields_list(self) -> list[str]:
+        return [f.strip() for f in self.metadata_date_fields.split(",") if f.strip()]
+
+    @property
+    def request_log_sample_rates_map(self) -> dict[str, float]:
+        rates = {}
+        for item in self.request_log_sample_rates.split(","):
+            if "=" in item:
+                prefix, rate = item.split("=", 1)
+                rates[prefix.strip()] = float(rate)
+        return rates
+
     def ensure_otel_env(self):
         # Set correct OTEL endpoint for selected protocol
         if self.otlp_protocol == "grpc":
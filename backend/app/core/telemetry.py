@@ -20,13 +20,12 @@ from opentelemetry.sdk.trace.export import BatchSpanProcessor
 prometheus_reader = None
 from loguru import logger
 
-from app.core.middleware.logging import RequestIdUserIdMiddleware, setup_structlog
+from app.core.middleware.logging import setup_structlog
 from app.core.settings import settings
 
 
 def setup_otel(app):
     setup_structlog()
-    app.add_middleware(RequestIdUserIdMiddleware)
     # Print all OTEL-related environment variables for debugging
     print("[DEBUG] ENVIRONMENT VARIABLES:")
     for k, v in os.environ.items():
@@ -1,4 +1,8 @@
-from pydantic import BaseModel
+import re
+from datetime import date, datetime
+from typing import Annotated
+
+from pydantic import AfterValidator, BaseModel, model_validator
 
 
 class Document(BaseModel):
@@ -6,3 +10,46 @@ class Document(BaseModel):
     title: str
     text: str
     metadata: dict | None = None
+
+
+class DocumentSummary(BaseModel):
+    """Row of GET /documents: everything but the (potentially huge) text unless requested."""
+
+    id: str
+    title: str
+    metadata: dict | None = None
+    created_at: datetime | None = None
+    text: str | None = None
+
+
+class DateRange(BaseModel):
+    """Bounds on an ISO-8601 date stored in chunk metadata (e.g. "filed_at": "2025-03-02")."""
+
+    gte: date | None = None
+    gt: date | None = None
+    lte: date | None = None
+    lt: date | None = None
+
+    @model_validator(mode="after")
+    def _has_bound(self) -> "DateRange":
+        if self.gte is None and self.gt is None and self.lte is None and self.lt is None:
+            raise ValueError("date range needs at least one of gte, gt, lte, lt")
+        return self
+
+
+FilterScalar = bool | int | float | str
+FILTER_KEY_PATTERN = re.compile(r"[A-Za-z0-9_.-]{1,64}")
+
+
+def _check_filter_keys(filters: dict) -> dict:
+    # Keys are compiled into SQL (and must match expression indexes), so keep them plain
+    for key in filters:
+        if not FILTER_KEY_PATTERN.fullmatch(key):
+            raise ValueError(f"invalid metadata filter key: {key!r}")
+    return filters
+
+
+# metadata key -> value (equality), list of values (IN) or DateRange
+MetadataFilters = Annotated[
+    dict[str, FilterScalar | list[FilterScalar] | DateRange], AfterValidator(_check_filter_keys)
+]
@@ -0,0 +1,84 @@
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from fastapi.responses import PlainTextResponse
+from pydantic import BaseModel, Field
+
+from app.core.auth import get_admin_key
+from app.core.profiling import memory_profiler, stack_sampler
+from app.core.settings import settings
+
+# Only included when settings.profiling_enabled (see main.py)
+router = APIRouter(prefix="/admin/profiling", tags=["admin"], dependencies=[Depends(get_admin_key)])
+
+
+class SamplerRequest(BaseModel):
+    duration_s: float = Field(default=30.0, gt=0)  # capped at settings.profiling_max_duration_s
+    interval_ms: float | None = Field(default=None, ge=1, le=1000)
+
+
+class MemoryRequest(BaseModel):
+    frames: int = Field(default=1, ge=1, le=50)  # stack depth recorded per allocation
+
+
+@router.get("/sampler")
+def sampler_status() -> dict:
+    return stack_sampler.status()
+
+
+@router.post("/sampler/start", status_code=status.HTTP_202_ACCEPTED)
+def sampler_start(request: SamplerRequest) -> dict:
+    """Start a worker-wide sampling session; it stops by itself after duration_s."""
+    interval_ms = request.interval_ms or settings.profiling_sample_interval_ms
+    try:
+        stack_sampler.start(
+            min(request.duration_s, settings.profiling_max_duration_s), interval_ms / 1000
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+    return stack_sampler.status()
+
+
+@router.post("/sampler/stop", response_class=PlainTextResponse)
+def sampler_stop() -> str:
+    """Stop the session early and return its collapsed stacks."""
+    stack_sampler.stop()
+    return stack_sampler.collapsed()
+
+
+@router.get("/sampler/stacks", response_class=PlainTextResponse)
+def sampler_stacks() -> str:
+    """
+    Collapsed stacks of the current or last session (`root;...;leaf count` per line), for
+    flamegraph.pl or speedscope.
+    """
+    return stack_sampler.collapsed()
+
+
+@router.post("/memory/start")
+def memory_start(request: MemoryRequest) -> dict:
+    """Start tracemalloc and take the baseline snapshot."""
+    try:
+        memory_profiler.start(request.frames)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+    return {"tracing": True, "frames": request.frames}
+
+
+@router.get("/memory")
+def memory_diff(
+    top: int = Query(default=20, ge=1, le=500),
+    key_type: Literal["lineno", "filename", "traceback"] = "lineno",
+    reset: bool = Query(default=False, description="Use this snapshot as the new baseline"),
+) -> dict:
+    """Top-N allocation growth since the baseline snapshot."""
+    try:
+        return memory_profiler.diff(top=top, key_type=key_type, reset=reset)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e)) from e
+
+
+@router.post("/memory/stop")
+def memory_stop() -> dict:
+    memory_profiler.stop()
+    return {"tracing": False}
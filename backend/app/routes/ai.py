@@ -1,14 +1,23 @@
 import asyncio
+import json
 import time
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
 
+import numpy as np
 from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
 from loguru import logger
 from opentelemetry import metrics, trace
+from opentelemetry.trace import Span, Status, StatusCode
 
+from app.core import request_metrics
 from app.core.auth import get_api_key
-from app.services.ai_service import AIService
-from app.services.memory import memory  # in-memory conversation store
-from app.services.rag_pipeline import RAGPipeline
+from app.models import MetadataFilters
+from app.services.answer_cache import answer_cache
+from app.services.container import ServiceContainer, get_services
+from app.services.memory import memory  # conversation store (settings.memory_backend)
+from app.services.vectordb import SearchMode
 
 # Use global meter provider set in main.py
 meter = metrics.get_meter(__name__)
@@ -18,88 +27,245 @@ query_time_histogram = meter.create_histogram(
 
 
 router = APIRouter(prefix="/ai", tags=["ai"])
-ai_service = AIService()
-rag_pipeline = RAGPipeline()
 
 
 # --- /query endpoint ---
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
 class QueryRequest(BaseModel):
     question: str
     conversation_id: str | None = None
     max_history: int | None = 6  # how many previous turns to include
+    ef_search: int | None = Field(default=None, ge=1, le=1000)  # HNSW recall knob
+    probes: int | None = Field(default=None, ge=1)  # IVFFlat recall knob
+    mode: SearchMode = "vector"  # retrieval: vector, lexical (full-text) or hybrid (RRF)
+    filters: MetadataFilters | None = None  # restrict retrieval by chunk metadata
+
+
+@dataclass
+class PreparedQuery:
+    query_embedding: np.ndarray
+    chunks: list[str]
+    sources: list[str]
+    retrieved: list[tuple[str, int]]  # (doc_id, chunk_idx) of each retrieved chunk
+    llm_prompt: str
+    cacheable: bool  # first turn: the answer depends only on question + retrieved context
+
+
+async def _prepare_query(
+    services: ServiceContainer, payload: QueryRequest, conversation_id: str, span: Span
+) -> PreparedQuery:
+    """Embed the question, retrieve context and build the LLM prompt (steps 1-3)."""
+    tracer = trace.get_tracer("ai.query")
+    span.set_attribute("question.length", len(payload.question))
+    span.set_attribute("conversation.id", conversation_id)
+    # 1. Embed the question
+    with tracer.start_as_current_span("embedding.query"):
+        query_embedding = await services.rag_pipeline.embedder.aembed_query(payload.question)
+    # 2. Retrieve top-k relevant chunks
+    top_k = 3
+    with tracer.start_as_current_span("retrieval.vector_search") as retrieval_span:
+        results = await services.rag_pipeline.vector_store.search(
+            payload.mode,
+            payload.question,
+            query_embedding,
+            top_k=top_k,
+            ef_search=payload.ef_search,
+            probes=payload.probes,
+            filters=payload.filters,
+        )
+        retrieval_span.set_attribute("retrieval.mode", payload.mode)
+        retrieval_span.set_attribute("retrieval.filtered", bool(payload.filters))
+        retrieval_span.set_attribute("retrieval.top_k", top_k)
+        retrieval_span.set_attribute("retrieval.result_count", len(results))
+    # 3. Construct LLM prompt with limited recent history, within the token budget
+    with request_metrics.stage("prompt"):
+        history_messages = []
+        if payload.max_history and payload.max_history > 0:
+            history_messages = await memory.last_n(conversation_id, payload.max_history)
+        # Exclude the current user question duplication (last message just appended).
+        # Tokenizing a large context is CPU-bound, so it runs off the event loop.
+        built = await asyncio.to_thread(
+            services.prompt_builder.build,
+            payload.question,
+            history_messages[:-1],
+            [(r.chunk, r.token_count) for r in results],
+        )
+    request_metrics.record(prompt_tokens=built.total_tokens)
+    # Only chunks that fit the budget were shown to the LLM, so only those count as sources
+    used = results[: built.chunks_used]
+    span.set_attribute("sources.count", len(used))
+    span.set_attribute("prompt.tokens", built.total_tokens)
+    for section, tokens in built.tokens.items():
+        span.set_attribute(f"prompt.tokens.{section}", tokens)
+    span.set_attribute("prompt.chunks_dropped", len(results) - len(used))
+    return PreparedQuery(
+        query_embedding=query_embedding,
+        chunks=[r.chunk for r in used],
+        sources=[r.doc_id for r in used],
+        retrieved=[(r.doc_id, r.chunk_idx) for r in used],
+        llm_prompt=built.prompt,
+        cacheable=built.history_used == 0,
+    )
 
 
 @router.post("/query")
-async def query_endpoint(payload: QueryRequest, api_key: str = Depends(get_api_key)):
+async def query_endpoint(
+    payload: QueryRequest,
+    api_key: str = Depends(get_api_key),
+    services: ServiceContainer = Depends(get_services),
+):
     """
     Accepts: { "question": "..." }
     Returns: { "answer": "...", "sources": [doc_id, ...], "chunks": [chunk, ...] }
     """
     logger.info(f"/query received: {payload.question}")
     # --- Conversation handling ---
-    conversation_id = payload.conversation_id or memory.create_conversation()
+    conversation_id = payload.conversation_id or await memory.create_conversation()
     # Append user question to memory early so retrieval can leverage sequence later if needed
-    memory.append(conversation_id, "user", payload.question)
+    await memory.append(conversation_id, "user", payload.question)
 
     tracer = trace.get_tracer("ai.query")
     start_time = time.time()
     with tracer.start_as_current_span("ai.query") as span:
-        span.set_attribute("question.length", len(payload.question))
-        span.set_attribute("conversation.id", conversation_id)
-        # 1. Embed the question
-        with tracer.start_as_current_span("embedding.query"):
-            query_embedding = rag_pipeline.embedder.embed_query(payload.question)
-        # 2. Retrieve top-k relevant chunks
-        top_k = 3
-        with tracer.start_as_current_span("retrieval.vector_search") as retrieval_span:
-            results = rag_pipeline.vectordb.query_similar(query_embedding, top_k=top_k)
-            retrieval_span.set_attribute("retrieval.top_k", top_k)
-            retrieval_span.set_attribute("retrieval.result_count", len(results))
-        # Each result: (doc_id, chunk_idx, chunk, distance, metadata)
-        chunks = [chunk for _, _, chunk, _, _ in results]
-        sources = [doc_id for doc_id, _, _, _, _ in results]
-        span.set_attribute("sources.count", len(sources))
-        # 3. Construct LLM prompt with limited recent history
-        history_messages = []
-        if payload.max_history and payload.max_history > 0:
-            history_messages = memory.last_n(conversation_id, payload.max_history)
-        # Exclude the current user question duplication (last message just appended)
-        # Format history as role-prefixed lines
-        history_block = "\n".join(
-            [
-                f"{m['role'].upper()}: {m['content']}"
-                for m in history_messages[:-1]  # all but newest user question
-            ]
-        )
-        context_text = "\n\n".join(chunks)
-        llm_prompt = (
-            (f"Conversation History:\n{history_block}\n\n" if history_block else "")
-            + f"Context:\n{context_text}\n\nUser Question:\n{payload.question}\n\nYou are an investment research assistant. Provide a clear, concise answer followed by any necessary reasoning."  # guideline
+        prepared = await _prepare_query(services, payload, conversation_id, span)
+        # 4. Reuse a cached answer for a near-identical question over the same retrieved chunks
+        cached_answer = (
+            answer_cache.lookup(prepared.query_embedding, prepared.retrieved)
+            if prepared.cacheable
+            else None
         )
-        # 4. Call LLM to get answer (timing handled in AIService, but wrap span for trace linkage)
-        with tracer.start_as_current_span("llm.call") as llm_span:
-            answer = await ai_service.query_llm(llm_prompt)
-            llm_span.set_attribute("llm.prompt.length", len(llm_prompt))
+        span.set_attribute("answer_cache.hit", cached_answer is not None)
+        if cached_answer is not None:
+            assistant_answer = cached_answer
+        else:
+            # Call LLM to get answer (timing handled in AIService, but wrap span for trace linkage)
+            with tracer.start_as_current_span("llm.call") as llm_span:
+                answer = await services.ai_service.query_llm(prepared.llm_prompt)
+                llm_span.set_attribute("llm.prompt.length", len(prepared.llm_prompt))
+            assistant_answer = answer if not hasattr(answer, "content") else answer.content
+            if prepared.cacheable:
+                answer_cache.store(
+                    payload.question, prepared.query_embedding, prepared.retrieved, assistant_answer
+                )
         # 5. Record query time
         duration = time.time() - start_time
         query_time_histogram.record(duration)
         span.set_attribute("query.duration.seconds", duration)
     # 6. Return structured response
     # Append assistant answer to memory
-    assistant_answer = answer if not hasattr(answer, "content") else answer.content
-    memory.append(conversation_id, "ai", assistant_answer)
+    await memory.append(conversation_id, "ai", assistant_answer)
     return {
         "answer": assistant_answer,
-        "sources": sources,
-        "chunks": chunks,
+        "sources": prepared.sources,
+        "chunks": prepared.chunks,
         "conversation_id": conversation_id,
-        "history_length": len(memory.get(conversation_id)),
+        "history_length": await memory.count(conversation_id),
+        "cached": cached_answer is not None,
     }
 
 
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/query/stream")
+async def query_stream_endpoint(
+    payload: QueryRequest,
+    api_key: str = Depends(get_api_key),
+    services: ServiceContainer = Depends(get_services),
+):
+    """
+    Streaming variant of /query as server-sent events:
+    `sources` (retrieved sources/chunks, sent before generation starts), then one `token`
+    event per content delta, then `done` with the full answer (or `error`).
+    """
+    logger.info(f"/query/stream received: {payload.question}")
+    conversation_id = payload.conversation_id or await memory.create_conversation()
+    await memory.append(conversation_id, "user", payload.question)
+
+    tracer = trace.get_tracer("ai.query")
+    start_time = time.time()
+    # The span outlives this handler: it is ended once the stream has been fully sent
+    span = tracer.start_span("ai.query.stream")
+    try:
+        with trace.use_span(span, end_on_exit=False):
+            prepared = await _prepare_query(services, payload, conversation_id, span)
+    except BaseException:
+        span.end()  # use_span recorded the error; no stream will end the span now
+        raise
+    span_context = trace.set_span_in_context(span)
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            yield _sse(
+                "sources",
+                {
+                    "sources": prepared.sources,
+                    "chunks": prepared.chunks,
+                    "conversation_id": conversation_id,
+                },
+            )
+            cached_answer = (
+                answer_cache.lookup(prepared.query_embedding, prepared.retrieved)
+                if prepared.cacheable
+                else None
+            )
+            span.set_attribute("answer_cache.hit", cached_answer is not None)
+            if cached_answer is not None:
+                assistant_answer = cached_answer
+                yield _sse("token", {"content": cached_answer})
+            else:
+                parts = []
+                with tracer.start_as_current_span("llm.call", context=span_context) as llm_span:
+                    llm_span.set_attribute("llm.prompt.length", len(prepared.llm_prompt))
+                    async for token in services.ai_service.stream_llm(prepared.llm_prompt):
+                        parts.append(token)
+                        yield _sse("token", {"content": token})
+                assistant_answer = "".join(parts)
+                if prepared.cacheable:
+                    answer_cache.store(
+                        payload.question,
+                        prepared.query_embedding,
+                        prepared.retrieved,
+                        assistant_answer,
+                    )
+            await memory.append(conversation_id, "ai", assistant_answer)
+            yield _sse(
+                "done",
+                {
+                    "answer": assistant_answer,
+                    "conversation_id": conversation_id,
+                    "history_length": await memory.count(conversation_id),
+                    "cached": cached_answer is not None,
+                },
+            )
+        except ValueError as e:
+            logger.error(f"/query/stream failed: {e}")
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            yield _sse("error", {"detail": str(e)})
+        except Exception as e:
+            # Headers are already sent, so the generic exception handler can't turn this into a
+            # 500: report it in-band and end the stream cleanly.
+            logger.exception(f"/query/stream failed: {e}")
+            span.record_exception(e)
+            span.set_status(Status(StatusCode.ERROR, str(e)))
+            yield _sse("error", {"detail": "Internal server error. Please try again later."})
+        finally:
+            duration = time.time() - start_time
+            query_time_histogram.record(duration, {"stream": True})
+            span.set_attribute("query.duration.seconds", duration)
+            span.end()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get("/response")
 async def get_ai_response(prompt: str, api_key: str = Depends(get_api_key)):
     await asyncio.sleep(0.1)  # simulate I/O
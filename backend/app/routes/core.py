@@ -1,8 +1,9 @@
 from datetime import UTC, datetime
 
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends, Response
 
 from app.core.settings import settings
+from app.services.container import ServiceContainer, get_services
 
 router = APIRouter(tags=["core"])
 
@@ -15,3 +16,15 @@ def root() -> dict:
 @router.get("/health")
 def health() -> dict:
     return {"status": "ok", "version": "0.1.0", "timestamp": datetime.now(UTC).isoformat()}
+
+
+@router.get("/ready")
+def ready(response: Response, services: ServiceContainer = Depends(get_services)) -> dict:
+    """
+    Readiness: 200 once the connection pool, schema and embedding model (loaded and warmed up)
+    are all ready, 503 before that. Includes per-component startup timings in seconds.
+    """
+    report = services.readiness()
+    if not report["ready"]:
+        response.status_code = 503
+    return report
@@ -10,15 +10,17 @@ embedding_failures_total = meter.create_counter(
     name="embedding_failures_total", description="Total number of embedding failures"
 )
 
-from typing import Any
+from typing import Any, Literal
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query
-from pydantic import BaseModel
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Response
+from pydantic import BaseModel, Field
 
-from app.core.auth import get_api_key
-from app.models import Document
-from app.services.rag_pipeline import RAGPipeline
-from app.services.storage import delete_document, get_document, list_documents, save_document
+from app.core.auth import get_admin_key, get_api_key
+from app.models import Document, DocumentSummary, MetadataFilters
+from app.services.answer_cache import answer_cache
+from app.services.container import ServiceContainer, get_services
+from app.services.storage import delete_document, get_document, list_documents
+from app.services.vectordb import Quantization, SearchMode
 
 
 class DocumentsRequest(BaseModel):
@@ -27,49 +29,94 @@ class DocumentsRequest(BaseModel):
 
 class DocumentsResponse(BaseModel):
     docs: list[Document]
+    chunks_indexed: int = 0
+    chunks_reused: int = 0  # unchanged chunks kept from the previous version (not re-embedded)
+    chunks_added: int = 0
+    chunks_removed: int = 0
+
+
+class IndexRequest(BaseModel):
+    index_type: Literal["hnsw", "ivfflat"] | None = None  # defaults to settings.vector_index_type
+    m: int | None = Field(default=None, ge=2, le=100)
+    ef_construction: int | None = Field(default=None, ge=4, le=1000)
+    lists: int | None = Field(default=None, ge=1, le=32768)
+    rebuild: bool = False  # drop and recreate (or reindex) even if an index exists
+    quantization: Quantization | None = None  # defaults to settings.vector_quantization
+
+
+class RecallRequest(BaseModel):
+    queries: list[str] = Field(min_length=1)
+    top_k: int = Field(default=10, ge=1, le=100)
+    ef_search: int | None = Field(default=None, ge=1, le=1000)
+    probes: int | None = Field(default=None, ge=1)
+    quantization: Quantization | None = None  # compact index to measure against float32
+    overfetch: int | None = Field(default=None, ge=1, le=100)
 
 
 router = APIRouter(prefix="/documents", tags=["documents"])
-rag_pipeline = RAGPipeline()
 
 
 @router.post("/", response_model=DocumentsResponse)
-def create_documents(request: DocumentsRequest, api_key: str = Depends(get_api_key)):
+async def create_documents(
+    request: DocumentsRequest,
+    api_key: str = Depends(get_api_key),
+    services: ServiceContainer = Depends(get_services),
+):
     """
-    Accepts an object with a 'docs' field (list of documents), saves and indexes each for retrieval.
-    Returns an object with the list of saved documents in 'docs'.
+    Accepts an object with a 'docs' field (list of documents), saves and indexes them for retrieval.
+    Re-uploaded documents are diffed against their stored chunks: only new chunks are embedded
+    and inserted, removed ones are deleted, and everything is applied in one transaction.
+    Returns the saved documents in 'docs' with reused/added/removed chunk counts.
     """
-    saved_docs = []
-    for doc in request.docs:
-        saved = save_document(doc)
-        rag_pipeline.index_document_for_retrieval(saved)
-        saved_docs.append(saved)
-    return DocumentsResponse(docs=saved_docs)
+    stats = await services.rag_pipeline.index_documents(request.docs)
+    answer_cache.invalidate_documents(doc.id for doc in request.docs if doc.id)
+    stats.pop("documents")
+    return DocumentsResponse(docs=request.docs, **stats)
 
 
 @router.get("/{doc_id}", response_model=Document)
-def read_document(doc_id: str, api_key: str = Depends(get_api_key)):
-    doc = get_document(doc_id)
+async def read_document(doc_id: str, api_key: str = Depends(get_api_key)):
+    doc = await get_document(doc_id)
     if not doc:
         raise HTTPException(status_code=404, detail="Document not found")
     return doc
 
 
-@router.get("/", response_model=list[Document])
-def list_docs(
-    title: str | None = Query(default=None, description="Optional title filter"),
-    limit: int = Query(default=50, le=200),
+@router.get("/", response_model=list[DocumentSummary], response_model_exclude_unset=True)
+async def list_docs(
+    response: Response,
+    title: str | None = Query(default=None, description="Optional title substring filter"),
+    limit: int = Query(default=50, ge=1, le=200),
+    cursor: str | None = Query(default=None, description="X-Next-Cursor from the previous page"),
+    include_text: bool = Query(default=False, description="Include each document's full text"),
     api_key: str = Depends(get_api_key),
 ):
-    return list_documents(title_filter=title, limit=limit)
+    """
+    List documents newest first. Pages are keyset-paginated: pass the previous response's
+    X-Next-Cursor header as `cursor`; the header is absent on the last page.
+    """
+    try:
+        docs, next_cursor = await list_documents(
+            title_filter=title, limit=limit, cursor=cursor, include_text=include_text
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e)) from e
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return docs
 
 
 @router.delete("/{doc_id}")
-def remove_document(doc_id: str, api_key: str = Depends(get_api_key)):
+async def remove_document(
+    doc_id: str,
+    api_key: str = Depends(get_api_key),
+    services: ServiceContainer = Depends(get_services),
+):
     # Delete raw document
-    deleted_doc = delete_document(doc_id)
+    deleted_doc = await delete_document(doc_id)
     # Delete embeddings/chunks
-    deleted_embeddings = rag_pipeline.vectordb.delete_embeddings(doc_id)
+    deleted_embeddings = await services.rag_pipeline.vectordb.delete_embeddings(doc_id)
+    answer_cache.invalidate_documents([doc_id])
     if not deleted_doc and deleted_embeddings == 0:
         raise HTTPException(status_code=404, detail="Document not found")
     return {
@@ -81,30 +128,132 @@ def remove_document(doc_id: str, api_key: str = Depends(get_api_key)):
 
 # --- /search endpoint ---
 @router.post("/search", response_model=list[dict[str, Any]])
-def search_documents(
+async def search_documents(
     query: str = Body(..., embed=True, description="Query string to search for."),
     top_k: int = Body(3, embed=True, description="Number of top results to return."),
+    ef_search: int | None = Body(
+        None, embed=True, ge=1, le=1000, description="HNSW candidate list size for this query."
+    ),
+    probes: int | None = Body(
+        None, embed=True, ge=1, description="IVFFlat lists to probe for this query."
+    ),
+    mode: SearchMode = Body(
+        "vector",
+        embed=True,
+        description="vector, lexical (full-text) or hybrid (both, fused by reciprocal rank).",
+    ),
+    filters: MetadataFilters | None = Body(
+        None,
+        embed=True,
+        description='Metadata filters, e.g. {"ticker": "MSFT", "sector": ["Tech", "Energy"], '
+        '"filed_at": {"gte": "2025-01-01"}}.',
+    ),
     api_key: str = Depends(get_api_key),
+    services: ServiceContainer = Depends(get_services),
 ):
     """
-    Embed the query and return top-k most similar chunks with similarity scores.
+    Embed the query and return top-k chunks with similarity scores, retrieved by vector
+    similarity, full-text match, or both.
     """
     api_search_requests_total.add(1)
     try:
-        query_embedding = rag_pipeline.embedder.embed_query(query)
+        query_embedding = await services.rag_pipeline.embedder.aembed_query(query)
     except Exception:
         embedding_failures_total.add(1)
         raise
-    results = rag_pipeline.vectordb.query_similar(query_embedding, top_k=top_k)
-    # Each result: (doc_id, chunk_idx, chunk, distance, metadata)
+    results = await services.rag_pipeline.vector_store.search(
+        mode,
+        query,
+        query_embedding,
+        top_k=top_k,
+        ef_search=ef_search,
+        probes=probes,
+        filters=filters,
+    )
     # Convert distance to similarity (lower distance = higher similarity)
     return [
         {
-            "doc_id": doc_id,
-            "chunk_idx": chunk_idx,
-            "chunk": chunk,
-            "similarity": float(1.0 / (1.0 + distance)),
-            "metadata": metadata,
+            "doc_id": r.doc_id,
+            "chunk_idx": r.chunk_idx,
+            "chunk": r.chunk,
+            "similarity": float(1.0 / (1.0 + r.distance)),
+            "metadata": r.metadata,
         }
-        for doc_id, chunk_idx, chunk, distance, metadata in results
+        for r in results
     ]
+
+
+# ANN index management can take retrieval down (drop) or load the database for minutes
+# (build, exact-scan recall), so it needs the admin key. It lives outside /documents so that
+# no path here can shadow a document id.
+index_router = APIRouter(
+    prefix="/admin/index", tags=["admin"], dependencies=[Depends(get_admin_key)]
+)
+
+
+@index_router.get("")
+async def read_index(
+    quantization: Quantization | None = None,
+    services: ServiceContainer = Depends(get_services),
+):
+    return {"index": await services.rag_pipeline.vectordb.index_info(quantization)}
+
+
+@index_router.post("")
+async def build_index(
+    request: IndexRequest,
+    services: ServiceContainer = Depends(get_services),
+):
+    params = request.model_dump(exclude={"rebuild"})
+    if request.rebuild:
+        index = await services.rag_pipeline.vectordb.rebuild_index(**params)
+    else:
+        index = await services.rag_pipeline.vectordb.create_index(**params)
+    return {"index": index}
+
+
+@index_router.delete("")
+async def drop_index(
+    quantization: Quantization | None = None,
+    services: ServiceContainer = Depends(get_services),
+):
+    return {"dropped": await services.rag_pipeline.vectordb.drop_index(quantization)}
+
+
+@index_router.post("/recall")
+async def index_recall(
+    request: RecallRequest,
+    services: ServiceContainer = Depends(get_services),
+):
+    """
+    Measure ANN recall@k against an exact float32 scan for sample queries, to tune
+    ef_search/probes or to check a halfvec/binary index (and its overfetch) before switching
+    to it. Index sizes are reported so the memory saving can be weighed against recall.
+    """
+    vectordb = services.rag_pipeline.vectordb
+    reports = []
+    for query in request.queries:
+        query_embedding = await services.rag_pipeline.embedder.aembed_query(query)
+        reports.append(
+            await vectordb.recall_at_k(
+                query_embedding,
+                top_k=request.top_k,
+                ef_search=request.ef_search,
+                probes=request.probes,
+                quantization=request.quantization,
+                overfetch=request.overfetch,
+            )
+        )
+    return {
+        "top_k": request.top_k,
+        "ef_search": request.ef_search,
+        "probes": request.probes,
+        "quantization": request.quantization or vectordb.quantization,
+        "overfetch": request.overfetch,  # None: settings.quantization_overfetch_factor
+        "index": await vectordb.index_info(request.quantization),
+        "float32_index": await vectordb.index_info("none"),
+        "mean_recall": sum(r["recall"] for r in reports) / len(reports),
+        "mean_approx_latency_ms": sum(r["approx_latency_ms"] for r in reports) / len(reports),
+        "mean_exact_latency_ms": sum(r["exact_latency_ms"] for r in reports) / len(reports),
+        "queries": reports,
+    }
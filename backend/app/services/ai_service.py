@@ -1,10 +1,12 @@
 # ai_service.py
 # Place your AI service logic here.
 import time
+from collections.abc import AsyncIterator
 
 import openai
 from opentelemetry import metrics
 
+from app.core import request_metrics
 from app.core.settings import settings
 
 meter = metrics.get_meter(__name__)
@@ -16,6 +18,10 @@ llm_query_time_histogram = meter.create_histogram(
     name="ai_llm_query_time_seconds",
     description="Time taken for LLM completion in /query endpoint (seconds)",
 )
+llm_time_to_first_token_histogram = meter.create_histogram(
+    name="ai_llm_time_to_first_token_seconds",
+    description="Time from request to first streamed LLM content token (seconds)",
+)
 
 
 class AIService:
@@ -24,7 +30,22 @@ class AIService:
         self.version = "0.1.0"
         self.openai_api_key = settings.openai_api_key
         self.model = settings.model
-        self.openai_client = openai.AsyncOpenAI(api_key=self.openai_api_key)
+        self.openai_client = openai.AsyncOpenAI(
+            api_key=self.openai_api_key, base_url=settings.openai_base_url
+        )
+
+    def _build_messages(
+        self, prompt: str, system_prompt: str, history: list | None = None
+    ) -> list[dict]:
+        if not self.openai_api_key:
+            raise ValueError("OpenAI API key not set in environment/settings.")
+
+        # Build structured messages
+        messages = [{"role": "system", "content": system_prompt}]
+        if history:
+            messages.extend(history)
+        messages.append({"role": "user", "content": prompt})
+        return messages
 
     async def query_llm(
         self,
@@ -43,20 +64,14 @@ class AIService:
         Raises:
             ValueError: If API key is missing or OpenAI returns an error.
         """
-        if not self.openai_api_key:
-            raise ValueError("OpenAI API key not set in environment/settings.")
-
-        # Build structured messages
-        messages = [{"role": "system", "content": system_prompt}]
-        if history:
-            messages.extend(history)
-        messages.append({"role": "user", "content": prompt})
+        messages = self._build_messages(prompt, system_prompt, history)
 
         try:
             start_time = time.time()
-            response = await self.openai_client.chat.completions.create(
-                model=self.model, messages=messages
-            )
+            with request_metrics.stage("llm"):
+                response = await self.openai_client.chat.completions.create(
+                    model=self.model, messages=messages
+                )
             duration = time.time() - start_time
             llm_query_time_histogram.record(duration)
             # Track tokens if available
@@ -68,6 +83,10 @@ class AIService:
             ):
                 tokens_used = response.usage.total_tokens
                 llm_tokens_counter.add(tokens_used)
+                request_metrics.record(
+                    tokens_in=response.usage.prompt_tokens,
+                    tokens_out=response.usage.completion_tokens,
+                )
             return response.choices[0].message.content
         except openai.OpenAIError as e:
             # Handle OpenAI API errors
@@ -75,3 +94,50 @@ class AIService:
         except Exception as e:
             # Handle network or unexpected errors
             raise ValueError(f"Unexpected error querying LLM: {e}")
+
+    async def stream_llm(
+        self,
+        prompt: str,
+        system_prompt: str = "You are a helpful AI investment assistant.",
+        history: list[dict] | None = None,
+    ) -> AsyncIterator[str]:
+        """
+        Streaming variant of query_llm: yields content deltas as they arrive.
+        Records time-to-first-token and total completion time, and token usage from the
+        final usage chunk.
+        Raises:
+            ValueError: If API key is missing or OpenAI returns an error.
+        """
+        messages = self._build_messages(prompt, system_prompt, history)
+        try:
+            start_time = time.time()
+            first_token = True
+            stream = await self.openai_client.chat.completions.create(
+                model=self.model,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+            )
+            async for chunk in stream:
+                # The final chunk carries usage and no choices
+                if chunk.usage and chunk.usage.total_tokens:
+                    llm_tokens_counter.add(chunk.usage.total_tokens)
+                    request_metrics.record(
+                        tokens_in=chunk.usage.prompt_tokens,
+                        tokens_out=chunk.usage.completion_tokens,
+                    )
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                if first_token:
+                    ttft = time.time() - start_time
+                    llm_time_to_first_token_histogram.record(ttft)
+                    request_metrics.add_time("llm_ttft", ttft)
+                    first_token = False
+                yield chunk.choices[0].delta.content
+            duration = time.time() - start_time
+            llm_query_time_histogram.record(duration, {"stream": True})
+            request_metrics.add_time("llm", duration)
+        except openai.OpenAIError as e:
+            raise ValueError(f"OpenAI API error: {e}") from e
+        except Exception as e:
+            raise ValueError(f"Unexpected error querying LLM: {e}") from e
@@ -0,0 +1,153 @@
+import threading
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass
+
+import numpy as np
+
+# Use global meter provider set in main.py
+from opentelemetry import metrics
+
+from app.core.settings import settings
+
+meter = metrics.get_meter(__name__)
+
+answer_cache_hits_total = meter.create_counter(
+    name="ai_answer_cache_hits_total", description="/ai/query answers served from the cache"
+)
+answer_cache_misses_total = meter.create_counter(
+    name="ai_answer_cache_misses_total", description="/ai/query answers that required an LLM call"
+)
+
+SourceKey = tuple[str, int]  # (doc_id, chunk_idx)
+
+
+@dataclass
+class CachedAnswer:
+    question: str
+    sources: frozenset[SourceKey]
+    answer: str
+    expires_at: float
+
+
+class SemanticAnswerCache:
+    """
+    In-process cache of LLM answers keyed on question meaning and retrieved context.
+
+    A lookup hits when a stored question has cosine similarity >= threshold with the new one
+    AND the same (doc_id, chunk_idx) set was retrieved, so the LLM would see the same context.
+    Entries expire after ttl_s; writes to a document drop every entry that cited it. Other
+    workers only see their own writes, so ttl_s bounds staleness across workers.
+    """
+
+    def __init__(self, threshold: float, ttl_s: float, max_entries: int):
+        self.threshold = threshold
+        self.ttl_s = ttl_s
+        self.max_entries = max_entries
+        # Ring buffer: row i of _matrix is the normalized question embedding of _entries[i].
+        # The matrix doubles as it fills, up to max_entries rows; once full, each store
+        # overwrites the oldest slot (_next). Only expiry and invalidation rebuild it.
+        self._entries: list[CachedAnswer] = []
+        self._matrix: np.ndarray | None = None
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _normalize(embedding: np.ndarray) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _age_order(self) -> list[int]:
+        """Slots from oldest to newest."""
+        count = len(self._entries)
+        return [(self._next + i) % count for i in range(count)] if count else []
+
+    def _remove(self, keep: list[bool]) -> None:
+        """Drop the entries whose slot is False in keep, compacting the rest oldest first."""
+        kept = [slot for slot in self._age_order() if keep[slot]]
+        self._entries = [self._entries[slot] for slot in kept]
+        if self._matrix is not None:
+            self._matrix[: len(kept)] = self._matrix[kept]
+        self._next = 0
+
+    def lookup(self, query_embedding: np.ndarray, sources: Iterable[SourceKey]) -> str | None:
+        source_set = frozenset(sources)
+        query = self._normalize(query_embedding)
+        now = time.monotonic()
+        with self._lock:
+            # Every entry gets the same TTL, so the oldest one expires first
+            if self._entries and self._entries[self._next % len(self._entries)].expires_at < now:
+                self._remove([entry.expires_at >= now for entry in self._entries])
+            if not self._entries or self._matrix is None:
+                answer_cache_misses_total.add(1)
+                return None
+            similarities = self._matrix[: len(self._entries)] @ query
+            for idx in np.argsort(-similarities):
+                if similarities[idx] < self.threshold:
+                    break
+                if self._entries[idx].sources == source_set:
+                    answer_cache_hits_total.add(1)
+                    return self._entries[idx].answer
+        answer_cache_misses_total.add(1)
+        return None
+
+    def store(
+        self,
+        question: str,
+        query_embedding: np.ndarray,
+        sources: Iterable[SourceKey],
+        answer: str,
+    ) -> None:
+        if self.max_entries <= 0:
+            return
+        entry = CachedAnswer(
+            question=question,
+            sources=frozenset(sources),
+            answer=answer,
+            expires_at=time.monotonic() + self.ttl_s,
+        )
+        embedding = self._normalize(query_embedding)
+        with self._lock:
+            count = len(self._entries)
+            if self._matrix is None:
+                self._matrix = np.empty((min(64, self.max_entries), embedding.shape[0]), np.float32)
+            elif count == len(self._matrix) < self.max_entries:
+                grown = np.empty(
+                    (min(2 * count, self.max_entries), self._matrix.shape[1]), np.float32
+                )
+                grown[:count] = self._matrix
+                self._matrix = grown
+            if count < self.max_entries:
+                slot = count
+                self._entries.append(entry)
+            else:
+                slot = self._next  # full: overwrite the oldest
+                self._entries[slot] = entry
+            self._matrix[slot] = embedding
+            self._next = (slot + 1) % self.max_entries
+
+    def invalidate_documents(self, doc_ids: Iterable[str]) -> int:
+        """Drop every cached answer that was grounded in any of doc_ids."""
+        changed = set(doc_ids)
+        with self._lock:
+            keep = [
+                not any(doc_id in changed for doc_id, _ in entry.sources) for entry in self._entries
+            ]
+            if not all(keep):
+                self._remove(keep)
+        return keep.count(False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries, self._matrix, self._next = [], None, 0
+
+
+answer_cache = SemanticAnswerCache(
+    threshold=settings.answer_cache_similarity_threshold,
+    ttl_s=settings.answer_cache_ttl_s,
+    max_entries=settings.answer_cache_max_entries if settings.answer_cache_enabled else 0,
+)
@@ -0,0 +1,320 @@
+"""
+Offline bulk indexer for large corpora.
+
+Reads a JSONL file (one {"id", "title", "text", "metadata"} object per line) or a directory of
+text files, chunks and embeds it, and streams rows into raw_documents and documents with
+binary COPY. Each batch commits together with its checkpoint, so an interrupted run resumes
+from the last committed batch.
+
+    python -m app.services.bulk_loader corpus.jsonl --batch-docs 256 --embed-workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import time
+import uuid
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from itertools import islice
+from pathlib import Path
+
+import numpy as np
+from loguru import logger
+from psycopg import AsyncConnection
+
+from app.models import Document
+from app.services.db import close_pool, connection, open_pool
+from app.services.embedding_pool import ProcessEmbeddingPool
+from app.services.rag_pipeline import ChunkRow, RAGPipeline, unique_documents
+from app.services.storage import init_schema
+
+TEXT_SUFFIXES = {".txt", ".md"}
+
+
+@dataclass
+class StageStats:
+    rows: int = 0
+    seconds: float = 0.0  # wall time with at least one batch in the stage
+    active: int = 0
+    busy_since: float = 0.0
+
+    @contextmanager
+    def busy(self) -> Iterator[None]:
+        """Time one batch in the stage; overlapping batches share the wall clock, not add up."""
+        if self.active == 0:
+            self.busy_since = time.perf_counter()
+        self.active += 1
+        try:
+            yield
+        finally:
+            self.active -= 1
+            if self.active == 0:
+                self.seconds += time.perf_counter() - self.busy_since
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+@dataclass
+class LoadReport:
+    source: str
+    start_position: int
+    position: int = 0
+    stages: dict[str, StageStats] = field(
+        default_factory=lambda: {s: StageStats() for s in ("read", "chunk", "embed", "write")}
+    )
+    workers: dict[str, dict] = field(default_factory=dict)  # per embedding worker process
+
+    def as_dict(self) -> dict:
+        return {
+            "source": self.source,
+            "start_position": self.start_position,
+            "position": self.position,
+            "stages": {
+                name: {
+                    "rows": s.rows,
+                    "seconds": round(s.seconds, 3),
+                    "rows_per_sec": round(s.rows_per_sec, 1),
+                }
+                for name, s in self.stages.items()
+            },
+            **({"embed_workers": self.workers} if self.workers else {}),
+        }
+
+
+def iter_corpus(path: Path, start: int = 0) -> Iterator[tuple[int, Document]]:
+    """Yield (position, document) pairs from a JSONL file or a directory, skipping < start."""
+    if path.is_dir():
+        files = sorted(p for p in path.rglob("*") if p.is_file() and p.suffix in TEXT_SUFFIXES)
+        for position, file in enumerate(files):
+            if position < start:
+                continue
+            doc_id = file.relative_to(path).as_posix()
+            text = file.read_text(encoding="utf-8", errors="replace")
+            yield position, Document(id=doc_id, title=file.stem, text=text)
+        return
+    source = path.resolve()
+    with path.open(encoding="utf-8") as f:
+        for position, line in enumerate(f):
+            if position < start or not line.strip():
+                continue
+            doc = Document(**json.loads(line))
+            # Stable ids keep a resumed or repeated load idempotent
+            doc.id = doc.id or str(uuid.uuid5(uuid.NAMESPACE_URL, f"{source}#{position}"))
+            yield position, doc
+
+
+class BulkLoader:
+    def __init__(
+        self,
+        rag_pipeline: RAGPipeline,
+        batch_docs: int = 256,
+        embed_batch_size: int = 128,
+        lookahead_batches: int = 1,
+    ):
+        self.rag_pipeline = rag_pipeline
+        self.batch_docs = batch_docs
+        self.embed_batch_size = embed_batch_size
+        self.lookahead_batches = lookahead_batches
+
+    async def ensure_checkpoint_table(self) -> None:
+        async with connection() as conn:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+                    source TEXT PRIMARY KEY,
+                    position BIGINT NOT NULL,
+                    docs BIGINT NOT NULL DEFAULT 0,
+                    chunks BIGINT NOT NULL DEFAULT 0,
+                    updated_at TIMESTAMPTZ DEFAULT NOW()
+                );
+                """
+            )
+
+    async def read_checkpoint(self, source: str) -> int:
+        async with connection() as conn:
+            cur = await conn.execute(
+                "SELECT position FROM ingest_checkpoints WHERE source = %s", (source,)
+            )
+            row = await cur.fetchone()
+        return row[0] if row else 0
+
+    async def _save_checkpoint(
+        self, conn: AsyncConnection, source: str, position: int, docs: int, chunks: int
+    ) -> None:
+        await conn.execute(
+            """
+            INSERT INTO ingest_checkpoints (source, position, docs, chunks)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (source) DO UPDATE SET
+                position = EXCLUDED.position,
+                docs = ingest_checkpoints.docs + EXCLUDED.docs,
+                chunks = ingest_checkpoints.chunks + EXCLUDED.chunks,
+                updated_at = NOW()
+            """,
+            (source, position, docs, chunks),
+        )
+
+    async def _write_batch(
+        self,
+        source: str,
+        next_position: int,
+        docs: list[Document],
+        rows: list[ChunkRow],
+        report: LoadReport,
+    ) -> None:
+        """Write one batch and advance the checkpoint in a single transaction."""
+        with report.stages["write"].busy():
+            async with connection() as conn:
+                await self.rag_pipeline.write_batch(conn, docs, rows)
+                await self._save_checkpoint(conn, source, next_position, len(docs), len(rows))
+        report.stages["write"].rows += len(rows)
+        report.position = next_position
+
+    async def _embed(self, texts: list[str], report: LoadReport) -> tuple[np.ndarray, list[int]]:
+        # Up to lookahead_batches + 1 of these run at once, hence busy() rather than summing
+        with report.stages["embed"].busy():
+            embeddings, token_counts = await asyncio.gather(
+                self.rag_pipeline.embed_chunks(texts, self.embed_batch_size),
+                self.rag_pipeline.count_chunk_tokens(texts),
+            )
+        report.stages["embed"].rows += len(texts)
+        return embeddings, token_counts
+
+    def _log_progress(self, report: LoadReport) -> None:
+        if self.rag_pipeline.embed_pool is not None:
+            report.workers = self.rag_pipeline.embed_pool.worker_stats()
+        logger.info(json.dumps({"bulk_load.progress": report.as_dict()}))
+
+    async def load(self, path: Path, restart: bool = False) -> LoadReport:
+        source = str(path.resolve())
+        await self.ensure_checkpoint_table()
+        start = 0 if restart else await self.read_checkpoint(source)
+        report = LoadReport(source=source, start_position=start, position=start)
+        logger.info(json.dumps({"bulk_load.start": source, "position": start}))
+
+        corpus = iter_corpus(path, start)
+        # Batches submitted for embedding but not yet written, oldest first. Capping it at
+        # lookahead_batches is the backpressure that stops reading and chunking from
+        # outrunning the encoder, while keeping the next batch queued so it never idles.
+        queued: deque[tuple[int, list[Document], list, asyncio.Task]] = deque()
+        pending_write: asyncio.Task | None = None
+        try:
+            while True:
+                start_time = time.perf_counter()
+                batch = list(islice(corpus, self.batch_docs))
+                report.stages["read"].rows += len(batch)
+                report.stages["read"].seconds += time.perf_counter() - start_time
+                if batch:
+                    docs = unique_documents([doc for _, doc in batch])
+                    start_time = time.perf_counter()
+                    chunked = self.rag_pipeline.chunk_documents(docs)
+                    texts = [chunk for _, chunks in chunked for chunk in chunks]
+                    report.stages["chunk"].rows += len(texts)
+                    report.stages["chunk"].seconds += time.perf_counter() - start_time
+                    task = asyncio.create_task(self._embed(texts, report))
+                    queued.append((batch[-1][0] + 1, docs, chunked, task))
+
+                while queued and (not batch or len(queued) > self.lookahead_batches):
+                    next_position, docs, chunked, task = queued.popleft()
+                    rows = self.rag_pipeline.build_rows(chunked, *await task)
+                    # Writing runs while the following batches are still being embedded
+                    if pending_write is not None:
+                        await pending_write
+                        self._log_progress(report)
+                    pending_write = asyncio.create_task(
+                        self._write_batch(source, next_position, docs, rows, report)
+                    )
+                if not batch:
+                    break
+            if pending_write is not None:
+                await pending_write
+        finally:
+            # If reading, embedding or a write failed, stop the batches still in flight instead
+            # of leaving them encoding (and holding pool buffers) in the background
+            orphans = [task for *_, task in queued]
+            if pending_write is not None:
+                orphans.append(pending_write)
+            for task in orphans:
+                task.cancel()
+            await asyncio.gather(*orphans, return_exceptions=True)
+        if self.rag_pipeline.embed_pool is not None:
+            report.workers = self.rag_pipeline.embed_pool.worker_stats()
+        logger.info(json.dumps({"bulk_load.done": report.as_dict()}))
+        return report
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await open_pool()
+    embed_pool: ProcessEmbeddingPool | None = None
+    try:
+        rag_pipeline = RAGPipeline(chunk_size=args.chunk_size, chunk_overlap=args.chunk_overlap)
+        if args.embed_workers > 0:
+            embed_pool = ProcessEmbeddingPool(
+                rag_pipeline.embedder.model_name,
+                workers=args.embed_workers,
+                shard_size=args.embed_batch_size,
+                backend=rag_pipeline.embedder.backend_name,
+            )
+            await embed_pool.start()
+            rag_pipeline.embed_pool = embed_pool
+        await init_schema()
+        await rag_pipeline.vectordb.ensure_schema()
+        if rag_pipeline.embedding_cache is not None:
+            await rag_pipeline.embedding_cache.ensure_schema()
+        if args.defer_index:
+            # Loading into an unindexed table and building once is far cheaper than
+            # maintaining HNSW/IVFFlat incrementally for millions of rows.
+            await rag_pipeline.vectordb.drop_index()
+        loader = BulkLoader(
+            rag_pipeline,
+            batch_docs=args.batch_docs,
+            embed_batch_size=args.embed_batch_size,
+            lookahead_batches=args.lookahead_batches,
+        )
+        report = await loader.load(Path(args.path), restart=args.restart)
+        if args.defer_index:
+            await rag_pipeline.vectordb.create_index()
+        print(json.dumps(report.as_dict(), indent=2))
+    finally:
+        if embed_pool is not None:
+            await embed_pool.close()
+        await close_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Bulk-index a corpus into pgvector.")
+    parser.add_argument("path", help="JSONL file or directory of .txt/.md files")
+    parser.add_argument("--batch-docs", type=int, default=256, help="documents per transaction")
+    parser.add_argument("--embed-batch-size", type=int, default=128)
+    parser.add_argument(
+        "--embed-workers",
+        type=int,
+        default=0,
+        help="encoder processes (each loads the model once); 0 encodes in-process",
+    )
+    parser.add_argument(
+        "--lookahead-batches",
+        type=int,
+        default=1,
+        help="batches chunked and queued for embedding ahead of the one being written",
+    )
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--chunk-overlap", type=int, default=50)
+    parser.add_argument(
+        "--restart", action="store_true", help="ignore the saved checkpoint for this source"
+    )
+    parser.add_argument(
+        "--defer-index",
+        action="store_true",
+        help="drop the ANN index during the load and rebuild it once at the end",
+    )
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import asyncio
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+
+from fastapi import Request
+from loguru import logger
+
+from app.core.settings import settings
+from app.services.ai_service import AIService
+from app.services.db import close_pool, open_pool, pool_stats
+from app.services.memory import memory
+from app.services.prompt_builder import PromptBuilder
+from app.services.rag_pipeline import RAGPipeline
+from app.services.storage import init_schema
+
+COMPONENTS = ("db_pool", "schema", "model")
+
+
+class ServiceContainer:
+    """
+    The per-worker services shared by every router, built once in the FastAPI lifespan and
+    handed to routes with Depends(get_services). Tracks startup status and timings for /ready.
+    """
+
+    def __init__(self) -> None:
+        self.ai_service = AIService()
+        self.rag_pipeline = RAGPipeline()
+        self.prompt_builder = PromptBuilder()
+        self.status: dict[str, str] = {name: "pending" for name in COMPONENTS}
+        self.startup_seconds: dict[str, float] = {}
+        self._model_task: asyncio.Task | None = None
+
+    @contextmanager
+    def _timed(self, step: str) -> Iterator[None]:
+        start_time = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.startup_seconds[step] = round(time.perf_counter() - start_time, 3)
+
+    async def start(self) -> None:
+        with self._timed("db_pool"):
+            await open_pool()
+        self.status["db_pool"] = "ready"
+        with self._timed("schema"):
+            await init_schema()
+            await self.rag_pipeline.vectordb.ensure_schema()
+            if self.rag_pipeline.embedding_cache is not None:
+                await self.rag_pipeline.embedding_cache.ensure_schema()
+            await memory.ensure_schema()
+        self.status["schema"] = "ready"
+        await self.rag_pipeline.vector_store.start()
+        if settings.embedding_background_load:
+            self._model_task = asyncio.create_task(self._load_model())
+        else:
+            await self._load_model()
+
+    async def _load_model(self) -> None:
+        embedder = self.rag_pipeline.embedder
+        self.status["model"] = "loading"
+        try:
+            with self._timed("model_load"):
+                await asyncio.to_thread(embedder.load)
+            with self._timed("model_warmup"):
+                await asyncio.to_thread(embedder.warmup)
+        except Exception as e:
+            self.status["model"] = "failed"
+            logger.error(f"Embedding model {embedder.model_name} failed to load: {e}")
+            return
+        self.status["model"] = "ready"
+        logger.info(f"Embedding model ready, startup timings: {self.startup_seconds}")
+
+    async def stop(self) -> None:
+        if self._model_task is not None and not self._model_task.done():
+            self._model_task.cancel()
+        await self.rag_pipeline.vector_store.stop()
+        await close_pool()
+        self.status["db_pool"] = "closed"
+
+    @property
+    def ready(self) -> bool:
+        return all(self.status[name] == "ready" for name in COMPONENTS)
+
+    def readiness(self) -> dict:
+        return {
+            "ready": self.ready,
+            "components": dict(self.status),
+            "model": self.rag_pipeline.embedder.model_name,
+            "embedding_backend": self.rag_pipeline.embedder.backend_name,
+            "pool": pool_stats(),
+            "startup_seconds": dict(self.startup_seconds),
+        }
+
+
+def get_services(request: Request) -> ServiceContainer:
+    """FastAPI dependency: the container created by the lifespan in main.py."""
+    return request.app.state.services
@@ -0,0 +1,119 @@
+import asyncio
+import time
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
+from pgvector.psycopg import register_vector_async
+from psycopg import AsyncConnection
+from psycopg.conninfo import make_conninfo
+from psycopg_pool import AsyncConnectionPool
+
+from app.core import request_metrics
+from app.core.settings import settings
+
+# Use global meter provider set in main.py
+meter = metrics.get_meter(__name__)
+
+pool_wait_histogram = meter.create_histogram(
+    name="db_pool_wait_seconds",
+    description="Time spent waiting to check out a Postgres connection from the pool (seconds)",
+)
+pool_checkouts_total = meter.create_counter(
+    name="db_pool_checkouts_total", description="Total number of Postgres connection checkouts"
+)
+
+_pool: AsyncConnectionPool | None = None
+_pool_lock = asyncio.Lock()
+
+
+def _observe_pool(options: CallbackOptions) -> list[Observation]:
+    if _pool is None:
+        return []
+    stats = _pool.get_stats()
+    return [
+        Observation(stats.get("pool_size", 0), {"state": "open"}),
+        Observation(stats.get("pool_available", 0), {"state": "idle"}),
+        Observation(stats.get("requests_waiting", 0), {"state": "waiting"}),
+    ]
+
+
+meter.create_observable_gauge(
+    name="db_pool_connections",
+    callbacks=[_observe_pool],
+    description="Postgres pool connections by state (open, idle, waiting requests)",
+)
+
+
+def conninfo() -> str:
+    return make_conninfo(
+        dbname=settings.pgvector_db,
+        user=settings.pgvector_user,
+        password=settings.pgvector_password,
+        host=settings.pgvector_host,
+        port=settings.pgvector_port,
+    )
+
+
+async def open_pool() -> AsyncConnectionPool:
+    """Open the process-wide connection pool (idempotent)."""
+    global _pool
+    async with _pool_lock:
+        if _pool is None:
+            # The vector type must exist before pooled connections register its adapters
+            async with autocommit_connection() as conn:
+                await conn.execute("CREATE EXTENSION IF NOT EXISTS vector;")
+            pool = AsyncConnectionPool(
+                conninfo(),
+                min_size=settings.pg_pool_min_size,
+                max_size=settings.pg_pool_max_size,
+                timeout=settings.pg_pool_timeout_s,
+                configure=register_vector_async,  # numpy arrays <-> vector, incl. binary COPY
+                open=False,
+            )
+            await pool.open(wait=True)
+            _pool = pool
+    return _pool
+
+
+def pool_stats() -> dict | None:
+    """Current pool counters, or None if the pool isn't open."""
+    return _pool.get_stats() if _pool is not None else None
+
+
+async def close_pool() -> None:
+    global _pool
+    async with _pool_lock:
+        if _pool is not None:
+            await _pool.close()
+            _pool = None
+
+
+@asynccontextmanager
+async def connection() -> AsyncIterator[AsyncConnection]:
+    """
+    Check out a pooled connection for the duration of the block.
+    The transaction is committed on normal exit and rolled back on error.
+    """
+    pool = _pool or await open_pool()
+    start_time = time.perf_counter()
+    async with pool.connection() as conn:
+        wait_s = time.perf_counter() - start_time
+        pool_wait_histogram.record(wait_s)
+        request_metrics.add_time("db_wait", wait_s)
+        pool_checkouts_total.add(1)
+        yield conn
+
+
+@asynccontextmanager
+async def autocommit_connection() -> AsyncIterator[AsyncConnection]:
+    """
+    Open a dedicated autocommit connection outside the pool, for maintenance statements
+    that cannot run inside a transaction (e.g. CREATE INDEX CONCURRENTLY).
+    """
+    conn = await AsyncConnection.connect(conninfo(), autocommit=True)
+    try:
+        yield conn
+    finally:
+        await conn.close()
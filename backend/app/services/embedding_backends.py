@@ -0,0 +1,229 @@
+"""
+Embedding backends behind LocalEmbeddingService.
+
+"torch" runs the full-precision SentenceTransformer. "onnx" runs an ONNX export of the same
+model (typically int8-quantized) on ONNX Runtime's CPU provider, without importing torch at
+all. Both return L2-normalized float32 rows, so vectors from either backend can share an index
+as long as the parity check shows the drift is negligible:
+
+    poetry run task embedding-onnx parity
+"""
+
+import argparse
+import json
+import time
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.core.settings import settings
+
+
+class EmbeddingBackend(ABC):
+    """Encodes text into an (n, dim) float32 matrix. Implementations load eagerly."""
+
+    name: str
+
+    @abstractmethod
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray: ...
+
+
+class SentenceTransformerBackend(EmbeddingBackend):
+    name = "torch"
+
+    def __init__(self, model_name: str, intra_op_threads: int = 0):
+        from sentence_transformers import SentenceTransformer
+
+        if intra_op_threads > 0:
+            import torch
+
+            torch.set_num_threads(intra_op_threads)
+        self.model = SentenceTransformer(model_name)
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+
+def mean_pool(hidden: np.ndarray, attention_mask: np.ndarray) -> np.ndarray:
+    """Masked mean over the token axis, then L2-normalize (the all-MiniLM pooling head)."""
+    mask = attention_mask[..., None].astype(np.float32)
+    summed = (hidden * mask).sum(axis=1)
+    pooled = summed / np.clip(mask.sum(axis=1), 1e-9, None)
+    norms = np.linalg.norm(pooled, axis=1, keepdims=True)
+    return (pooled / np.clip(norms, 1e-12, None)).astype(np.float32)
+
+
+class OnnxBackend(EmbeddingBackend):
+    """
+    ONNX Runtime backend for a local export directory holding the ONNX graph and the
+    tokenizer.json of the configured model (see README: "ONNX embedding backend").
+    """
+
+    name = "onnx"
+
+    def __init__(
+        self,
+        model_path: str,
+        model_file: str = "model_quantized.onnx",
+        intra_op_threads: int = 0,
+        max_seq_length: int = 256,
+    ):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        path = Path(model_path)
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.intra_op_num_threads = intra_op_threads  # 0 = one per physical core
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(
+            str(path / model_file), options, providers=["CPUExecutionProvider"]
+        )
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = Tokenizer.from_file(str(path / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        batches = []
+        for start in range(0, len(texts), batch_size):
+            encodings = self.tokenizer.encode_batch(texts[start : start + batch_size])
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+            }
+            if "token_type_ids" in self.input_names:
+                feeds["token_type_ids"] = np.array([e.type_ids for e in encodings], dtype=np.int64)
+            output = self.session.run(None, feeds)[0]
+            # Exports with a pooling head emit (batch, dim); plain transformer exports emit tokens
+            if output.ndim == 2:
+                norms = np.linalg.norm(output, axis=1, keepdims=True)
+                batches.append((output / np.clip(norms, 1e-12, None)).astype(np.float32))
+            else:
+                batches.append(mean_pool(output, feeds["attention_mask"]))
+        if not batches:
+            return np.empty((0, 0), dtype=np.float32)
+        return np.concatenate(batches)
+
+
+def build_backend(
+    model_name: str, backend: str | None = None, intra_op_threads: int | None = None
+) -> EmbeddingBackend:
+    backend = backend or settings.embedding_backend
+    if intra_op_threads is None:
+        intra_op_threads = settings.embedding_intra_op_threads
+    if backend == "onnx":
+        if not settings.embedding_onnx_path:
+            raise ValueError("EMBEDDING_ONNX_PATH must be set for the onnx embedding backend")
+        return OnnxBackend(
+            settings.embedding_onnx_path,
+            model_file=settings.embedding_onnx_file,
+            intra_op_threads=intra_op_threads,
+            max_seq_length=settings.embedding_max_seq_length,
+        )
+    if backend == "torch":
+        return SentenceTransformerBackend(model_name, intra_op_threads=intra_op_threads)
+    raise ValueError(f"Unknown embedding backend: {backend}")
+
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> dict[str, float]:
+    """Row-wise cosine similarity between two embeddings of the same texts."""
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = (ref * cand).sum(axis=1)
+    return {
+        "mean_cosine": float(cosine.mean()),
+        "min_cosine": float(cosine.min()),
+        "max_drift": float(1.0 - cosine.min()),
+    }
+
+
+def _time_queries(backend: EmbeddingBackend, texts: list[str], repeats: int) -> float:
+    """Median single-query latency in ms (queries are encoded one at a time when served)."""
+    backend.encode(texts[:1])  # warmup
+    timings = []
+    for _ in range(repeats):
+        for text in texts:
+            start = time.perf_counter()
+            backend.encode([text])
+            timings.append((time.perf_counter() - start) * 1000)
+    return float(np.median(timings))
+
+
+def parity_check(
+    reference: EmbeddingBackend,
+    candidate: EmbeddingBackend,
+    texts: list[str],
+    repeats: int = 3,
+) -> dict[str, Any]:
+    """Cosine drift of candidate vs reference on texts, plus median query latency of each."""
+    report: dict[str, Any] = {"texts": len(texts)}
+    report.update(cosine_drift(reference.encode(texts), candidate.encode(texts)))
+    if repeats > 0:
+        ref_ms = _time_queries(reference, texts, repeats)
+        cand_ms = _time_queries(candidate, texts, repeats)
+        report.update(
+            {
+                f"{reference.name}_query_ms": ref_ms,
+                f"{candidate.name}_query_ms": cand_ms,
+                "speedup": ref_ms / cand_ms if cand_ms else None,
+            }
+        )
+    return report
+
+
+SAMPLE_TEXTS = [
+    "What was Microsoft's revenue growth in the last fiscal year?",
+    "Risk factors related to interest rate changes and inflation",
+    "Apple announced a new share buyback program of $90 billion.",
+    "How exposed is the energy sector to oil price volatility?",
+    "Free cash flow improved due to lower capital expenditures.",
+    "Compare NVIDIA and AMD data center segment margins",
+    "The board declared a quarterly dividend of $0.75 per share.",
+    "Management expects supply chain constraints to ease in the second half.",
+]
+
+
+def quantize(model_path: str, source_file: str = "model.onnx") -> Path:
+    """Dynamic int8 quantization of an exported fp32 graph, written next to it."""
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    path = Path(model_path)
+    target = path / settings.embedding_onnx_file
+    quantize_dynamic(str(path / source_file), str(target), weight_type=QuantType.QInt8)
+    return target
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="ONNX embedding backend tools")
+    sub = parser.add_subparsers(dest="command", required=True)
+    q = sub.add_parser("quantize", help="int8-quantize an exported model.onnx")
+    q.add_argument("--path", default=settings.embedding_onnx_path)
+    q.add_argument("--source", default="model.onnx")
+    p = sub.add_parser("parity", help="report cosine drift and latency vs the torch backend")
+    p.add_argument("--texts", help="file with one text per line (default: built-in samples)")
+    p.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    if args.command == "quantize":
+        if not args.path:
+            parser.error("--path or EMBEDDING_ONNX_PATH is required")
+        print(quantize(args.path, args.source))
+        return
+    texts = SAMPLE_TEXTS
+    if args.texts:
+        texts = [line.strip() for line in Path(args.texts).read_text().splitlines() if line.strip()]
+    report = parity_check(
+        build_backend(settings.embedding_model, "torch"),
+        build_backend(settings.embedding_model, "onnx"),
+        texts,
+        repeats=args.repeats,
+    )
+    report["intra_op_threads"] = settings.embedding_intra_op_threads  # 0 = runtime default
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+import hashlib
+from collections.abc import Awaitable, Callable
+
+import numpy as np
+
+# Use global meter provider set in main.py
+from opentelemetry import metrics
+
+from app.core.settings import settings
+from app.services.db import connection
+from app.services.vectordb import EMBEDDING_DIM
+
+# Most rows one eviction pass deletes, so a write never pays for more than a bounded trim
+EVICT_BATCH = 10_000
+
+meter = metrics.get_meter(__name__)
+
+embedding_cache_hits_total = meter.create_counter(
+    name="embedding_cache_hits_total", description="Chunk embeddings served from the cache"
+)
+embedding_cache_misses_total = meter.create_counter(
+    name="embedding_cache_misses_total", description="Chunk embeddings that had to be encoded"
+)
+
+
+def content_key(model_name: str, text: str) -> bytes:
+    """Content address of a chunk embedding: sha256 over the model name and the chunk text."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode()).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent, content-addressed chunk embedding cache in Postgres, shared by all workers.
+    Bounded to about max_entries with least-recently-used eviction.
+    """
+
+    def __init__(
+        self, model_name: str, max_entries: int | None = None, dimension: int = EMBEDDING_DIM
+    ):
+        self.model_name = model_name
+        self.max_entries = max_entries or settings.embedding_cache_max_entries
+        self.dimension = dimension
+
+    async def ensure_schema(self) -> None:
+        async with connection() as conn:
+            await conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    key BYTEA PRIMARY KEY,
+                    model TEXT NOT NULL,
+                    embedding VECTOR({self.dimension}) NOT NULL,
+                    last_used TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_embedding_cache_last_used "
+                "ON embedding_cache(last_used);"
+            )
+            # Entries from a previous embedding model can never be hit again (the model is part
+            # of the key), so drop them rather than letting them age out.
+            await conn.execute("DELETE FROM embedding_cache WHERE model <> %s", (self.model_name,))
+            # A model with another dimension also needs the column resized (vector's typmod is
+            # its dimension); any rows left would not convert, so they go too.
+            cur = await conn.execute(
+                "SELECT atttypmod FROM pg_attribute "
+                "WHERE attrelid = 'embedding_cache'::regclass AND attname = 'embedding'"
+            )
+            row = await cur.fetchone()
+            if row is not None and row[0] != self.dimension:
+                await conn.execute("TRUNCATE embedding_cache")
+                await conn.execute(
+                    "ALTER TABLE embedding_cache "
+                    f"ALTER COLUMN embedding TYPE VECTOR({self.dimension})"
+                )
+
+    async def get_many(self, keys: list[bytes]) -> dict[bytes, np.ndarray]:
+        if not keys:
+            return {}
+        async with connection() as conn:
+            cur = await conn.execute(
+                "SELECT key, embedding FROM embedding_cache WHERE key = ANY(%s)", (keys,)
+            )
+            rows = await cur.fetchall()
+            if rows:
+                # Refresh recency at most daily so hot re-ingests don't rewrite every row
+                await conn.execute(
+                    """
+                    UPDATE embedding_cache SET last_used = NOW()
+                    WHERE key = ANY(%s) AND last_used < NOW() - INTERVAL '1 day'
+                    """,
+                    ([key for key, _ in rows],),
+                )
+        return {bytes(key): np.asarray(embedding, dtype=np.float32) for key, embedding in rows}
+
+    async def put_many(self, entries: dict[bytes, np.ndarray]) -> None:
+        if not entries:
+            return
+        async with connection() as conn, conn.cursor() as cur:
+            await cur.executemany(
+                """
+                INSERT INTO embedding_cache (key, model, embedding) VALUES (%s, %s, %s)
+                ON CONFLICT (key) DO UPDATE SET last_used = NOW()
+                """,
+                [(key, self.model_name, embedding) for key, embedding in entries.items()],
+            )
+        await self.evict()
+
+    async def evict(self) -> int:
+        """
+        Once the table is over max_entries, delete up to EVICT_BATCH of the least recently used
+        rows. The size check reads the planner's row estimate, so a write under the cap costs
+        one catalog lookup instead of a scan, and the table can overshoot until autovacuum
+        refreshes the estimate.
+        """
+        async with connection() as conn:
+            cur = await conn.execute(
+                "SELECT reltuples::bigint FROM pg_class WHERE oid = 'embedding_cache'::regclass"
+            )
+            row = await cur.fetchone()
+            excess = (row[0] if row else 0) - self.max_entries
+            if excess <= 0:
+                return 0
+            # Walks idx_embedding_cache_last_used from the oldest end; a second worker evicting
+            # at the same time waits on these rows instead of deleting another batch's worth
+            cur = await conn.execute(
+                """
+                DELETE FROM embedding_cache WHERE key IN (
+                    SELECT key FROM embedding_cache ORDER BY last_used LIMIT %s
+                )
+                """,
+                (min(excess, EVICT_BATCH),),
+            )
+            return cur.rowcount
+
+    async def embed(
+        self, texts: list[str], embed_fn: Callable[[list[str]], Awaitable[np.ndarray]]
+    ) -> np.ndarray:
+        """
+        Return embeddings for texts, encoding only the ones not already cached.
+        embed_fn is awaited on the deduplicated misses.
+        """
+        keys = [content_key(self.model_name, text) for text in texts]
+        cached = await self.get_many(list(set(keys)))
+        missing = {key: text for key, text in zip(keys, texts, strict=True) if key not in cached}
+        hits = sum(key in cached for key in keys)
+        embedding_cache_hits_total.add(hits)
+        embedding_cache_misses_total.add(len(keys) - hits)
+        if missing:
+            encoded = await embed_fn(list(missing.values()))
+            fresh = dict(zip(missing.keys(), encoded, strict=True))
+            await self.put_many(fresh)
+            cached.update(fresh)
+        if not keys:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.stack([cached[key] for key in keys]).astype(np.float32, copy=False)
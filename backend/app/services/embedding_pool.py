@@ -0,0 +1,155 @@
+"""
+Process-pool embedding for ingestion.
+
+Each worker process loads the encoder once and embeds shards of up to shard_size texts. Vectors
+come back through shared-memory buffers owned by the parent instead of being pickled: a shard
+borrows a free buffer, the worker writes its (rows, dim) float32 block into it, and the parent
+copies it out and returns the buffer. The number of buffers bounds the shards in flight, so
+callers that submit faster than the workers encode simply wait for a buffer.
+"""
+
+import asyncio
+import multiprocessing
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from app.services.embedding_backends import EmbeddingBackend, build_backend
+
+# Per-process encoder, set by _init_worker
+_worker_backend: EmbeddingBackend | None = None
+
+
+def _init_worker(model_name: str, backend: str | None, intra_op_threads: int) -> None:
+    global _worker_backend
+    _worker_backend = build_backend(model_name, backend, intra_op_threads=intra_op_threads)
+
+
+def _dimension() -> int:
+    assert _worker_backend is not None
+    return int(_worker_backend.encode(["dimension"]).shape[1])
+
+
+def _encode_into(texts: list[str], buffer_name: str, dimension: int) -> tuple[int, float]:
+    """Encode texts into the named shared buffer; returns (worker pid, encode seconds)."""
+    assert _worker_backend is not None
+    start_time = time.perf_counter()
+    vectors = _worker_backend.encode(texts, batch_size=len(texts))
+    buffer = shared_memory.SharedMemory(name=buffer_name)
+    try:
+        out = np.ndarray((len(texts), dimension), dtype=np.float32, buffer=buffer.buf)
+        out[:] = vectors
+        del out  # release the export so close() succeeds
+    finally:
+        buffer.close()
+    return os.getpid(), time.perf_counter() - start_time
+
+
+@dataclass
+class WorkerStats:
+    rows: int = 0
+    seconds: float = 0.0
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+
+class ProcessEmbeddingPool:
+    def __init__(
+        self,
+        model_name: str,
+        workers: int,
+        shard_size: int = 128,
+        max_inflight: int | None = None,
+        backend: str | None = None,
+        intra_op_threads: int | None = None,
+    ):
+        self.model_name = model_name
+        self.workers = workers
+        self.shard_size = shard_size
+        self.max_inflight = max_inflight or 2 * workers  # keeps every worker fed between shards
+        # Split the cores between workers instead of letting each one claim all of them
+        self.intra_op_threads = intra_op_threads or max(1, (os.cpu_count() or 1) // workers)
+        self.backend = backend
+        self.dimension = 0
+        self.stats: dict[int, WorkerStats] = {}
+        self._executor: ProcessPoolExecutor | None = None
+        self._buffers: list[shared_memory.SharedMemory] = []
+        self._free: asyncio.Queue[shared_memory.SharedMemory] | None = None
+
+    async def start(self) -> None:
+        """Spawn the workers, wait for the model to load, and allocate the shared buffers."""
+        # spawn, not fork: forking a parent that has started torch/ORT thread pools can deadlock
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name, self.backend, self.intra_op_threads),
+        )
+        loop = asyncio.get_running_loop()
+        self.dimension = await loop.run_in_executor(self._executor, _dimension)
+        self._free = asyncio.Queue()
+        for _ in range(self.max_inflight):
+            buffer = shared_memory.SharedMemory(
+                create=True, size=self.shard_size * self.dimension * 4
+            )
+            self._buffers.append(buffer)
+            self._free.put_nowait(buffer)
+
+    async def close(self) -> None:
+        if self._executor is not None:
+            await asyncio.to_thread(self._executor.shutdown)
+            self._executor = None
+        for buffer in self._buffers:
+            buffer.close()
+            buffer.unlink()
+        self._buffers = []
+        self._free = None
+
+    async def embed(self, texts: list[str]) -> np.ndarray:
+        """Embed texts across the workers; rows follow the input order."""
+        shards = [texts[i : i + self.shard_size] for i in range(0, len(texts), self.shard_size)]
+        if not shards:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        return np.concatenate(await asyncio.gather(*(self._embed_shard(s) for s in shards)))
+
+    async def _embed_shard(self, texts: list[str]) -> np.ndarray:
+        if self._executor is None or self._free is None:
+            raise RuntimeError("ProcessEmbeddingPool.start() must be awaited first")
+        loop = asyncio.get_running_loop()
+        free = self._free
+        buffer = await free.get()  # backpressure: wait for a free buffer
+        future = self._executor.submit(_encode_into, texts, buffer.name, self.dimension)
+        try:
+            pid, seconds = await asyncio.wrap_future(future)
+            view = np.ndarray((len(texts), self.dimension), dtype=np.float32, buffer=buffer.buf)
+            vectors = view.copy()
+            del view
+        finally:
+            if future.done():
+                free.put_nowait(buffer)
+            else:
+                # Cancelled while a worker is still writing into the buffer: recycle it only
+                # once that shard has finished, or the next shard could be overwritten.
+                future.add_done_callback(
+                    lambda _: loop.call_soon_threadsafe(free.put_nowait, buffer)
+                )
+        stats = self.stats.setdefault(pid, WorkerStats())
+        stats.rows += len(texts)
+        stats.seconds += seconds
+        return vectors
+
+    def worker_stats(self) -> dict[str, dict]:
+        return {
+            str(pid): {
+                "rows": s.rows,
+                "seconds": round(s.seconds, 3),
+                "rows_per_sec": round(s.rows_per_sec, 1),
+            }
+            for pid, s in sorted(self.stats.items())
+        }
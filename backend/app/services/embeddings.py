@@ -1,20 +1,247 @@
-from sentence_transformers import SentenceTransformer
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from opentelemetry import metrics
+from opentelemetry.metrics import CallbackOptions, Observation
 from tenacity import retry, stop_after_attempt, wait_fixed
 
+from app.core import request_metrics
+from app.core.settings import settings
+from app.services.embedding_backends import EmbeddingBackend, build_backend
+
+# Use global meter provider set in main.py
+meter = metrics.get_meter(__name__)
+
+query_cache_hits_total = meter.create_counter(
+    name="query_embedding_cache_hits_total", description="Query embeddings served from the cache"
+)
+query_cache_misses_total = meter.create_counter(
+    name="query_embedding_cache_misses_total",
+    description="Query embeddings that required a forward pass",
+)
+query_batch_size_histogram = meter.create_histogram(
+    name="query_embedding_batch_size",
+    description="Number of distinct queries encoded per micro-batched forward pass",
+)
+
+
+class QueryEmbeddingCache:
+    """
+    Thread-safe, bounded LRU cache of query embeddings with a per-entry TTL.
+    Cached arrays are returned as-is (no copy) and are marked read-only so callers can't
+    mutate a shared entry.
+    """
+
+    def __init__(self, max_entries: int, ttl_s: float):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self._entries: OrderedDict[tuple[str, str], tuple[float, np.ndarray]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(text.split())
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, model_name: str, text: str) -> np.ndarray | None:
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                query_cache_misses_total.add(1)
+                return None
+            self._entries.move_to_end(key)
+        query_cache_hits_total.add(1)
+        return entry[1]
+
+    def put(self, model_name: str, text: str, embedding: np.ndarray) -> None:
+        if self.max_entries <= 0:
+            return
+        embedding.flags.writeable = False
+        key = (model_name, self.normalize(text))
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_s, embedding)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+# Shared by every LocalEmbeddingService in the process; keys include the model name
+query_embedding_cache = QueryEmbeddingCache(
+    max_entries=settings.query_embedding_cache_size,
+    ttl_s=settings.query_embedding_cache_ttl_s,
+)
+
+
+def _observe_cache_size(options: CallbackOptions) -> list[Observation]:
+    return [Observation(len(query_embedding_cache))]
+
+
+meter.create_observable_gauge(
+    name="query_embedding_cache_entries",
+    callbacks=[_observe_cache_size],
+    description="Number of query embeddings currently cached",
+)
+
+
+class QueryEmbeddingBatcher:
+    """
+    Coalesces concurrent query-embedding requests into one encode call.
+
+    Callers await a future; a dispatcher task on the event loop waits up to max_wait_ms for
+    more requests (or until max_batch_size is reached), then runs the whole batch on a
+    dedicated worker thread so the forward pass never blocks the loop. Requests that arrive
+    while a batch is encoding are picked up together in the next one, so batches grow with load.
+    """
+
+    def __init__(
+        self,
+        encode_fn: Callable[[list[str]], np.ndarray],
+        max_batch_size: int = 32,
+        max_wait_ms: float = 2.0,
+    ):
+        self.encode_fn = encode_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed-query")
+        self._pending: list[tuple[str, asyncio.Future]] = []
+        self._wakeup: asyncio.Event | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._dispatcher: asyncio.Task | None = None
+
+    def _ensure_dispatcher(self) -> asyncio.Event:
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            self._pending = []  # futures bound to a previous (closed) loop can't be resolved
+        if self._loop is not loop or self._dispatcher is None or self._dispatcher.done():
+            self._loop = loop
+            self._wakeup = asyncio.Event()
+            self._dispatcher = loop.create_task(self._dispatch(self._wakeup))
+        assert self._wakeup is not None
+        return self._wakeup
+
+    async def embed(self, text: str) -> np.ndarray:
+        wakeup = self._ensure_dispatcher()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((text, future))
+        wakeup.set()
+        return await future
+
+    async def _dispatch(self, wakeup: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            await wakeup.wait()
+            if len(self._pending) < self.max_batch_size and self.max_wait_s > 0:
+                await asyncio.sleep(self.max_wait_s)  # let concurrent callers join this batch
+            batch = self._pending[: self.max_batch_size]
+            self._pending = self._pending[self.max_batch_size :]
+            if not self._pending:
+                wakeup.clear()
+            batch = [(text, future) for text, future in batch if not future.cancelled()]
+            if not batch:
+                continue
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            query_batch_size_histogram.record(len(texts))
+            try:
+                embeddings = await loop.run_in_executor(self._executor, self.encode_fn, texts)
+            except Exception as exc:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            by_text = dict(zip(texts, embeddings, strict=True))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+
 
 class LocalEmbeddingService:
-    def __init__(self, model_name: str = "sentence-transformers/all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
+        backend: str | None = None,
+    ):
         self.model_name = model_name
-        self.model = SentenceTransformer(model_name)
+        self.backend_name = backend or settings.embedding_backend  # "torch" or "onnx"
+        self._backend: EmbeddingBackend | None = None
+        self._backend_lock = threading.Lock()
+        self.query_batcher = QueryEmbeddingBatcher(
+            self._encode_queries,
+            max_batch_size=settings.query_batch_max_size,
+            max_wait_ms=settings.query_batch_max_wait_ms,
+        )
+
+    @property
+    def backend(self) -> EmbeddingBackend:
+        """The encoder, loaded on first use (or by warmup) rather than at construction."""
+        if self._backend is None:
+            with self._backend_lock:
+                if self._backend is None:
+                    self._backend = build_backend(self.model_name, self.backend_name)
+        return self._backend
+
+    @property
+    def loaded(self) -> bool:
+        return self._backend is not None
+
+    def load(self) -> EmbeddingBackend:
+        return self.backend
+
+    def warmup(self) -> None:
+        """Run one throwaway encode so the first real request doesn't pay for lazy init."""
+        self.backend.encode(["warmup"])
+
+    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+    def embed_documents(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Embed a list of documents (strings) into a float32 matrix, one row per text.
+        Retries on failure.
+        """
+        return self.backend.encode(texts, batch_size=batch_size)
+
+    def embed_query(self, text: str) -> np.ndarray:
+        """
+        Embed a single query string into a read-only float32 vector, served from the query
+        cache when the same (whitespace-normalized) text was embedded recently.
+        """
+        embedding = query_embedding_cache.get(self.model_name, text)
+        if embedding is None:
+            embedding = self._encode_query(text)
+            query_embedding_cache.put(self.model_name, text, embedding)
+        return embedding
+
+    async def aembed_query(self, text: str) -> np.ndarray:
+        """
+        Async embed_query for request handlers: cache hits return immediately, misses are
+        micro-batched with other in-flight queries and encoded off the event loop.
+        """
+        with request_metrics.stage("embed"):
+            embedding = query_embedding_cache.get(self.model_name, text)
+            request_metrics.record(embed_cache_hit=embedding is not None)
+            if embedding is None:
+                embedding = await self.query_batcher.embed(text)
+                query_embedding_cache.put(self.model_name, text, embedding)
+        return embedding
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def embed_documents(self, texts: list[str]) -> list[list[float]]:
-        """Embed a list of documents (strings) into vectors. Retries on failure."""
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+    def _encode_query(self, text: str) -> np.ndarray:
+        """Run the forward pass for one query. Retries on failure."""
+        return self.backend.encode([text])[0]
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def embed_query(self, text: str) -> list[float]:
-        """Embed a single query string into a vector. Retries on failure."""
-        embedding = self.model.encode([text], convert_to_numpy=True)[0]
-        return embedding.tolist()
+    def _encode_queries(self, texts: list[str]) -> np.ndarray:
+        """Run one forward pass for a micro-batch of queries. Retries on failure."""
+        return self.backend.encode(texts, batch_size=len(texts))
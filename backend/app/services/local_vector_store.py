@@ -0,0 +1,651 @@
+"""
+Local, memory-mapped replica of the documents table for latency-critical vector reads.
+
+One generation of files lives in settings.local_index_path at a time:
+
+    manifest.json      {"generation", "count", "dim", "hnsw_count"}, replaced atomically
+    vectors.<g>.f32    (count, dim) float32 embeddings, append-only
+    rows.<g>.i64       (count, 2) Postgres (id, version) per row; id -1 marks a deleted row
+    offsets.<g>.i64    (count,) end offset of each row's payload
+    payload.<g>.bin    JSON [doc_id, chunk_idx, chunk, metadata, token_count] per row
+    hnsw.<g>.bin       optional hnswlib graph over the first hnsw_count rows
+
+Every worker maps the files read-only, so the vectors sit in the page cache once however many
+workers share them. Whichever process holds sync.lock reads the rows changed or deleted in
+Postgres since its last sync, appends new and changed rows and tombstones replaced or deleted
+ones; readers see appended rows on their next query via the manifest. Once enough rows are
+tombstoned the writer compacts into a new generation. Postgres stays the source of truth.
+
+    python -m app.services.local_vector_store sync
+"""
+
+import argparse
+import asyncio
+import fcntl
+import json
+import os
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import IO, Any
+
+import numpy as np
+from loguru import logger
+from psycopg import AsyncConnection
+
+from app.core.settings import settings
+from app.models import MetadataFilters
+from app.services.db import close_pool, connection, open_pool
+from app.services.vectordb import EMBEDDING_DIM, SearchResult, VectorDBService, VectorStore
+
+SYNC_FETCH_BATCH = 5000
+# Deletions older than this are pruned from documents_deleted; a replica that falls further
+# behind notices the checksum mismatch and does a full diff
+DELETION_LOG_RETENTION = "7 days"
+
+# (id, version, doc_id, chunk_idx, chunk, embedding, metadata, token_count)
+ReplicaRow = tuple[int, int, str, int, str, np.ndarray, dict | None, int | None]
+
+
+def top_k_rows(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Indices of the top_k highest finite scores, best first (argpartition, then sort k)."""
+    k = min(top_k, len(scores))
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    part = np.argpartition(-scores, k - 1)[:k]
+    best = part[np.argsort(-scores[part], kind="stable")]
+    return best[np.isfinite(scores[best])]
+
+
+@dataclass
+class _Snapshot:
+    generation: int
+    count: int
+    hnsw_count: int
+    vectors: np.ndarray
+    rows: np.ndarray
+    offsets: np.ndarray
+    payload: np.ndarray
+    hnsw: Any | None = None
+
+
+class LocalVectorIndex:
+    """The files in one directory: a read-only view for queries plus the writer's operations."""
+
+    def __init__(self, path: Path, dim: int = EMBEDDING_DIM, use_hnsw: bool = False):
+        self.path = path
+        self.dim = dim
+        self.use_hnsw = use_hnsw
+        self._snapshot: _Snapshot | None = None
+        self._manifest_mtime: int | None = None
+        # Writer state: Postgres id -> (row, version) for live rows, built on first use
+        self._live: dict[int, tuple[int, int]] | None = None
+
+    def _file(self, kind: str, generation: int) -> Path:
+        suffix = {"vectors": "f32", "rows": "i64", "offsets": "i64", "payload": "bin"}
+        return self.path / f"{kind}.{generation}.{suffix.get(kind, 'bin')}"
+
+    def read_manifest(self) -> dict | None:
+        try:
+            return json.loads((self.path / "manifest.json").read_text())
+        except FileNotFoundError:
+            return None
+
+    def _write_manifest(self, manifest: dict) -> None:
+        tmp = self.path / "manifest.json.tmp"
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, self.path / "manifest.json")
+
+    # --- Reads ---
+    def snapshot(self) -> _Snapshot | None:
+        """The current mapping, remapped when the manifest changed (one stat per call)."""
+        try:
+            mtime = (self.path / "manifest.json").stat().st_mtime_ns
+        except FileNotFoundError:
+            return None
+        if mtime != self._manifest_mtime:
+            manifest = self.read_manifest()
+            self._snapshot = self._map(manifest) if manifest else None
+            self._manifest_mtime = mtime
+        return self._snapshot
+
+    def _map(self, manifest: dict) -> _Snapshot | None:
+        generation, count = manifest["generation"], manifest["count"]
+        if count == 0:
+            return None
+        offsets = np.memmap(
+            self._file("offsets", generation), dtype=np.int64, mode="r", shape=(count,)
+        )
+        previous = self._snapshot
+        hnsw = None
+        hnsw_count = manifest.get("hnsw_count", 0)
+        if (
+            previous is not None
+            and previous.generation == generation
+            and previous.hnsw_count == hnsw_count
+        ):
+            hnsw = previous.hnsw
+        elif hnsw_count:
+            hnsw = self._load_hnsw(generation)
+        return _Snapshot(
+            generation=generation,
+            count=count,
+            hnsw_count=hnsw_count if hnsw is not None else 0,
+            vectors=np.memmap(
+                self._file("vectors", generation),
+                dtype=np.float32,
+                mode="r",
+                shape=(count, self.dim),
+            ),
+            rows=np.memmap(
+                self._file("rows", generation), dtype=np.int64, mode="r", shape=(count, 2)
+            ),
+            offsets=offsets,
+            payload=np.memmap(
+                self._file("payload", generation),
+                dtype=np.uint8,
+                mode="r",
+                shape=(int(offsets[-1]),),
+            ),
+            hnsw=hnsw,
+        )
+
+    def _load_hnsw(self, generation: int) -> Any | None:
+        import hnswlib
+
+        path = self._file("hnsw", generation)
+        if not path.exists():
+            return None
+        graph = hnswlib.Index(space="ip", dim=self.dim)
+        graph.load_index(str(path))
+        return graph
+
+    def search(
+        self,
+        query: np.ndarray,
+        top_k: int,
+        ef_search: int | None = None,
+        exact: bool = False,
+    ) -> list[SearchResult]:
+        """Top-k rows by inner product; distances are negative inner products, like <#>."""
+        snap = self.snapshot()
+        if snap is None:
+            return []
+        query = np.asarray(query, dtype=np.float32)
+        found = None if exact else self._hnsw_candidates(snap, query, top_k, ef_search)
+        if found is None:
+            candidates, scores = np.arange(snap.count), snap.vectors @ query
+        else:
+            candidates, scores = found
+        scores = np.where(snap.rows[candidates, 0] >= 0, scores, -np.inf)
+        results = []
+        for i in top_k_rows(scores, top_k):
+            row = int(candidates[i])
+            start = int(snap.offsets[row - 1]) if row else 0
+            doc_id, chunk_idx, chunk, metadata, token_count = json.loads(
+                snap.payload[start : snap.offsets[row]].tobytes()
+            )
+            results.append(
+                SearchResult(doc_id, chunk_idx, chunk, -float(scores[i]), metadata, token_count)
+            )
+        return results
+
+    @staticmethod
+    def _hnsw_candidates(
+        snap: _Snapshot, query: np.ndarray, top_k: int, ef_search: int | None
+    ) -> tuple[np.ndarray, np.ndarray] | None:
+        """
+        (row numbers, inner products) of the graph's nearest rows plus every row appended
+        since the graph was saved, or None to fall back to brute force.
+        """
+        if snap.hnsw is None:
+            return None
+        k = min(snap.hnsw_count, 2 * top_k)  # headroom for rows deleted since the save
+        snap.hnsw.set_ef(max(ef_search or 40, k))
+        try:
+            labels, distances = snap.hnsw.knn_query(query, k=k)
+        except RuntimeError:  # fewer live graph nodes than k
+            return None
+        tail = np.arange(snap.hnsw_count, snap.count)
+        candidates = np.concatenate([labels[0].astype(np.int64), tail])
+        return candidates, np.concatenate([1.0 - distances[0], snap.vectors[tail] @ query])
+
+    # --- Writes (only by the holder of the sync lock) ---
+    def live_versions(self) -> dict[int, int]:
+        if self._live is None:
+            self._live = {}
+            manifest = self.read_manifest()
+            if manifest and manifest["count"]:
+                rows = np.fromfile(self._file("rows", manifest["generation"]), dtype=np.int64)
+                rows = rows[: manifest["count"] * 2].reshape(-1, 2)
+                for row, (doc_row_id, version) in enumerate(rows.tolist()):
+                    if doc_row_id >= 0:
+                        self._live[doc_row_id] = (row, version)
+        return {doc_row_id: version for doc_row_id, (_, version) in self._live.items()}
+
+    def apply(self, upserts: list[ReplicaRow], deletes: list[int]) -> dict:
+        """
+        Append upserted rows, then tombstone the rows they replace and deleted ids. Appends
+        (and the HNSW graph covering them) are published in the manifest before any tombstone
+        is written, so a reader never finds a changed chunk in neither version.
+        """
+        self.path.mkdir(parents=True, exist_ok=True)
+        self.live_versions()
+        assert self._live is not None
+        manifest = self.read_manifest() or {
+            "generation": 0,
+            "count": 0,
+            "dim": self.dim,
+            "hnsw_count": 0,
+        }
+        generation, start = manifest["generation"], manifest["count"]
+        stale = [self._live.pop(i)[0] for i in deletes if i in self._live]
+        stale += [self._live[row[0]][0] for row in upserts if row[0] in self._live]
+        if upserts:
+            self._append(generation, start, upserts)
+            for offset, row in enumerate(upserts):
+                self._live[row[0]] = (start + offset, row[1])
+            manifest["count"] = start + len(upserts)
+        if self.use_hnsw and (upserts or stale):
+            manifest["hnsw_count"] = self._update_hnsw(generation, manifest, stale)
+        if upserts or stale:
+            self._write_manifest(manifest)
+        if stale:
+            rows = np.memmap(
+                self._file("rows", generation),
+                dtype=np.int64,
+                mode="r+",
+                shape=(manifest["count"], 2),
+            )
+            rows[stale, 0] = -1
+            rows.flush()
+            del rows
+        tombstoned = manifest["count"] - len(self._live)
+        if (
+            manifest["count"]
+            and tombstoned / manifest["count"] > settings.local_index_compact_ratio
+        ):
+            self.compact()
+        return {"upserted": len(upserts), "deleted": len(deletes), "rows": len(self._live)}
+
+    def _append(self, generation: int, start: int, rows: list[ReplicaRow]) -> None:
+        offsets_path = self._file("offsets", generation)
+        end = 0
+        if start:
+            end = int(np.fromfile(offsets_path, dtype=np.int64, count=start, offset=0)[-1])
+        files: dict[str, IO[bytes]] = {
+            kind: self._file(kind, generation).open("r+b" if start else "wb")
+            for kind in ("vectors", "rows", "offsets", "payload")
+        }
+        try:
+            # Truncate anything a crashed writer left past the published count
+            files["vectors"].truncate(start * self.dim * 4)
+            files["rows"].truncate(start * 16)
+            files["offsets"].truncate(start * 8)
+            files["payload"].truncate(end)
+            for f in files.values():
+                f.seek(0, os.SEEK_END)
+            payloads = [
+                json.dumps([doc_id, chunk_idx, chunk, metadata, token_count]).encode()
+                for _, _, doc_id, chunk_idx, chunk, _, metadata, token_count in rows
+            ]
+            ends = end + np.cumsum([len(p) for p in payloads], dtype=np.int64)
+            files["vectors"].write(
+                np.stack([np.asarray(row[5], dtype=np.float32) for row in rows]).tobytes()
+            )
+            files["rows"].write(np.array([row[:2] for row in rows], dtype=np.int64).tobytes())
+            files["offsets"].write(ends.tobytes())
+            files["payload"].write(b"".join(payloads))
+            for f in files.values():
+                f.flush()
+                os.fsync(f.fileno())
+        finally:
+            for f in files.values():
+                f.close()
+
+    def _update_hnsw(self, generation: int, manifest: dict, stale: list[int]) -> int:
+        import hnswlib
+
+        path = self._file("hnsw", generation)
+        graph = hnswlib.Index(space="ip", dim=self.dim)
+        indexed = manifest.get("hnsw_count", 0)
+        if indexed and path.exists():
+            graph.load_index(str(path), max_elements=manifest["count"])
+        else:
+            graph.init_index(
+                max_elements=max(manifest["count"], 1),
+                M=settings.hnsw_m,
+                ef_construction=settings.hnsw_ef_construction,
+            )
+            indexed = 0
+        graph.resize_index(max(manifest["count"], 1))
+        if manifest["count"] > indexed:
+            vectors = np.memmap(
+                self._file("vectors", generation),
+                dtype=np.float32,
+                mode="r",
+                shape=(manifest["count"], self.dim),
+            )
+            graph.add_items(np.asarray(vectors[indexed:]), np.arange(indexed, manifest["count"]))
+        for row in stale:
+            if row < manifest["count"]:
+                try:
+                    graph.mark_deleted(row)
+                except RuntimeError:  # already deleted
+                    pass
+        tmp = path.with_suffix(".tmp")
+        graph.save_index(str(tmp))
+        os.replace(tmp, path)
+        return manifest["count"]
+
+    def compact(self) -> None:
+        """Rewrite the live rows into a new generation and drop the old files."""
+        assert self._live is not None
+        manifest = self.read_manifest()
+        if not manifest:
+            return
+        old = manifest["generation"]
+        vectors = np.memmap(
+            self._file("vectors", old),
+            dtype=np.float32,
+            mode="r",
+            shape=(manifest["count"], self.dim),
+        )
+        offsets = np.fromfile(self._file("offsets", old), dtype=np.int64, count=manifest["count"])
+        payload = self._file("payload", old).read_bytes()
+        rows: list[ReplicaRow] = []
+        for doc_row_id, (row, version) in sorted(self._live.items(), key=lambda kv: kv[1][0]):
+            start = int(offsets[row - 1]) if row else 0
+            doc_id, chunk_idx, chunk, metadata, token_count = json.loads(
+                payload[start : offsets[row]]
+            )
+            rows.append(
+                (doc_row_id, version, doc_id, chunk_idx, chunk, vectors[row], metadata, token_count)
+            )
+        new = old + 1
+        self._live = {}
+        if rows:
+            self._append(new, 0, rows)
+            self._live = {row[0]: (i, row[1]) for i, row in enumerate(rows)}
+        manifest = {"generation": new, "count": len(rows), "dim": self.dim, "hnsw_count": 0}
+        if self.use_hnsw and rows:
+            manifest["hnsw_count"] = self._update_hnsw(new, manifest, [])
+        self._write_manifest(manifest)
+        del vectors
+        # Readers still mapping the old generation keep their pages until they remap
+        for kind in ("vectors", "rows", "offsets", "payload", "hnsw"):
+            self._file(kind, old).unlink(missing_ok=True)
+        logger.info(f"Compacted local vector index to generation {new} ({len(rows)} rows)")
+
+
+def _checksum(
+    local: dict[int, int], upserts: list[ReplicaRow], deletes: list[int]
+) -> tuple[int, int]:
+    """(row count, version sum) the replica will have once upserts and deletes are applied."""
+    count, total = len(local), sum(local.values())
+    for doc_row_id in deletes:
+        count -= 1
+        total -= local[doc_row_id]
+    for row in upserts:
+        if row[0] in local:
+            total += row[1] - local[row[0]]
+        else:
+            count += 1
+            total += row[1]
+    return count, total
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Vector retrieval from a LocalVectorIndex replica. Lexical and filtered searches, and reads
+    before the first sync, go to Postgres.
+    """
+
+    def __init__(
+        self,
+        postgres: VectorDBService,
+        path: str | None = None,
+        sync_interval_s: float | None = None,
+        use_hnsw: bool | None = None,
+    ):
+        self.postgres = postgres
+        self.index = LocalVectorIndex(
+            Path(path or settings.local_index_path),
+            use_hnsw=settings.local_index_hnsw if use_hnsw is None else use_hnsw,
+        )
+        self.sync_interval_s = sync_interval_s or settings.local_index_sync_interval_s
+        self._lock_file: IO[bytes] | None = None
+        self._sync_task: asyncio.Task | None = None
+        self._applying: asyncio.Future | None = None
+        self._watermark: int | None = None  # highest version synced; None forces a full diff
+
+    async def start(self) -> None:
+        await self.ensure_schema()
+        self._sync_task = asyncio.create_task(self._sync_loop())
+
+    async def stop(self) -> None:
+        if self._sync_task is not None:
+            self._sync_task.cancel()
+            try:
+                await self._sync_task
+            except asyncio.CancelledError:
+                pass
+            self._sync_task = None
+        if self._applying is not None:
+            # A cancelled sync leaves its apply running in a thread: let it finish writing
+            # before another process can take the lock
+            try:
+                await self._applying
+            except Exception as e:
+                logger.warning(f"Local vector index sync failed: {e}")
+            self._applying = None
+        if self._lock_file is not None:
+            self._lock_file.close()  # releases the flock
+            self._lock_file = None
+
+    def acquire_writer(self, blocking: bool = False) -> bool:
+        """Become the one process that syncs this directory; held until stop()."""
+        if self._lock_file is None:
+            self.index.path.mkdir(parents=True, exist_ok=True)
+            lock_file = (self.index.path / "sync.lock").open("wb")
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                lock_file.close()
+                return False
+            self._lock_file = lock_file
+        return True
+
+    async def _sync_loop(self) -> None:
+        while True:
+            if self.acquire_writer():
+                try:
+                    stats = await self.sync()
+                    if stats["upserted"] or stats["deleted"]:
+                        logger.info(json.dumps({"local_vector_store.sync": stats}))
+                except Exception as e:
+                    logger.warning(f"Local vector index sync failed: {e}")
+            await asyncio.sleep(self.sync_interval_s)
+
+    async def ensure_schema(self) -> None:
+        """Version index and deletion log that sync reads changes from."""
+        async with connection() as conn:
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_version ON documents(version);"
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS documents_deleted (
+                    id INT NOT NULL,
+                    version BIGINT NOT NULL DEFAULT nextval('documents_version_seq'),
+                    deleted_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_deleted_version "
+                "ON documents_deleted(version);"
+            )
+            await conn.execute(
+                """
+                CREATE OR REPLACE FUNCTION log_documents_deleted() RETURNS trigger
+                LANGUAGE plpgsql AS $$
+                BEGIN
+                    INSERT INTO documents_deleted (id) SELECT id FROM deleted_rows;
+                    RETURN NULL;
+                END $$;
+                """
+            )
+            await conn.execute(
+                """
+                CREATE OR REPLACE TRIGGER documents_deleted_log AFTER DELETE ON documents
+                REFERENCING OLD TABLE AS deleted_rows
+                FOR EACH STATEMENT EXECUTE FUNCTION log_documents_deleted();
+                """
+            )
+
+    async def sync(self) -> dict:
+        """
+        Bring the replica up to date. The caller must hold the writer lock.
+
+        Rows with a version above the last synced one are new or changed, and deletions come
+        from documents_deleted, versioned by the same sequence, so a sync reads only what
+        changed. A row count and version sum taken in the same snapshot checks the result:
+        rows committed out of version order, a TRUNCATE or a pruned deletion log show up as a
+        mismatch and, like the first sync, fall back to diffing (id, version) for every row.
+        """
+        start_time = time.perf_counter()
+        local = self.index.live_versions()
+        async with connection() as conn:
+            # One snapshot for the changes and the checksum they are verified against
+            await conn.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ")
+            cur = await conn.execute(
+                "SELECT count(*), coalesce(sum(version), 0), "
+                "greatest(max(version), (SELECT max(version) FROM documents_deleted)) "
+                "FROM documents"
+            )
+            row = await cur.fetchone()
+            assert row is not None
+            remote_count, remote_sum, watermark = row[0], int(row[1]), row[2] or 0
+            full = True
+            if self._watermark is not None:
+                upserts, deletes = await self._changes_since(conn, self._watermark, local)
+                full = _checksum(local, upserts, deletes) != (remote_count, remote_sum)
+            if full:
+                upserts, deletes = await self._full_diff(conn, local)
+            await conn.execute(
+                "DELETE FROM documents_deleted WHERE deleted_at < NOW() - %s::interval",
+                (DELETION_LOG_RETENTION,),
+            )
+        # Shielded: if stop() cancels the sync, the apply thread keeps writing regardless, and
+        # stop() waits for it before releasing the lock
+        applying = asyncio.ensure_future(asyncio.to_thread(self.index.apply, upserts, deletes))
+        self._applying = applying
+        try:
+            stats = await asyncio.shield(applying)
+        finally:
+            if applying.done():
+                self._applying = None
+        self._watermark = watermark
+        stats["full_diff"] = full
+        stats["seconds"] = round(time.perf_counter() - start_time, 3)
+        return stats
+
+    async def _changes_since(
+        self, conn: AsyncConnection, watermark: int, local: dict[int, int]
+    ) -> tuple[list[ReplicaRow], list[int]]:
+        cur = await conn.execute(
+            "SELECT id, version, doc_id, chunk_idx, chunk, embedding, metadata, token_count "
+            "FROM documents WHERE version > %s ORDER BY id",
+            (watermark,),
+        )
+        upserts = [row for row in await cur.fetchall() if local.get(row[0]) != row[1]]
+        cur = await conn.execute(
+            "SELECT id FROM documents_deleted WHERE version > %s", (watermark,)
+        )
+        deletes = [doc_row_id for (doc_row_id,) in await cur.fetchall() if doc_row_id in local]
+        return upserts, deletes
+
+    async def _full_diff(
+        self, conn: AsyncConnection, local: dict[int, int]
+    ) -> tuple[list[ReplicaRow], list[int]]:
+        cur = await conn.execute("SELECT id, version FROM documents")
+        remote: dict[int, int] = dict(await cur.fetchall())
+        changed = [i for i, version in remote.items() if local.get(i) != version]
+        deletes = [i for i in local if i not in remote]
+        upserts: list[ReplicaRow] = []
+        for offset in range(0, len(changed), SYNC_FETCH_BATCH):
+            cur = await conn.execute(
+                "SELECT id, version, doc_id, chunk_idx, chunk, embedding, metadata, "
+                "token_count FROM documents WHERE id = ANY(%s) ORDER BY id",
+                (changed[offset : offset + SYNC_FETCH_BATCH],),
+            )
+            upserts.extend(await cur.fetchall())
+        return upserts, deletes
+
+    async def query_similar(
+        self,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 3,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        exact: bool = False,
+        filters: MetadataFilters | None = None,
+    ) -> list[SearchResult]:
+        if filters or self.index.snapshot() is None:
+            return await self.postgres.query_similar(
+                query_embedding,
+                top_k=top_k,
+                ef_search=ef_search,
+                probes=probes,
+                exact=exact,
+                filters=filters,
+            )
+        start_time = time.time()
+        results = await asyncio.to_thread(
+            self.index.search, np.asarray(query_embedding), top_k, ef_search, exact
+        )
+        VectorDBService.retrieval_latency_histogram.record(
+            time.time() - start_time, {"exact": exact, "leg": "vector", "store": "local"}
+        )
+        return results
+
+    async def lexical_search(
+        self,
+        query_text: str,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 3,
+        filters: MetadataFilters | None = None,
+    ) -> list[SearchResult]:
+        return await self.postgres.lexical_search(
+            query_text, query_embedding, top_k=top_k, filters=filters
+        )
+
+
+async def _main(args: argparse.Namespace) -> None:
+    await open_pool()
+    store = LocalVectorStore(VectorDBService(), path=args.path)
+    try:
+        await store.postgres.ensure_schema()
+        await store.ensure_schema()
+        store.acquire_writer(blocking=True)
+        stats = await store.sync()
+        if args.compact:
+            await asyncio.to_thread(store.index.compact)
+        print(json.dumps({**stats, "manifest": store.index.read_manifest()}, indent=2))
+    finally:
+        await store.stop()
+        await close_pool()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Sync the local vector index from Postgres.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sync = sub.add_parser("sync", help="apply new, changed and deleted rows")
+    sync.add_argument("--path", default=settings.local_index_path)
+    sync.add_argument("--compact", action="store_true", help="also rewrite without tombstones")
+    asyncio.run(_main(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
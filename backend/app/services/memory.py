@@ -1,33 +1,228 @@
+import time
 import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field
 from typing import TypedDict
 
+from app.core.settings import settings
+from app.services.db import connection
+
 
 class Message(TypedDict):
     role: str  # "user" | "ai"
     content: str
 
 
-class ConversationMemory:
-    """Simple in-memory conversation store. NOT persistent, for prototyping."""
+class ConversationMemory(ABC):
+    """Conversation store interface. Backends are selected with settings.memory_backend."""
+
+    async def ensure_schema(self) -> None:
+        """Create any backing storage. No-op for in-process backends."""
+        return None
+
+    async def create_conversation(self) -> str:
+        return str(uuid.uuid4())
+
+    @abstractmethod
+    async def append(self, conversation_id: str, role: str, content: str) -> None: ...
+
+    @abstractmethod
+    async def get(self, conversation_id: str) -> list[Message]: ...
+
+    @abstractmethod
+    async def last_n(self, conversation_id: str, n: int) -> list[Message]: ...
+
+    @abstractmethod
+    async def count(self, conversation_id: str) -> int: ...
+
+
+@dataclass
+class _Conversation:
+    messages: deque[Message]
+    last_active: float = field(default_factory=time.monotonic)
+
+
+class InMemoryConversationMemory(ConversationMemory):
+    """
+    Bounded in-process store: LRU over conversations, idle TTL, and a per-conversation
+    message cap (oldest messages dropped first). Not shared across workers.
+    """
+
+    def __init__(self, max_conversations: int, idle_ttl_s: float, max_messages: int):
+        self.max_conversations = max_conversations
+        self.idle_ttl_s = idle_ttl_s
+        self.max_messages = max_messages
+        self._store: OrderedDict[str, _Conversation] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._store)
+
+    def _evict(self) -> None:
+        # Least recently active first, so expired conversations are always at the front
+        cutoff = time.monotonic() - self.idle_ttl_s
+        while self._store:
+            oldest = next(iter(self._store.values()))
+            if oldest.last_active >= cutoff and len(self._store) <= self.max_conversations:
+                break
+            self._store.popitem(last=False)
 
-    def __init__(self):
-        self._store: dict[str, list[Message]] = {}
+    def _live(self, conversation_id: str) -> _Conversation | None:
+        conversation = self._store.get(conversation_id)
+        if conversation and conversation.last_active < time.monotonic() - self.idle_ttl_s:
+            del self._store[conversation_id]
+            return None
+        return conversation
 
-    def create_conversation(self) -> str:
-        conversation_id = str(uuid.uuid4())
-        self._store[conversation_id] = []
+    async def create_conversation(self) -> str:
+        conversation_id = await super().create_conversation()
+        self._store[conversation_id] = _Conversation(messages=deque(maxlen=self.max_messages))
+        self._evict()
         return conversation_id
 
-    def append(self, conversation_id: str, role: str, content: str) -> None:
-        if conversation_id not in self._store:
-            self._store[conversation_id] = []
-        self._store[conversation_id].append({"role": role, "content": content})
+    async def append(self, conversation_id: str, role: str, content: str) -> None:
+        conversation = self._live(conversation_id)
+        if conversation is None:
+            conversation = _Conversation(messages=deque(maxlen=self.max_messages))
+            self._store[conversation_id] = conversation
+        conversation.messages.append({"role": role, "content": content})
+        conversation.last_active = time.monotonic()
+        self._store.move_to_end(conversation_id)
+        self._evict()
+
+    async def get(self, conversation_id: str) -> list[Message]:
+        conversation = self._live(conversation_id)
+        return list(conversation.messages) if conversation else []
+
+    async def last_n(self, conversation_id: str, n: int) -> list[Message]:
+        return (await self.get(conversation_id))[-n:]
+
+    async def count(self, conversation_id: str) -> int:
+        conversation = self._live(conversation_id)
+        return len(conversation.messages) if conversation else 0
+
+
+class PostgresConversationMemory(ConversationMemory):
+    """
+    Shared store for multi-worker deployments: any worker can continue any conversation.
+    Conversations idle for longer than idle_ttl_s are purged (messages cascade), checked
+    every purge_every appends per worker.
+    """
+
+    def __init__(self, idle_ttl_s: float, max_messages: int, purge_every: int = 1000):
+        self.idle_ttl_s = idle_ttl_s
+        self.max_messages = max_messages
+        self.purge_every = purge_every
+        self._appends_since_purge = 0
+
+    async def ensure_schema(self) -> None:
+        async with connection() as conn:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversations (
+                    id TEXT PRIMARY KEY,
+                    last_active TIMESTAMPTZ NOT NULL DEFAULT NOW()
+                );
+                """
+            )
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS conversation_messages (
+                    id BIGSERIAL PRIMARY KEY,
+                    conversation_id TEXT NOT NULL REFERENCES conversations(id) ON DELETE CASCADE,
+                    role TEXT NOT NULL,
+                    content TEXT NOT NULL,
+                    created_at TIMESTAMPTZ DEFAULT NOW()
+                );
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversations_last_active "
+                "ON conversations(last_active);"
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_conversation_messages_conversation "
+                "ON conversation_messages(conversation_id, id DESC);"
+            )
+
+    async def append(self, conversation_id: str, role: str, content: str) -> None:
+        async with connection() as conn:
+            await conn.execute(
+                """
+                INSERT INTO conversations (id) VALUES (%s)
+                ON CONFLICT (id) DO UPDATE SET last_active = NOW()
+                """,
+                (conversation_id,),
+            )
+            await conn.execute(
+                "INSERT INTO conversation_messages (conversation_id, role, content) "
+                "VALUES (%s, %s, %s)",
+                (conversation_id, role, content),
+            )
+            # Enforce the per-conversation cap by dropping everything older than the newest N
+            await conn.execute(
+                """
+                DELETE FROM conversation_messages
+                WHERE conversation_id = %(cid)s AND id <= (
+                    SELECT id FROM conversation_messages WHERE conversation_id = %(cid)s
+                    ORDER BY id DESC OFFSET %(cap)s LIMIT 1
+                )
+                """,
+                {"cid": conversation_id, "cap": self.max_messages},
+            )
+        self._appends_since_purge += 1
+        if self._appends_since_purge >= self.purge_every:
+            self._appends_since_purge = 0
+            await self.purge_expired()
+
+    async def purge_expired(self) -> int:
+        async with connection() as conn:
+            cur = await conn.execute(
+                "DELETE FROM conversations WHERE last_active < NOW() - make_interval(secs => %s)",
+                (self.idle_ttl_s,),
+            )
+            return cur.rowcount
+
+    async def _fetch(self, conversation_id: str, limit: int | None) -> list[Message]:
+        async with connection() as conn:
+            cur = await conn.execute(
+                """
+                SELECT role, content FROM (
+                    SELECT id, role, content FROM conversation_messages
+                    WHERE conversation_id = %s ORDER BY id DESC LIMIT %s
+                ) recent ORDER BY id ASC
+                """,
+                (conversation_id, limit),
+            )
+            rows = await cur.fetchall()
+        return [{"role": role, "content": content} for role, content in rows]
+
+    async def get(self, conversation_id: str) -> list[Message]:
+        return await self._fetch(conversation_id, None)
+
+    async def last_n(self, conversation_id: str, n: int) -> list[Message]:
+        return await self._fetch(conversation_id, n)
+
+    async def count(self, conversation_id: str) -> int:
+        async with connection() as conn:
+            cur = await conn.execute(
+                "SELECT count(*) FROM conversation_messages WHERE conversation_id = %s",
+                (conversation_id,),
+            )
+            row = await cur.fetchone()
+        return row[0] if row else 0
 
-    def get(self, conversation_id: str) -> list[Message]:
-        return self._store.get(conversation_id, [])
 
-    def last_n(self, conversation_id: str, n: int) -> list[Message]:
-        return self.get(conversation_id)[-n:]
+def build_memory() -> ConversationMemory:
+    if settings.memory_backend == "postgres":
+        return PostgresConversationMemory(
+            idle_ttl_s=settings.memory_idle_ttl_s, max_messages=settings.memory_max_messages
+        )
+    return InMemoryConversationMemory(
+        max_conversations=settings.memory_max_conversations,
+        idle_ttl_s=settings.memory_idle_ttl_s,
+        max_messages=settings.memory_max_messages,
+    )
 
 
-memory = ConversationMemory()
+memory = build_memory()
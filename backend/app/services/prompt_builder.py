@@ -0,0 +1,131 @@
+from dataclasses import dataclass, field
+
+from opentelemetry import metrics
+
+from app.core.settings import settings
+from app.services.memory import Message
+from app.services.tokens import count_tokens, truncate_tokens
+
+# Use global meter provider set in main.py
+meter = metrics.get_meter(__name__)
+
+prompt_tokens_histogram = meter.create_histogram(
+    name="ai_prompt_tokens", description="Tokens in each assembled /ai/query prompt"
+)
+
+# Sent by AIService.query_llm/stream_llm as the system message
+SYSTEM_PROMPT = "You are a helpful AI investment assistant."
+INSTRUCTIONS = (
+    "You are an investment research assistant. "
+    "Provide a clear, concise answer followed by any necessary reasoning."
+)
+_SEPARATOR_TOKENS = 1  # "\n" between history lines, "\n\n" between chunks
+
+
+@dataclass
+class PromptBudget:
+    total: int
+    system: int
+    history: int
+    question: int
+
+    @classmethod
+    def from_settings(cls) -> "PromptBudget":
+        return cls(
+            total=settings.prompt_token_budget,
+            system=settings.prompt_system_tokens,
+            history=settings.prompt_history_tokens,
+            question=settings.prompt_question_tokens,
+        )
+
+
+@dataclass
+class BuiltPrompt:
+    prompt: str
+    chunks_used: int  # leading retrieved chunks that made it into the context
+    history_used: int  # most recent history messages included
+    tokens: dict[str, int] = field(default_factory=dict)  # per section
+
+    @property
+    def total_tokens(self) -> int:
+        return sum(self.tokens.values())
+
+
+class PromptBuilder:
+    """
+    Assemble the /ai/query prompt within a fixed token budget.
+
+    The system section (system message, instructions, section labels) is fixed and reserves
+    at least its allocation. The question
+    is truncated to its allocation, history keeps the newest messages that fit its allocation,
+    and context takes everything left, adding chunks in rank order until the next one doesn't
+    fit. So oldest history and lowest-ranked chunks are the first to go.
+    """
+
+    def __init__(self, budget: PromptBudget | None = None, system_prompt: str = SYSTEM_PROMPT):
+        self.budget = budget or PromptBudget.from_settings()
+        self.system_prompt = system_prompt
+        labels = "Conversation History:\n\n\nContext:\n\n\nUser Question:\n\n\n"
+        self.system_tokens = count_tokens(system_prompt) + count_tokens(INSTRUCTIONS + labels)
+
+    def _fit_history(self, history: list[Message]) -> list[str]:
+        lines: list[str] = []
+        used = 0
+        for message in reversed(history):
+            line = f"{message['role'].upper()}: {message['content']}"
+            cost = count_tokens(line) + _SEPARATOR_TOKENS
+            if used + cost > self.budget.history:
+                break
+            lines.append(line)
+            used += cost
+        return lines[::-1]
+
+    def build(
+        self,
+        question: str,
+        history: list[Message],
+        chunks: list[tuple[str, int | None]],
+    ) -> BuiltPrompt:
+        """chunks are (text, token_count) in rank order; a None count is computed here."""
+        question = truncate_tokens(question, self.budget.question)
+        question_tokens = count_tokens(question)
+        history_lines = self._fit_history(history)
+        history_block = "\n".join(history_lines)
+        history_tokens = count_tokens(history_block) if history_block else 0
+
+        # The system allocation also leaves headroom for chat-format overhead per message
+        system_reserved = max(self.budget.system, self.system_tokens)
+        context_budget = self.budget.total - system_reserved - question_tokens - history_tokens
+        context: list[str] = []
+        context_tokens = 0
+        for text, token_count in chunks:
+            cost = (token_count if token_count is not None else count_tokens(text)) + (
+                _SEPARATOR_TOKENS if context else 0
+            )
+            if context_tokens + cost > context_budget:
+                if not context and context_budget > 0:
+                    # Never send an empty context because the best chunk alone is too long
+                    text = truncate_tokens(text, context_budget)
+                    context.append(text)
+                    context_tokens = count_tokens(text)
+                break
+            context.append(text)
+            context_tokens += cost
+
+        context_text = "\n\n".join(context)
+        prompt = (
+            f"Conversation History:\n{history_block}\n\n" if history_block else ""
+        ) + f"Context:\n{context_text}\n\nUser Question:\n{question}\n\n{INSTRUCTIONS}"
+        built = BuiltPrompt(
+            prompt=prompt,
+            chunks_used=len(context),
+            history_used=len(history_lines),
+            tokens={
+                "system": self.system_tokens,
+                "history": history_tokens,
+                "context": context_tokens,
+                "question": question_tokens,
+            },
+        )
+        prompt_tokens_histogram.record(built.total_tokens)
+        return built
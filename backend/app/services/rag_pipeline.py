@@ -1,7 +1,46 @@
+import asyncio
+import uuid
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+import numpy as np
+from psycopg import AsyncConnection
+
+from app.core.settings import settings
 from app.models import Document
 from app.services.chunking import ChunkingService
+from app.services.db import connection
+from app.services.embedding_cache import EmbeddingCache
+from app.services.embedding_pool import ProcessEmbeddingPool
 from app.services.embeddings import LocalEmbeddingService
-from app.services.vectordb import VectorDBService
+from app.services.local_vector_store import LocalVectorStore
+from app.services.storage import copy_documents
+from app.services.tokens import count_tokens
+from app.services.vectordb import VectorDBService, VectorStore, chunk_hash
+
+ChunkRow = tuple[str, int, str, np.ndarray, dict, int]  # ..., metadata, LLM token count
+
+
+@dataclass
+class ChunkDiff:
+    """What re-indexing a batch of documents changes in the documents table."""
+
+    reused: list[tuple[int, int, dict]] = field(default_factory=list)  # (row id, idx, meta)
+    added: list[tuple[str, int, str, dict]] = field(default_factory=list)  # (doc, idx, chunk, meta)
+    removed: list[int] = field(default_factory=list)  # row ids
+
+    def stats(self) -> dict:
+        return {
+            "chunks_indexed": len(self.reused) + len(self.added),
+            "chunks_reused": len(self.reused),
+            "chunks_added": len(self.added),
+            "chunks_removed": len(self.removed),
+        }
+
+
+def unique_documents(docs: list[Document]) -> list[Document]:
+    """One document per id, the last copy winning, as copy_documents does for repeated ids."""
+    return list({doc.id or doc.title: doc for doc in docs}.values())
 
 
 class RAGPipeline:
@@ -9,18 +48,148 @@ class RAGPipeline:
         self,
         chunk_size: int = 500,
         chunk_overlap: int = 50,
-        embedding_model: str = "sentence-transformers/all-MiniLM-L6-v2",
+        embedding_model: str | None = None,
     ):
         self.chunker = ChunkingService(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
-        self.embedder = LocalEmbeddingService(model_name=embedding_model)
+        self.embedder = LocalEmbeddingService(
+            model_name=embedding_model or settings.embedding_model
+        )
         self.vectordb = VectorDBService()
+        # Read path for retrieval; writes and index management always go through vectordb
+        self.vector_store: VectorStore = (
+            LocalVectorStore(self.vectordb)
+            if settings.vector_store_backend == "local"
+            else self.vectordb
+        )
+        self.embedding_cache = (
+            EmbeddingCache(self.embedder.model_name) if settings.embedding_cache_enabled else None
+        )
+        # Set by the bulk loader to spread ingestion encoding over worker processes
+        self.embed_pool: ProcessEmbeddingPool | None = None
+
+    async def embed_chunks(self, texts: list[str], batch_size: int | None = None) -> np.ndarray:
+        """Embed chunk texts off the event loop, reusing cached vectors for unchanged text."""
+        batch_size = batch_size or settings.embedding_batch_size
+
+        async def encode(batch: list[str]) -> np.ndarray:
+            if self.embed_pool is not None:
+                return await self.embed_pool.embed(batch)
+            return await asyncio.to_thread(self.embedder.embed_documents, batch, batch_size)
+
+        if self.embedding_cache is None:
+            return await encode(texts)
+        return await self.embedding_cache.embed(texts, encode)
+
+    async def count_chunk_tokens(self, texts: list[str]) -> list[int]:
+        """LLM token counts of chunk texts, off the event loop (BPE encoding is CPU-bound)."""
+        return await asyncio.to_thread(lambda: [count_tokens(text) for text in texts])
+
+    async def index_document_for_retrieval(self, doc: Document) -> dict:
+        return await self.index_documents([doc])
+
+    # --- Batched ingestion: cost scales with total chunks, not with document count ---
+    def chunk_documents(self, docs: list[Document]) -> list[tuple[Document, list[str]]]:
+        return [(doc, self.chunker.chunk_text(doc.text)) for doc in docs]
+
+    def build_rows(
+        self,
+        chunked: list[tuple[Document, list[str]]],
+        embeddings: np.ndarray,
+        token_counts: list[int],
+    ) -> list[ChunkRow]:
+        """Pair each chunk with its embedding row and token count, both in chunk order."""
+        rows: list[ChunkRow] = []
+        offset = 0
+        for doc, chunks in chunked:
+            doc_id = doc.id or doc.title
+            meta = {"title": doc.title, **(doc.metadata or {})}
+            for idx, chunk in enumerate(chunks):
+                rows.append((doc_id, idx, chunk, embeddings[offset], meta, token_counts[offset]))
+                offset += 1
+        return rows
+
+    async def write_batch(
+        self, conn: AsyncConnection, docs: list[Document], rows: list[ChunkRow]
+    ) -> None:
+        """
+        Upsert raw documents and replace their chunks in the caller's transaction. rows must be
+        built from unique_documents(docs): chunks of a superseded copy would be written too.
+        """
+        docs = unique_documents(docs)
+        await copy_documents(conn, docs)
+        await self.vectordb.replace_embeddings(conn, [doc.id or doc.title for doc in docs], rows)
+
+    @staticmethod
+    def diff_chunks(
+        chunked: list[tuple[Document, list[str]]],
+        existing: list[tuple[str, int, bytes | None]],
+    ) -> ChunkDiff:
+        """
+        Match new chunks to stored ones by content hash. A stored chunk whose text reappears
+        anywhere in the new version is reused (only its position/metadata may change); the rest
+        are removed. Rows without a hash (indexed before hashes were stored) are never reused.
+        """
+        stored: dict[str, dict[bytes, list[int]]] = defaultdict(lambda: defaultdict(list))
+        for doc_id, row_id, digest in existing:
+            if digest is not None:
+                stored[doc_id][digest].append(row_id)
+        matched: set[int] = set()
+        diff = ChunkDiff()
+        for doc, chunks in chunked:
+            doc_id = doc.id or doc.title
+            meta = {"title": doc.title, **(doc.metadata or {})}
+            for idx, chunk in enumerate(chunks):
+                candidates = stored[doc_id][chunk_hash(chunk)]
+                if candidates:
+                    row_id = candidates.pop(0)
+                    matched.add(row_id)
+                    diff.reused.append((row_id, idx, meta))
+                else:
+                    diff.added.append((doc_id, idx, chunk, meta))
+        diff.removed = [row_id for _, row_id, _ in existing if row_id not in matched]
+        return diff
+
+    async def _embed_added(self, diff: ChunkDiff) -> list[ChunkRow]:
+        texts = [chunk for _, _, chunk, _ in diff.added]
+        embeddings, token_counts = await asyncio.gather(
+            self.embed_chunks(texts), self.count_chunk_tokens(texts)
+        )
+        return [
+            (doc_id, idx, chunk, embedding, meta, tokens)
+            for (doc_id, idx, chunk, meta), embedding, tokens in zip(
+                diff.added, embeddings, token_counts, strict=True
+            )
+        ]
+
+    async def index_documents(self, docs: list[Document]) -> dict:
+        """
+        Save and (re)index many documents at once, touching only chunks whose text changed.
 
-    def index_document_for_retrieval(self, doc: Document) -> dict:
-        # 1. Chunk the document
-        chunks = self.chunker.chunk_text(doc.text)
-        # 2. Embed the chunks
-        embeddings = self.embedder.embed_documents(chunks)
-        # 3. Store in vector DB
-        metadata = [{"title": doc.title, **(doc.metadata or {})} for _ in chunks]
-        self.vectordb.insert_embeddings(doc.id or doc.title, chunks, embeddings, metadata)
-        return {"chunks_indexed": len(chunks)}
+        New chunks are hashed and matched against the stored ones: unchanged chunks keep their
+        rows and embeddings, removed ones are deleted, and only new ones are embedded (in shared
+        encoder batches) and written with binary COPY. All changes for the batch, including the
+        raw documents, are applied in one transaction.
+        """
+        for doc in docs:
+            doc.id = doc.id or str(uuid.uuid4())
+        # A repeated id would be diffed twice against the same stored chunks and added twice
+        docs = unique_documents(docs)
+        doc_ids = [doc.id or doc.title for doc in docs]
+        chunked = self.chunk_documents(docs)
+        # Plan and embed outside the write transaction so no locks are held while encoding
+        async with connection() as conn:
+            existing = await self.vectordb.chunk_hashes(conn, doc_ids)
+        diff = self.diff_chunks(chunked, existing)
+        rows = await self._embed_added(diff)
+        async with connection() as conn:
+            await self.vectordb.lock_documents(conn, doc_ids)
+            current = await self.vectordb.chunk_hashes(conn, doc_ids)
+            if current != existing:
+                # The same documents were re-indexed concurrently; re-plan against what's stored
+                diff = self.diff_chunks(chunked, current)
+                rows = await self._embed_added(diff)
+            await copy_documents(conn, docs)
+            await self.vectordb.delete_chunks(conn, diff.removed)
+            await self.vectordb.update_chunk_positions(conn, diff.reused)
+            await self.vectordb.copy_embeddings(conn, rows)
+        return {"documents": len(docs), **diff.stats()}
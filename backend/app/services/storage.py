@@ -1,117 +1,165 @@
+import base64
+import json
 import uuid
-
-from psycopg2.extras import Json
-from psycopg2.pool import SimpleConnectionPool
-
-from app.core.settings import settings
-from app.models import Document
-
-# Connection pool (min 1, max 5 connections for dev)
-_pool = SimpleConnectionPool(
-    1,
-    5,
-    dbname=settings.pgvector_db,
-    user=settings.pgvector_user,
-    password=settings.pgvector_password,
-    host=settings.pgvector_host,
-    port=settings.pgvector_port,
-)
-
-
-def _get_conn():
-    return _pool.getconn()
-
-
-def _put_conn(conn):
-    _pool.putconn(conn)
-
-
-def _init_schema():
-    conn = _get_conn()
-    try:
-        with conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                CREATE TABLE IF NOT EXISTS raw_documents (
-                    id TEXT PRIMARY KEY,
-                    title TEXT NOT NULL,
-                    text TEXT NOT NULL,
-                    metadata JSONB,
-                    created_at TIMESTAMPTZ DEFAULT NOW()
-                );
-                """
-            )
-            cur.execute(
-                "CREATE INDEX IF NOT EXISTS idx_raw_documents_title ON raw_documents(title);"
-            )
-    finally:
-        _put_conn(conn)
-
-
-_init_schema()
-
-
-def save_document(doc: Document) -> Document:
+from datetime import datetime
+
+from psycopg import AsyncConnection, sql
+from psycopg.types.json import Jsonb
+
+from app.models import Document, DocumentSummary
+from app.services.db import connection
+
+
+async def init_schema() -> None:
+    async with connection() as conn:
+        await conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS raw_documents (
+                id TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                text TEXT NOT NULL,
+                metadata JSONB,
+                created_at TIMESTAMPTZ DEFAULT NOW()
+            );
+            """
+        )
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_raw_documents_title ON raw_documents(title);"
+        )
+        # Substring title search (ILIKE '%x%') can't use a btree; trigrams can
+        await conn.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_raw_documents_title_trgm "
+            "ON raw_documents USING GIN (title gin_trgm_ops);"
+        )
+        # Keyset pagination order for list_documents
+        await conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_raw_documents_created_at_id "
+            "ON raw_documents(created_at DESC, id DESC);"
+        )
+
+
+async def save_document(doc: Document) -> Document:
     if not doc.id:
         doc.id = str(uuid.uuid4())
-    conn = _get_conn()
-    try:
-        with conn, conn.cursor() as cur:
-            cur.execute(
-                """
-                INSERT INTO raw_documents (id, title, text, metadata)
-                VALUES (%s, %s, %s, %s)
-                ON CONFLICT (id) DO UPDATE SET title = EXCLUDED.title, text = EXCLUDED.text, metadata = EXCLUDED.metadata
-                """,
-                (doc.id, doc.title, doc.text, Json(doc.metadata) if doc.metadata else None),
-            )
-        return doc
-    finally:
-        _put_conn(conn)
-
-
-def get_document(doc_id: str) -> Document | None:
-    conn = _get_conn()
-    try:
-        with conn, conn.cursor() as cur:
-            cur.execute(
-                "SELECT id, title, text, metadata FROM raw_documents WHERE id = %s",
-                (doc_id,),
-            )
-            row = cur.fetchone()
-            if not row:
-                return None
-            _id, title, text, metadata = row
-            return Document(id=_id, title=title, text=text, metadata=metadata)
-    finally:
-        _put_conn(conn)
-
-
-def delete_document(doc_id: str) -> bool:
-    conn = _get_conn()
-    try:
-        with conn, conn.cursor() as cur:
-            cur.execute("DELETE FROM raw_documents WHERE id = %s", (doc_id,))
-            return cur.rowcount > 0
-    finally:
-        _put_conn(conn)
-
-
-def list_documents(title_filter: str | None = None, limit: int = 50) -> list[Document]:
-    conn = _get_conn()
-    try:
-        with conn, conn.cursor() as cur:
-            if title_filter:
-                cur.execute(
-                    "SELECT id, title, text, metadata FROM raw_documents WHERE title ILIKE %s LIMIT %s",
-                    (f"%{title_filter}%", limit),
+    async with connection() as conn:
+        await conn.execute(
+            """
+            INSERT INTO raw_documents (id, title, text, metadata)
+            VALUES (%s, %s, %s, %s)
+            ON CONFLICT (id) DO UPDATE SET title = EXCLUDED.title, text = EXCLUDED.text, metadata = EXCLUDED.metadata
+            """,
+            (doc.id, doc.title, doc.text, Jsonb(doc.metadata) if doc.metadata else None),
+        )
+    return doc
+
+
+async def copy_documents(conn: AsyncConnection, docs: list[Document]) -> int:
+    """
+    Upsert many documents in the caller's transaction: binary COPY into a session temp table,
+    then a single INSERT ... ON CONFLICT into raw_documents.
+    """
+    # Last write wins for ids repeated within one batch (ON CONFLICT can't touch a row twice)
+    by_id: dict[str, Document] = {}
+    for doc in docs:
+        if not doc.id:
+            doc.id = str(uuid.uuid4())
+        by_id[doc.id] = doc
+    await conn.execute(
+        """
+        CREATE TEMP TABLE IF NOT EXISTS raw_documents_stage
+            (id TEXT, title TEXT, text TEXT, metadata JSONB) ON COMMIT DELETE ROWS
+        """
+    )
+    async with conn.cursor() as cur:
+        async with cur.copy(
+            "COPY raw_documents_stage (id, title, text, metadata) FROM STDIN WITH (FORMAT BINARY)"
+        ) as copy:
+            copy.set_types(["text", "text", "text", "jsonb"])
+            for doc in by_id.values():
+                await copy.write_row(
+                    (doc.id, doc.title, doc.text, Jsonb(doc.metadata) if doc.metadata else None)
                 )
-            else:
-                cur.execute(
-                    "SELECT id, title, text, metadata FROM raw_documents ORDER BY created_at DESC LIMIT %s",
-                    (limit,),
-                )
-            rows = cur.fetchall()
-            return [Document(id=r[0], title=r[1], text=r[2], metadata=r[3]) for r in rows]
-    finally:
-        _put_conn(conn)
+        await cur.execute(
+            """
+            INSERT INTO raw_documents (id, title, text, metadata)
+            SELECT id, title, text, metadata FROM raw_documents_stage
+            ON CONFLICT (id) DO UPDATE
+                SET title = EXCLUDED.title, text = EXCLUDED.text, metadata = EXCLUDED.metadata
+            """
+        )
+        return cur.rowcount
+
+
+async def get_document(doc_id: str) -> Document | None:
+    async with connection() as conn:
+        cur = await conn.execute(
+            "SELECT id, title, text, metadata FROM raw_documents WHERE id = %s",
+            (doc_id,),
+        )
+        row = await cur.fetchone()
+    if not row:
+        return None
+    _id, title, text, metadata = row
+    return Document(id=_id, title=title, text=text, metadata=metadata)
+
+
+async def delete_document(doc_id: str) -> bool:
+    async with connection() as conn:
+        cur = await conn.execute("DELETE FROM raw_documents WHERE id = %s", (doc_id,))
+        return cur.rowcount > 0
+
+
+def encode_cursor(created_at: datetime, doc_id: str) -> str:
+    """Opaque keyset cursor: the (created_at, id) of the last row on a page."""
+    return base64.urlsafe_b64encode(json.dumps([created_at.isoformat(), doc_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of encode_cursor. Raises ValueError for anything it didn't produce."""
+    try:
+        created_at, doc_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), str(doc_id)
+    except (TypeError, ValueError, json.JSONDecodeError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def _escape_like(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+async def list_documents(
+    title_filter: str | None = None,
+    limit: int = 50,
+    cursor: str | None = None,
+    include_text: bool = False,
+) -> tuple[list[DocumentSummary], str | None]:
+    """
+    One page of documents, newest first, and the cursor for the next page (None at the end).
+    Pages are keyset-paginated on (created_at, id), so every page costs the same however deep
+    it is. text is only read when include_text is set.
+    """
+    conditions = []
+    params: dict = {"limit": limit + 1}  # one extra row tells us whether there's a next page
+    if title_filter:
+        conditions.append(sql.SQL("title ILIKE %(title)s"))
+        params["title"] = f"%{_escape_like(title_filter)}%"
+    if cursor:
+        params["after_created_at"], params["after_id"] = decode_cursor(cursor)
+        conditions.append(sql.SQL("(created_at, id) < (%(after_created_at)s, %(after_id)s)"))
+    columns = ["id", "title", "metadata", "created_at"] + (["text"] if include_text else [])
+    query = sql.SQL(
+        "SELECT {columns} FROM raw_documents {where} "
+        "ORDER BY created_at DESC, id DESC LIMIT %(limit)s"
+    ).format(
+        columns=sql.SQL(", ").join(map(sql.Identifier, columns)),
+        where=sql.SQL("WHERE ") + sql.SQL(" AND ").join(conditions) if conditions else sql.SQL(""),
+    )
+    async with connection() as conn:
+        cur = await conn.execute(query, params)
+        rows = await cur.fetchall()
+    docs = [DocumentSummary(**dict(zip(columns, row, strict=True))) for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit and docs and docs[-1].created_at is not None:
+        next_cursor = encode_cursor(docs[-1].created_at, docs[-1].id)
+    return docs, next_cursor
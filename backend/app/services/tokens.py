@@ -0,0 +1,46 @@
+from functools import lru_cache
+from typing import TYPE_CHECKING
+
+from loguru import logger
+
+from app.core.settings import settings
+
+if TYPE_CHECKING:
+    import tiktoken
+
+# Fallback when no BPE encoding is available: OpenAI tokenizers average ~4 chars per token
+# on English text, which is close enough for budgeting.
+CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> "tiktoken.Encoding | None":
+    """tiktoken encoding for settings.model, or None to use the character heuristic."""
+    try:
+        import tiktoken
+
+        try:
+            return tiktoken.encoding_for_model(settings.model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as e:  # not installed, or the BPE file can't be fetched offline
+        logger.warning(f"tiktoken unavailable, estimating tokens from length: {e}")
+        return None
+
+
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is None:
+        return -(-len(text) // CHARS_PER_TOKEN)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, max_tokens: int) -> str:
+    """Keep the first max_tokens tokens of text."""
+    if max_tokens <= 0:
+        return ""
+    encoding = _encoding()
+    if encoding is None:
+        return text[: max_tokens * CHARS_PER_TOKEN]
+    tokens = encoding.encode(text, disallowed_special=())
+    return text if len(tokens) <= max_tokens else encoding.decode(tokens[:max_tokens])
@@ -1,101 +1,770 @@
-import psycopg2
+import asyncio
+import hashlib
+import time
+from abc import ABC, abstractmethod
+from collections.abc import Awaitable, Iterable
+from datetime import timedelta
+from typing import Literal, NamedTuple, cast
+
+import numpy as np
 
 # Use global meter provider set in main.py
-from opentelemetry import metrics
-from psycopg2.extras import Json, execute_values
+from opentelemetry import metrics, trace
+from psycopg import AsyncConnection, sql
+from psycopg.types.json import Jsonb
 from tenacity import retry, stop_after_attempt, wait_fixed
 
+from app.core import request_metrics
 from app.core.settings import settings
+from app.models import DateRange, MetadataFilters
+from app.services.db import autocommit_connection, connection
 
 meter = metrics.get_meter(__name__)
+tracer = trace.get_tracer(__name__)
+
+EMBEDDING_DIM = 384
+ANN_INDEX_NAME = "idx_documents_embedding_ann"
+ANN_INDEX_TYPES = ("hnsw", "ivfflat")
+# query_similar orders by <#> (negative inner product), so the index must use the ip opclass
+ANN_OPCLASS = "vector_ip_ops"
+
+Quantization = Literal["none", "halfvec", "binary"]
+# Indexed expression and opclass per quantization. The table always keeps the float32 column:
+# quantized indexes are expression indexes over it (2x smaller for halfvec, 32x for binary),
+# and their candidates are re-scored exactly against the float32 vectors.
+ANN_KEYS: dict[str, tuple[str, str]] = {
+    "none": ("embedding", ANN_OPCLASS),
+    "halfvec": (f"(embedding::halfvec({EMBEDDING_DIM}))", "halfvec_ip_ops"),
+    "binary": (f"(binary_quantize(embedding)::bit({EMBEDDING_DIM}))", "bit_hamming_ops"),
+}
+# Coarse ORDER BY matching each quantized index expression
+COARSE_ORDER: dict[str, str] = {
+    "halfvec": f"embedding::halfvec({EMBEDDING_DIM}) <#> %(q)s::halfvec({EMBEDDING_DIM})",
+    "binary": f"binary_quantize(embedding)::bit({EMBEDDING_DIM}) <~> binary_quantize(%(q)s)",
+}
+
+
+def ann_index_name(quantization: str = "none") -> str:
+    if quantization not in ANN_KEYS:
+        raise ValueError(f"Unsupported quantization: {quantization!r}")
+    return ANN_INDEX_NAME if quantization == "none" else f"{ANN_INDEX_NAME}_{quantization}"
+
+
+# 'simple' text search config: no stemming or stop words, so tickers, CUSIPs and section
+# labels like "Item 1A" are indexed verbatim (lowercased)
+TS_CONFIG = "simple"
+
+SearchMode = Literal["vector", "lexical", "hybrid"]
+
+
+def chunk_hash(text: str) -> bytes:
+    """Content hash stored with each chunk so re-indexing can tell unchanged chunks apart."""
+    return hashlib.sha256(text.encode()).digest()
+
+
+class SearchResult(NamedTuple):
+    doc_id: str
+    chunk_idx: int
+    chunk: str
+    distance: float
+    metadata: dict
+    token_count: int | None  # LLM tokens in chunk, computed at ingestion (None on legacy rows)
+
+
+def compile_filters(filters: MetadataFilters | None) -> tuple[sql.Composable, dict]:
+    """
+    Compile metadata filters into a WHERE predicate on documents.metadata plus its params.
+    Equality and IN become jsonb containment (@>), served by the jsonb_path_ops GIN index.
+    Date ranges compare the stored ISO string (metadata->>key), served by the expression
+    indexes on settings.metadata_date_fields. Bounds become half-open day boundaries
+    (lte d -> < d + 1 day, gt d -> >= d + 1 day), so values with a time of day on the
+    boundary date ("2024-03-31T10:00:00") fall on the right side of a bare-date bound.
+    """
+    if not filters:
+        return sql.SQL("TRUE"), {}
+    params: dict = {}
+
+    def param(value: object) -> sql.Placeholder:
+        name = f"filter_{len(params)}"
+        params[name] = value
+        return sql.Placeholder(name)
+
+    equal = {
+        key: value for key, value in filters.items() if not isinstance(value, list | DateRange)
+    }
+    predicates: list[sql.Composable] = (
+        [sql.SQL("metadata @> {}").format(param(Jsonb(equal)))] if equal else []
+    )
+    for key, value in filters.items():
+        if isinstance(value, list):
+            alternatives = [sql.SQL("metadata @> {}").format(param(Jsonb({key: v}))) for v in value]
+            predicates.append(
+                sql.SQL("({})").format(sql.SQL(" OR ").join(alternatives))
+                if alternatives
+                else sql.SQL("FALSE")
+            )
+        elif isinstance(value, DateRange):
+            next_day = timedelta(days=1)
+            for op, bound in (
+                (">=", value.gte),
+                (">=", value.gt and value.gt + next_day),
+                ("<", value.lte and value.lte + next_day),
+                ("<", value.lt),
+            ):
+                if bound is not None:
+                    predicates.append(
+                        sql.SQL("metadata->>{} {} {}").format(
+                            sql.Literal(key), sql.SQL(op), param(bound.isoformat())
+                        )
+                    )
+    return sql.SQL(" AND ").join(predicates), params
+
+
+def reciprocal_rank_fusion(
+    legs: list[list[SearchResult]], top_k: int, k: int = 60
+) -> list[SearchResult]:
+    """
+    Merge ranked result lists by reciprocal rank fusion: each chunk scores sum(1 / (k + rank))
+    over the lists it appears in. Rank-based, so vector distances and text ranks never need
+    to be put on the same scale.
+    """
+    scores: dict[tuple[str, int], float] = {}
+    results: dict[tuple[str, int], SearchResult] = {}
+    for leg in legs:
+        for rank, result in enumerate(leg, start=1):
+            key = (result.doc_id, result.chunk_idx)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            results.setdefault(key, result)
+    ranked = sorted(scores, key=scores.__getitem__, reverse=True)
+    return [results[key] for key in ranked[:top_k]]
+
+
+class VectorStore(ABC):
+    """
+    Read side of chunk retrieval. VectorDBService searches Postgres directly;
+    LocalVectorStore serves the same queries from a memory-mapped replica.
+    """
+
+    async def start(self) -> None:
+        """Open or sync any local state. No-op for stores that read Postgres directly."""
+        return None
 
+    async def stop(self) -> None:
+        return None
 
-class VectorDBService:
+    @abstractmethod
+    async def query_similar(
+        self,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 3,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        exact: bool = False,
+        filters: MetadataFilters | None = None,
+    ) -> list[SearchResult]: ...
+
+    @abstractmethod
+    async def lexical_search(
+        self,
+        query_text: str,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 3,
+        filters: MetadataFilters | None = None,
+    ) -> list[SearchResult]: ...
+
+    async def hybrid_search(
+        self,
+        query_text: str,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 3,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        filters: MetadataFilters | None = None,
+    ) -> list[SearchResult]:
+        """
+        Run the vector and full-text legs concurrently and fuse them with reciprocal rank
+        fusion. Each leg fetches settings.hybrid_candidates rows so
+        exact-match hits can surface without raising top_k.
+        """
+        candidates = max(top_k, settings.hybrid_candidates)
+
+        async def leg(name: str, search: Awaitable[list[SearchResult]]) -> list[SearchResult]:
+            with tracer.start_as_current_span(f"retrieval.{name}") as span:
+                results = await search
+                span.set_attribute("retrieval.result_count", len(results))
+                return results
+
+        vector, lexical = await asyncio.gather(
+            leg(
+                "vector",
+                self.query_similar(
+                    query_embedding,
+                    top_k=candidates,
+                    ef_search=ef_search,
+                    probes=probes,
+                    filters=filters,
+                ),
+            ),
+            leg(
+                "lexical",
+                self.lexical_search(query_text, query_embedding, top_k=candidates, filters=filters),
+            ),
+        )
+        return reciprocal_rank_fusion([vector, lexical], top_k, k=settings.hybrid_rrf_k)
+
+    async def search(
+        self,
+        mode: SearchMode,
+        query_text: str,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 3,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        filters: MetadataFilters | None = None,
+    ) -> list[SearchResult]:
+        """
+        Retrieve top_k chunks with the given mode: vector, lexical or hybrid (RRF), restricted
+        to chunks whose metadata matches filters.
+        """
+        with request_metrics.stage("retrieval"):
+            if mode == "lexical":
+                results = await self.lexical_search(
+                    query_text, query_embedding, top_k=top_k, filters=filters
+                )
+            elif mode == "hybrid":
+                results = await self.hybrid_search(
+                    query_text,
+                    query_embedding,
+                    top_k=top_k,
+                    ef_search=ef_search,
+                    probes=probes,
+                    filters=filters,
+                )
+            else:
+                results = await self.query_similar(
+                    query_embedding,
+                    top_k=top_k,
+                    ef_search=ef_search,
+                    probes=probes,
+                    filters=filters,
+                )
+        request_metrics.record(
+            top_k=top_k,
+            retrieved_rows=len(results),
+            retrieved_doc_ids=list(dict.fromkeys(r.doc_id for r in results)),
+        )
+        return results
+
+
+class VectorDBService(VectorStore):
     retrieval_latency_histogram = meter.create_histogram(
         name="ai_retrieval_latency_seconds",
         description="Time taken for vector DB retrieval (seconds)",
     )
+    _iterative_scan: bool | None = None  # pgvector >= 0.8, checked once per process
 
-    def __init__(self):
-        self.conn = psycopg2.connect(
-            dbname=settings.pgvector_db,
-            user=settings.pgvector_user,
-            password=settings.pgvector_password,
-            host=settings.pgvector_host,
-            port=settings.pgvector_port,
-        )
-        self._ensure_table()
+    def __init__(self, quantization: Quantization | None = None):
+        resolved = quantization or settings.vector_quantization
+        ann_index_name(resolved)  # validate early: the setting is a plain string
+        self.quantization = cast(Quantization, resolved)
 
-    def _ensure_table(self):
-        with self.conn, self.conn.cursor() as cur:
-            cur.execute("CREATE EXTENSION IF NOT EXISTS vector;")
-            cur.execute(
-                """
+    async def ensure_schema(self) -> None:
+        async with connection() as conn:
+            await conn.execute(
+                f"""
                 CREATE TABLE IF NOT EXISTS documents (
                     id SERIAL PRIMARY KEY,
                     doc_id TEXT,
                     chunk_idx INT,
                     chunk TEXT,
-                    embedding VECTOR(384),
-                    metadata JSONB
+                    embedding VECTOR({EMBEDDING_DIM}),
+                    metadata JSONB,
+                    token_count INT,
+                    chunk_hash BYTEA
                 );
             """
             )
+            await conn.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS token_count INT;")
+            await conn.execute("ALTER TABLE documents ADD COLUMN IF NOT EXISTS chunk_hash BYTEA;")
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_doc_id ON documents(doc_id);"
+            )
+            # Row version, bumped on insert and in-place update, for local replicas to diff
+            # against (see LocalVectorStore.sync)
+            await conn.execute("CREATE SEQUENCE IF NOT EXISTS documents_version_seq;")
+            cur = await conn.execute(
+                "SELECT 1 FROM pg_attribute WHERE attrelid = 'documents'::regclass "
+                "AND attname = 'version' AND NOT attisdropped"
+            )
+            if await cur.fetchone() is None:
+                # One-time migration: a volatile default makes ADD COLUMN rewrite the table
+                # and number every existing row, so later starts skip the backfill entirely
+                await conn.execute(
+                    "ALTER TABLE documents "
+                    "ADD COLUMN IF NOT EXISTS version BIGINT "
+                    "DEFAULT nextval('documents_version_seq');"
+                )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_id_version ON documents(id, version);"
+            )
+            # Full-text leg of hybrid search. Adding the stored column rewrites the table once.
+            await conn.execute(
+                f"""
+                ALTER TABLE documents ADD COLUMN IF NOT EXISTS chunk_tsv tsvector
+                GENERATED ALWAYS AS (to_tsvector('{TS_CONFIG}', coalesce(chunk, ''))) STORED;
+                """
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_chunk_tsv "
+                "ON documents USING GIN (chunk_tsv);"
+            )
+            # Metadata filters: containment for equality/IN, expression indexes for date ranges
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_documents_metadata "
+                "ON documents USING GIN (metadata jsonb_path_ops);"
+            )
+            for field in settings.metadata_date_fields_list:
+                await conn.execute(
+                    sql.SQL("CREATE INDEX IF NOT EXISTS {} ON documents ((metadata->>{}))").format(
+                        sql.Identifier(f"idx_documents_metadata_{field}"), sql.Literal(field)
+                    )
+                )
+        if settings.vector_index_type in ANN_INDEX_TYPES:
+            await self._ensure_ann_index()
 
-    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def insert_embeddings(
+    async def _ensure_ann_index(self) -> None:
+        """
+        Build the configured ANN index if it is missing, with CREATE INDEX CONCURRENTLY so
+        writes carry on during the build. No-op once the index exists. IVFFlat picks its
+        centroids from the rows present at build time, so rebuild it after large loads.
+        """
+        async with autocommit_connection() as conn:
+            # Workers start together: one builds, the rest move on instead of queueing
+            cur = await conn.execute(
+                "SELECT pg_try_advisory_lock(hashtextextended(%s, 0))", (ANN_INDEX_NAME,)
+            )
+            row = await cur.fetchone()
+            if not (row and row[0]):
+                return
+            await conn.execute(
+                self._index_ddl(settings.vector_index_type, quantization=self.quantization)
+            )
+
+    # --- ANN index management ---
+    def _index_ddl(
         self,
-        doc_id: str,
-        chunks: list[str],
-        embeddings: list[list[float]],
-        metadata: list[dict] | None = None,
-    ):
-        if metadata is None:
-            metadata = [{} for _ in chunks]
-
-        # Build values converting embedding list to pgvector literal and metadata dict to JSON
-        values = []
-        for idx, (chunk, embedding, meta) in enumerate(zip(chunks, embeddings, metadata)):
-            vector_literal = "[" + ",".join(f"{x:.8f}" for x in embedding) + "]"
-            values.append((doc_id, idx, chunk, vector_literal, Json(meta)))
-
-        with self.conn, self.conn.cursor() as cur:
-            execute_values(
-                cur,
+        index_type: str,
+        *,
+        m: int | None = None,
+        ef_construction: int | None = None,
+        lists: int | None = None,
+        quantization: str = "none",
+        concurrently: bool = True,
+    ) -> sql.Composed:
+        if index_type == "hnsw":
+            params = sql.SQL("m = {}, ef_construction = {}").format(
+                sql.Literal(int(m or settings.hnsw_m)),
+                sql.Literal(int(ef_construction or settings.hnsw_ef_construction)),
+            )
+        elif index_type == "ivfflat":
+            params = sql.SQL("lists = {}").format(sql.Literal(int(lists or settings.ivfflat_lists)))
+        else:
+            raise ValueError(f"Unsupported index type: {index_type!r}")
+        return sql.SQL(
+            "CREATE INDEX {concurrently} IF NOT EXISTS {name} ON documents "
+            "USING {method} ({key} {opclass}) WITH ({params})"
+        ).format(
+            concurrently=sql.SQL("CONCURRENTLY" if concurrently else ""),
+            name=sql.Identifier(ann_index_name(quantization)),
+            method=sql.SQL(index_type),
+            key=sql.SQL(ANN_KEYS[quantization][0]),
+            opclass=sql.SQL(ANN_KEYS[quantization][1]),
+            params=params,
+        )
+
+    async def index_info(self, quantization: Quantization | None = None) -> dict | None:
+        """
+        Return the ANN index definition, size and validity for a quantization (default: the
+        one this service searches with), or None if absent.
+        """
+        name = ann_index_name(quantization or self.quantization)
+        async with connection() as conn:
+            cur = await conn.execute(
                 """
-                INSERT INTO documents (doc_id, chunk_idx, chunk, embedding, metadata)
-                VALUES %s
+                SELECT am.amname, pg_get_indexdef(i.indexrelid), pg_relation_size(i.indexrelid),
+                       i.indisvalid
+                FROM pg_index i
+                JOIN pg_class c ON c.oid = i.indexrelid
+                JOIN pg_am am ON am.oid = c.relam
+                WHERE c.relname = %s
                 """,
-                values,
-                template="(%s,%s,%s,%s::vector,%s)",
+                (name,),
             )
+            row = await cur.fetchone()
+        if not row:
+            return None
+        method, definition, size_bytes, valid = row
+        return {
+            "name": name,
+            "type": method,
+            "definition": definition,
+            "size_bytes": size_bytes,
+            "valid": valid,
+        }
+
+    async def create_index(
+        self,
+        index_type: str | None = None,
+        *,
+        m: int | None = None,
+        ef_construction: int | None = None,
+        lists: int | None = None,
+        quantization: Quantization | None = None,
+    ) -> dict | None:
+        """
+        Build the ANN index without blocking writes (CREATE INDEX CONCURRENTLY).
+        Does nothing if an index already exists; use rebuild_index to change its parameters.
+        Each quantization has its own index, so a compact one can be built and its recall
+        checked alongside the float32 index before switching VECTOR_QUANTIZATION.
+        """
+        resolved = quantization or self.quantization
+        ddl = self._index_ddl(
+            index_type or settings.vector_index_type,
+            m=m,
+            ef_construction=ef_construction,
+            lists=lists,
+            quantization=resolved,
+        )
+        async with autocommit_connection() as conn:
+            await conn.execute(ddl)
+        return await self.index_info(resolved)
+
+    async def drop_index(self, quantization: Quantization | None = None) -> bool:
+        async with autocommit_connection() as conn:
+            return await self._drop_index(conn, quantization or self.quantization)
+
+    async def _drop_index(self, conn: AsyncConnection, quantization: str) -> bool:
+        name = ann_index_name(quantization)
+        cur = await conn.execute("SELECT to_regclass(%s) IS NOT NULL", (name,))
+        row = await cur.fetchone()
+        await conn.execute(
+            sql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(sql.Identifier(name))
+        )
+        return bool(row and row[0])
+
+    async def rebuild_index(
+        self,
+        index_type: str | None = None,
+        *,
+        m: int | None = None,
+        ef_construction: int | None = None,
+        lists: int | None = None,
+        quantization: Quantization | None = None,
+    ) -> dict | None:
+        """
+        Rebuild the ANN index. With no arguments the existing index is reindexed in place
+        (e.g. to refresh IVFFlat centroids after a bulk load); otherwise it is dropped and
+        recreated with the given type/parameters.
+        """
+        resolved = quantization or self.quantization
+        name = ann_index_name(resolved)
+        async with autocommit_connection() as conn:
+            if index_type is None and m is None and ef_construction is None and lists is None:
+                await conn.execute(
+                    sql.SQL("REINDEX INDEX CONCURRENTLY {}").format(sql.Identifier(name))
+                )
+            else:
+                await self._drop_index(conn, resolved)
+                await conn.execute(
+                    self._index_ddl(
+                        index_type or settings.vector_index_type,
+                        m=m,
+                        ef_construction=ef_construction,
+                        lists=lists,
+                        quantization=resolved,
+                    )
+                )
+        return await self.index_info(resolved)
+
+    # --- Writes ---
+    async def copy_embeddings(
+        self, conn: AsyncConnection, rows: Iterable[tuple[str, int, str, np.ndarray, dict, int]]
+    ) -> int:
+        """
+        Stream (doc_id, chunk_idx, chunk, embedding, metadata, token_count) rows into documents
+        with binary COPY on the caller's connection/transaction. Vectors go over the wire as
+        packed float32, with no per-float text formatting or server-side parsing. Each chunk's
+        LLM token count (counted by the caller, off the event loop) and content hash are stored
+        alongside it, so prompt assembly doesn't re-tokenize retrieved context and re-indexing
+        can skip unchanged chunks.
+        """
+        count = 0
+        async with conn.cursor() as cur:
+            async with cur.copy(
+                "COPY documents "
+                "(doc_id, chunk_idx, chunk, embedding, metadata, token_count, chunk_hash) "
+                "FROM STDIN WITH (FORMAT BINARY)"
+            ) as copy:
+                copy.set_types(["text", "int4", "text", "vector", "jsonb", "int4", "bytea"])
+                for doc_id, chunk_idx, chunk, embedding, meta, token_count in rows:
+                    await copy.write_row(
+                        (
+                            doc_id,
+                            chunk_idx,
+                            chunk,
+                            embedding,
+                            Jsonb(meta),
+                            token_count,
+                            chunk_hash(chunk),
+                        )
+                    )
+                    count += 1
+        return count
+
+    async def replace_embeddings(
+        self,
+        conn: AsyncConnection,
+        doc_ids: list[str],
+        rows: Iterable[tuple[str, int, str, np.ndarray, dict, int]],
+    ) -> int:
+        """Delete any existing chunks for doc_ids, then COPY rows, in the caller's transaction."""
+        await conn.execute("DELETE FROM documents WHERE doc_id = ANY(%s)", (doc_ids,))
+        return await self.copy_embeddings(conn, rows)
+
+    async def lock_documents(self, conn: AsyncConnection, doc_ids: list[str]) -> None:
+        """
+        Serialize re-indexing of the same documents until the caller's transaction ends.
+        Locks are taken in sorted order so concurrent batches can't deadlock.
+        """
+        await conn.execute(
+            "SELECT pg_advisory_xact_lock(hashtextextended(doc_id, 0)) "
+            "FROM unnest(%s::text[]) AS doc_id ORDER BY doc_id",
+            (sorted(set(doc_ids)),),
+        )
+
+    async def chunk_hashes(
+        self, conn: AsyncConnection, doc_ids: list[str]
+    ) -> list[tuple[str, int, bytes | None]]:
+        """(doc_id, row id, chunk_hash) of every stored chunk of doc_ids, in chunk order."""
+        cur = await conn.execute(
+            "SELECT doc_id, id, chunk_hash FROM documents "
+            "WHERE doc_id = ANY(%s) ORDER BY doc_id, chunk_idx",
+            (doc_ids,),
+        )
+        return [
+            (doc_id, row_id, bytes(h) if h else None) for doc_id, row_id, h in await cur.fetchall()
+        ]
+
+    async def update_chunk_positions(
+        self, conn: AsyncConnection, updates: list[tuple[int, int, dict]]
+    ) -> int:
+        """
+        Point reused (row id, chunk_idx, metadata) rows at their new position and metadata,
+        leaving the embedding in place. Rows that didn't change aren't rewritten.
+        """
+        if not updates:
+            return 0
+        ids, positions, metas = zip(*updates, strict=True)
+        cur = await conn.execute(
+            """
+            UPDATE documents AS d SET chunk_idx = u.chunk_idx, metadata = u.metadata,
+                version = nextval('documents_version_seq')
+            FROM unnest(%s::int[], %s::int[], %s::jsonb[]) AS u(id, chunk_idx, metadata)
+            WHERE d.id = u.id
+              AND (d.chunk_idx <> u.chunk_idx OR d.metadata IS DISTINCT FROM u.metadata)
+            """,
+            (list(ids), list(positions), [Jsonb(meta) for meta in metas]),
+        )
+        return cur.rowcount
+
+    async def delete_chunks(self, conn: AsyncConnection, ids: list[int]) -> int:
+        if not ids:
+            return 0
+        cur = await conn.execute("DELETE FROM documents WHERE id = ANY(%s)", (ids,))
+        return cur.rowcount
+
+    # --- Reads ---
+    async def _supports_iterative_scan(self, conn: AsyncConnection) -> bool:
+        if VectorDBService._iterative_scan is None:
+            cur = await conn.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+            row = await cur.fetchone()
+            version = tuple(int(part) for part in row[0].split(".")[:2]) if row else (0, 0)
+            VectorDBService._iterative_scan = version >= (0, 8)
+        return VectorDBService._iterative_scan
+
+    async def _apply_search_params(
+        self,
+        conn: AsyncConnection,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        exact: bool = False,
+        filtered: bool = False,
+        top_k: int = 3,
+    ) -> None:
+        """
+        Set per-query ANN knobs for the current transaction only (SET LOCAL semantics).
+        Filtered searches keep scanning the index until top_k rows pass the filter (pgvector
+        >= 0.8 iterative scans), or else over-fetch HNSW candidates.
+        """
+        if exact:
+            await conn.execute("SELECT set_config('enable_indexscan', 'off', true)")
+        elif filtered:
+            if await self._supports_iterative_scan(conn):
+                await conn.execute(
+                    "SELECT set_config('hnsw.iterative_scan', 'relaxed_order', true), "
+                    "set_config('ivfflat.iterative_scan', 'relaxed_order', true)"
+                )
+            else:
+                overfetch = top_k * settings.filter_overfetch_factor
+                ef_search = min(1000, max(ef_search or 40, overfetch))
+        if ef_search is not None:
+            await conn.execute("SELECT set_config('hnsw.ef_search', %s, true)", (str(ef_search),))
+        if probes is not None:
+            await conn.execute("SELECT set_config('ivfflat.probes', %s, true)", (str(probes),))
 
     @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
-    def query_similar(
-        self, query_embedding: list[float], top_k: int = 3
-    ) -> list[tuple[str, int, str, float, dict]]:
-        # Convert embedding to pgvector literal string
-        vector_literal = "[" + ",".join(f"{x:.8f}" for x in query_embedding) + "]"
-        import time
+    async def query_similar(
+        self,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 3,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        exact: bool = False,
+        filters: MetadataFilters | None = None,
+        quantization: Quantization | None = None,
+        overfetch: int | None = None,
+    ) -> list[SearchResult]:
+        """
+        Return the top_k chunks by inner product, optionally restricted by metadata filters.
+        ef_search (HNSW) and probes (IVFFlat) trade latency for recall on this query only;
+        exact=True bypasses the ANN index entirely. With a halfvec or binary quantization the
+        coarse search runs on the compact index for top_k * overfetch candidates, which are then
+        re-ranked exactly on the float32 vectors.
+        """
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        resolved: Quantization = "none" if exact else (quantization or self.quantization)
+        where, params = compile_filters(filters)
+        params.update({"q": query_vector, "k": top_k})
+        if resolved == "none":
+            # Iterative scans may return rows slightly out of order, hence the outer re-sort
+            query = sql.SQL(
+                """
+                WITH candidates AS MATERIALIZED (
+                    SELECT doc_id, chunk_idx, chunk, embedding <#> %(q)s AS distance,
+                           metadata, token_count
+                    FROM documents
+                    WHERE {where}
+                    ORDER BY embedding <#> %(q)s ASC
+                    LIMIT %(k)s
+                )
+                SELECT * FROM candidates ORDER BY distance ASC
+                """
+            ).format(where=where)
+            fetch = top_k
+        else:
+            fetch = top_k * (overfetch or settings.quantization_overfetch_factor)
+            # HNSW returns at most ef_search rows, so it has to cover the candidate set
+            ef_search = min(1000, max(ef_search or 40, fetch))
+            params["candidates"] = fetch
+            query = sql.SQL(
+                """
+                WITH candidates AS MATERIALIZED (
+                    SELECT id FROM documents
+                    WHERE {where}
+                    ORDER BY {coarse}
+                    LIMIT %(candidates)s
+                )
+                SELECT d.doc_id, d.chunk_idx, d.chunk, d.embedding <#> %(q)s AS distance,
+                       d.metadata, d.token_count
+                FROM candidates JOIN documents d USING (id)
+                ORDER BY distance ASC
+                LIMIT %(k)s
+                """
+            ).format(where=where, coarse=sql.SQL(COARSE_ORDER[resolved]))
+        start_time = time.time()
+        async with connection() as conn:
+            await self._apply_search_params(
+                conn, ef_search, probes, exact, filtered=bool(filters), top_k=fetch
+            )
+            cur = await conn.execute(query, params)
+            rows = await cur.fetchall()
+        duration = time.time() - start_time
+        self.retrieval_latency_histogram.record(
+            duration, {"exact": exact, "leg": "vector", "quantization": resolved}
+        )
+        return [SearchResult(*row) for row in rows]
 
+    @retry(stop=stop_after_attempt(3), wait=wait_fixed(2))
+    async def lexical_search(
+        self,
+        query_text: str,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 3,
+        filters: MetadataFilters | None = None,
+    ) -> list[SearchResult]:
+        """
+        Full-text search over chunks, ranked by ts_rank_cd. Supports web-search syntax:
+        quoted phrases ("Item 1A"), OR, and -exclusions. Distances are still reported against
+        query_embedding so callers can score results uniformly.
+        """
+        query_vector = np.asarray(query_embedding, dtype=np.float32)
+        where, params = compile_filters(filters)
         start_time = time.time()
-        with self.conn, self.conn.cursor() as cur:
-            cur.execute(
-                """
-                SELECT doc_id, chunk_idx, chunk, embedding <#> %s::vector AS distance, metadata
-                FROM documents
-                ORDER BY embedding <#> %s::vector ASC
-                LIMIT %s
-                """,
-                (vector_literal, vector_literal, top_k),
+        async with connection() as conn:
+            cur = await conn.execute(
+                sql.SQL(
+                    """
+                    SELECT doc_id, chunk_idx, chunk, embedding <#> %(q)s AS distance, metadata,
+                           token_count
+                    FROM documents, websearch_to_tsquery({config}, %(text)s) AS query
+                    WHERE chunk_tsv @@ query AND {where}
+                    ORDER BY ts_rank_cd(chunk_tsv, query) DESC
+                    LIMIT %(k)s
+                    """
+                ).format(config=sql.Literal(TS_CONFIG), where=where),
+                {"q": query_vector, "text": query_text, "k": top_k, **params},
             )
-            result = cur.fetchall()
+            rows = await cur.fetchall()
         duration = time.time() - start_time
-        self.retrieval_latency_histogram.record(duration)
-        return result
+        self.retrieval_latency_histogram.record(duration, {"exact": False, "leg": "lexical"})
+        return [SearchResult(*row) for row in rows]
+
+    async def recall_at_k(
+        self,
+        query_embedding: list[float] | np.ndarray,
+        top_k: int = 10,
+        ef_search: int | None = None,
+        probes: int | None = None,
+        quantization: Quantization | None = None,
+        overfetch: int | None = None,
+    ) -> dict:
+        """
+        Compare ANN results (with the given quantization, default this service's) against an
+        exact float32 scan for one query.
+        """
+        start_time = time.perf_counter()
+        approx = await self.query_similar(
+            query_embedding,
+            top_k=top_k,
+            ef_search=ef_search,
+            probes=probes,
+            quantization=quantization,
+            overfetch=overfetch,
+        )
+        approx_seconds = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        exact = await self.query_similar(query_embedding, top_k=top_k, exact=True)
+        exact_seconds = time.perf_counter() - start_time
+        approx_ids = {(r.doc_id, r.chunk_idx) for r in approx}
+        exact_ids = {(r.doc_id, r.chunk_idx) for r in exact}
+        return {
+            "recall": len(approx_ids & exact_ids) / len(exact_ids) if exact_ids else 1.0,
+            "approx_latency_ms": approx_seconds * 1000,
+            "exact_latency_ms": exact_seconds * 1000,
+        }
 
-    def delete_embeddings(self, doc_id: str) -> int:
+    async def delete_embeddings(self, doc_id: str) -> int:
         """Delete all embeddings for a given doc_id. Returns number of rows deleted."""
-        with self.conn, self.conn.cursor() as cur:
-            cur.execute("DELETE FROM documents WHERE doc_id = %s", (doc_id,))
+        async with connection() as conn:
+            cur = await conn.execute("DELETE FROM documents WHERE doc_id = %s", (doc_id,))
             return cur.rowcount
@@ -0,0 +1,66 @@
+import itertools
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.core.settings import settings
+from app.services.ai_service import AIService
+from app.services.answer_cache import answer_cache
+from app.services.container import ServiceContainer
+from app.services.embeddings import query_embedding_cache
+from app.services.vectordb import SearchResult, VectorStore
+
+pytest.importorskip("sentence_transformers")
+
+HEADERS = {"X-API-Key": settings.x_api_key}
+CONTEXT = [
+    SearchResult(f"10k-{i}", i, "Operating margin expanded on cloud demand. " * 20, 0.1, {}, 200)
+    for i in range(5)
+]
+
+
+@pytest.fixture(scope="module")
+def client():
+    """
+    /ai/query end to end through routing, embedding, prompt assembly and memory, with the LLM
+    and retrieval stubbed so only our own code is measured (no OpenAI or Postgres needed).
+    """
+
+    async def query_llm(self, prompt):
+        return "Margins expanded on cloud demand."
+
+    async def search(self, mode, query_text, query_embedding, top_k=3, **kwargs):
+        return CONTEXT[:top_k]
+
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(settings, "openai_api_key", settings.openai_api_key or "bench")
+        mp.setattr(AIService, "query_llm", query_llm)
+        mp.setattr(VectorStore, "search", search)
+        import main
+
+        services = ServiceContainer()
+        services.rag_pipeline.embedder.load()
+        services.rag_pipeline.embedder.warmup()
+        main.app.state.services = services
+        yield TestClient(main.app)  # no lifespan: nothing to open
+
+
+def _ask(client: TestClient, question: str) -> None:
+    response = client.post("/ai/query", json={"question": question}, headers=HEADERS)
+    assert response.status_code == 200
+
+
+def test_ai_query_uncached(benchmark, client):
+    questions = (f"How did segment {i} margins change?" for i in itertools.count())
+
+    def setup():
+        answer_cache.clear()
+        query_embedding_cache.clear()
+        return (client, next(questions)), {}
+
+    benchmark.pedantic(_ask, setup=setup, rounds=50, warmup_rounds=2)
+
+
+def test_ai_query_answer_cache_hit(benchmark, client):
+    _ask(client, "How did margins change?")
+    benchmark(_ask, client, "How did margins change?")
@@ -0,0 +1,11 @@
+import pytest
+
+from app.services.chunking import ChunkingService
+
+
+@pytest.mark.parametrize("chunk_size", [500, 1000])
+def test_chunk_text_10k_filing(benchmark, filing_text, chunk_size):
+    chunker = ChunkingService(chunk_size=chunk_size, chunk_overlap=chunk_size // 10)
+    chunks = benchmark(chunker.chunk_text, filing_text)
+    benchmark.extra_info.update({"chars": len(filing_text), "chunks": len(chunks)})
+    assert len(chunks) > len(filing_text) // chunk_size
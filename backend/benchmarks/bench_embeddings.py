@@ -0,0 +1,48 @@
+import itertools
+
+import pytest
+
+from app.services.chunking import ChunkingService
+from app.services.embeddings import LocalEmbeddingService, query_embedding_cache
+
+pytest.importorskip("sentence_transformers")
+
+TEXTS = 256
+
+
+@pytest.fixture(scope="module")
+def embedder() -> LocalEmbeddingService:
+    service = LocalEmbeddingService()
+    service.load()
+    service.warmup()
+    return service
+
+
+@pytest.fixture(scope="module")
+def chunks(filing_text) -> list[str]:
+    return ChunkingService().chunk_text(filing_text)[:TEXTS]
+
+
+@pytest.mark.parametrize("batch_size", [1, 8, 32, 128])
+def test_embed_documents(benchmark, embedder, chunks, batch_size):
+    benchmark.extra_info["texts"] = len(chunks)
+    embeddings = benchmark.pedantic(
+        embedder.embed_documents, args=(chunks, batch_size), rounds=3, warmup_rounds=1
+    )
+    assert embeddings.shape[0] == len(chunks)
+
+
+def test_embed_query_uncached(benchmark, embedder):
+    questions = (f"What drove segment {i} operating margin this year?" for i in itertools.count())
+
+    def setup():
+        query_embedding_cache.clear()
+        return (next(questions),), {}
+
+    benchmark.pedantic(embedder.embed_query, setup=setup, rounds=50, warmup_rounds=2)
+
+
+def test_embed_query_cached(benchmark, embedder):
+    question = "What drove operating margin this year?"
+    embedder.embed_query(question)
+    benchmark(embedder.embed_query, question)
@@ -0,0 +1,47 @@
+import pytest
+
+from app.core.middleware.logging import RequestLoggingMiddleware, RequestLogWriter
+
+REQUESTS = 1000
+
+SCOPE = {
+    "type": "http",
+    "method": "POST",
+    "path": "/documents/search",
+    "query_string": b"",
+    "headers": [(b"content-type", b"application/json"), (b"x-api-key", b"dev-secret-key")],
+    "client": ("127.0.0.1", 50000),
+}
+
+
+async def _app(scope, receive, send):
+    await send({"type": "http.response.start", "status": 200, "headers": []})
+    await send({"type": "http.response.body", "body": b"{}"})
+
+
+async def _receive():
+    return {"type": "http.request", "body": b"", "more_body": False}
+
+
+async def _send(message):
+    pass
+
+
+async def _drive(app) -> None:
+    for _ in range(REQUESTS):
+        await app(dict(SCOPE), _receive, _send)
+
+
+@pytest.mark.parametrize("wrapped", [False, True], ids=["bare", "logged"])
+def test_request_logging_overhead(benchmark, run, wrapped):
+    """Compare bare vs logged to get the per-request overhead (target: under 50µs)."""
+    writer = RequestLogWriter(maxsize=REQUESTS)
+    app = RequestLoggingMiddleware(_app, writer=writer, sample_rates={}) if wrapped else _app
+
+    def drain():
+        while not writer.queue.empty():
+            writer.queue.get_nowait()
+
+    benchmark.pedantic(lambda: run(_drive(app)), setup=drain, rounds=50, warmup_rounds=2)
+    benchmark.extra_info["requests_per_round"] = REQUESTS
+    assert writer.dropped == 0
@@ -0,0 +1,83 @@
+import numpy as np
+import pytest
+from conftest import unit_vectors
+from pgvector import Vector
+
+from app.services.db import connection
+from app.services.vectordb import VectorDBService
+
+SEED_BATCH = 10_000
+CHUNKS_PER_DOC = 20
+
+
+def _rows(start: int, vectors: np.ndarray) -> list[tuple]:
+    return [
+        (
+            f"bench-{i // CHUNKS_PER_DOC}",
+            i % CHUNKS_PER_DOC,
+            f"chunk {i}",
+            vector,
+            {"bench": True},
+            3,
+        )
+        for i, vector in enumerate(vectors, start)
+    ]
+
+
+@pytest.fixture(scope="session")
+def seeded(pg, run, corpus_size) -> VectorDBService:
+    """Truncate the scratch documents table and load corpus_size random unit vectors."""
+    vectordb = VectorDBService()
+
+    async def seed() -> None:
+        await vectordb.ensure_schema()
+        async with connection() as conn:
+            await conn.execute("TRUNCATE documents")
+        await vectordb.drop_index()  # building once after the load is much faster
+        rng = np.random.default_rng(corpus_size)
+        for start in range(0, corpus_size, SEED_BATCH):
+            vectors = unit_vectors(rng, min(SEED_BATCH, corpus_size - start))
+            async with connection() as conn:
+                await vectordb.copy_embeddings(conn, _rows(start, vectors))
+        await vectordb.create_index()
+        async with connection() as conn:
+            await conn.execute("ANALYZE documents")
+
+    run(seed())
+    return vectordb
+
+
+@pytest.fixture(scope="module")
+def queries() -> np.ndarray:
+    return unit_vectors(np.random.default_rng(1), 64)
+
+
+@pytest.mark.parametrize("encoding", ["text", "binary"])
+def test_vector_literal_formatting(benchmark, encoding):
+    """Per-row vector serialization: text literals (the old INSERT path) vs binary COPY."""
+    vectors = unit_vectors(np.random.default_rng(0), 1000)
+    to_db = Vector.to_text if encoding == "text" else Vector.to_binary
+    benchmark(lambda: [to_db(Vector(v)) for v in vectors])
+
+
+def test_copy_embeddings(benchmark, seeded, run, corpus_size):
+    rows = _rows(corpus_size, unit_vectors(np.random.default_rng(2), 1000))
+
+    async def copy_and_roll_back() -> None:
+        async with connection() as conn:
+            async with conn.transaction(force_rollback=True):
+                await seeded.copy_embeddings(conn, rows)
+
+    benchmark.extra_info["rows"] = len(rows)
+    benchmark.pedantic(lambda: run(copy_and_roll_back()), rounds=10, warmup_rounds=1)
+
+
+@pytest.mark.parametrize("exact", [False, True], ids=["ann", "exact"])
+def test_query_similar(benchmark, seeded, run, queries, exact):
+    cycle = iter(np.resize(np.arange(len(queries)), 10_000))
+
+    def query():
+        return run(seeded.query_similar(queries[next(cycle)], top_k=10, exact=exact))
+
+    results = benchmark.pedantic(query, rounds=50 if not exact else 10, warmup_rounds=2)
+    assert len(results) == 10
@@ -0,0 +1,107 @@
+import asyncio
+import os
+import random
+
+import numpy as np
+import pytest
+
+from app.core.settings import settings
+
+SECTIONS = [
+    "Item 1. Business",
+    "Item 1A. Risk Factors",
+    "Item 7. Management's Discussion and Analysis of Financial Condition and Results of Operations",
+    "Item 7A. Quantitative and Qualitative Disclosures About Market Risk",
+    "Item 8. Financial Statements and Supplementary Data",
+]
+WORDS = (
+    "revenue operating income margin segment fiscal year compared increase decrease primarily "
+    "driven by customers products services cloud demand pricing costs supply chain foreign "
+    "currency exchange rates interest expense liquidity capital resources cash flows "
+    "repurchases dividends guidance outlook competition regulatory environment litigation"
+).split()
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--bench-sizes",
+        default="10000,100000,1000000",
+        help="comma-separated documents-table sizes for the pgvector benchmarks",
+    )
+
+
+def pytest_sessionstart(session):
+    # pytest-benchmark only warns about a missing baseline, then fails after the whole run
+    bench = session.config._benchmarksession
+    if bench.compare and not bench.compared_mapping:
+        raise pytest.UsageError(
+            f"no benchmark baseline in {bench.storage}; "
+            "run `poetry run task bench-save` on this machine first"
+        )
+
+
+def pytest_generate_tests(metafunc):
+    if "corpus_size" in metafunc.fixturenames:
+        sizes = [int(s) for s in metafunc.config.getoption("--bench-sizes").split(",")]
+        metafunc.parametrize("corpus_size", sizes, indirect=True, scope="session")
+
+
+def synthetic_filing(target_chars: int = 350_000, seed: int = 0) -> str:
+    """A deterministic 10-K sized document: sectioned prose paragraphs plus table-like lines."""
+    rng = random.Random(seed)
+    parts: list[str] = []
+    size = 0
+    while size < target_chars:
+        for section in SECTIONS:
+            parts.append(section)
+            for _ in range(rng.randint(8, 15)):
+                sentences = [
+                    " ".join(rng.choices(WORDS, k=rng.randint(12, 30))).capitalize() + "."
+                    for _ in range(rng.randint(3, 7))
+                ]
+                parts.append(" ".join(sentences))
+            for _ in range(rng.randint(3, 8)):
+                values = "  ".join(f"${rng.randint(100, 99_999):,}" for _ in range(4))
+                parts.append(f"{rng.choice(WORDS).capitalize()} {values}")
+        size = sum(len(p) + 2 for p in parts)
+    return "\n\n".join(parts)[:target_chars]
+
+
+@pytest.fixture(scope="session")
+def filing_text() -> str:
+    return synthetic_filing()
+
+
+@pytest.fixture(scope="session")
+def run():
+    """Run a coroutine to completion on one loop shared by the session (and its pool)."""
+    loop = asyncio.new_event_loop()
+    yield loop.run_until_complete
+    loop.close()
+
+
+@pytest.fixture(scope="session")
+def pg(run):
+    """
+    The Postgres stand-in: a scratch database named by BENCH_PGVECTOR_DB, which the pgvector
+    benchmarks truncate and reseed. Skipped when unset so they never touch a real database.
+    """
+    from app.services.db import close_pool, open_pool
+
+    database = os.environ.get("BENCH_PGVECTOR_DB")
+    if not database:
+        pytest.skip("set BENCH_PGVECTOR_DB to a scratch database to run pgvector benchmarks")
+    settings.pgvector_db = database
+    run(open_pool())
+    yield
+    run(close_pool())
+
+
+def unit_vectors(rng: np.random.Generator, n: int, dim: int = 384) -> np.ndarray:
+    vectors = rng.standard_normal((n, dim), dtype=np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+@pytest.fixture(scope="session")
+def corpus_size(request) -> int:
+    return request.param
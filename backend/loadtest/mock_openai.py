@@ -0,0 +1,227 @@
+"""
+OpenAI-compatible chat-completions mock for load tests.
+
+Serves POST /v1/chat/completions, both plain and streamed, with time-to-first-token, per-token
+latency and completion length drawn from configurable distributions. That lets /ai/query be
+driven at production rates without calling OpenAI:
+
+    poetry run task mock-openai --ttft lognormal:450:0.5 --completion-tokens uniform:80:400
+    OPENAI_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=mock poetry run task dev
+
+Distributions are written as kind:params, with times in milliseconds:
+fixed:V, uniform:LO:HI, normal:MEAN:SD, lognormal:MEDIAN:SIGMA, exponential:MEAN.
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections.abc import AsyncIterator
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+_PARAM_COUNTS = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "exponential": 1}
+
+# Filler vocabulary for generated completions; one word is one completion token
+_WORDS = (
+    "revenue margin guidance quarter growth segment cash flow dividend buyback capex exposure "
+    "risk outlook demand pricing inventory supply valuation earnings debt leverage rates"
+).split()
+
+
+@dataclass(frozen=True)
+class Distribution:
+    kind: str
+    params: tuple[float, ...]
+
+    @classmethod
+    def parse(cls, spec: str) -> "Distribution":
+        kind, *raw = spec.split(":")
+        if kind not in _PARAM_COUNTS:
+            raise ValueError(f"Unknown distribution {kind!r}; use one of {sorted(_PARAM_COUNTS)}")
+        if len(raw) != _PARAM_COUNTS[kind]:
+            raise ValueError(f"{kind} takes {_PARAM_COUNTS[kind]} parameter(s): {spec!r}")
+        return cls(kind, tuple(float(p) for p in raw))
+
+    def sample(self, rng: random.Random) -> float:
+        p = self.params
+        if self.kind == "fixed":
+            value = p[0]
+        elif self.kind == "uniform":
+            value = rng.uniform(p[0], p[1])
+        elif self.kind == "normal":
+            value = rng.gauss(p[0], p[1])
+        elif self.kind == "lognormal":
+            value = rng.lognormvariate(math.log(p[0]), p[1])
+        else:
+            value = rng.expovariate(1 / p[0]) if p[0] > 0 else 0.0
+        return max(0.0, value)
+
+
+@dataclass
+class MockConfig:
+    ttft_ms: Distribution
+    token_interval_ms: Distribution
+    completion_tokens: Distribution
+    error_rate: float = 0.0
+    seed: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "MockConfig":
+        """Read MOCK_OPENAI_* so every uvicorn worker process picks up the same settings."""
+        seed = os.environ.get("MOCK_OPENAI_SEED")
+        return cls(
+            ttft_ms=Distribution.parse(os.environ.get("MOCK_OPENAI_TTFT", "lognormal:400:0.5")),
+            token_interval_ms=Distribution.parse(
+                os.environ.get("MOCK_OPENAI_TOKEN_INTERVAL", "normal:15:4")
+            ),
+            completion_tokens=Distribution.parse(
+                os.environ.get("MOCK_OPENAI_COMPLETION_TOKENS", "uniform:80:300")
+            ),
+            error_rate=float(os.environ.get("MOCK_OPENAI_ERROR_RATE", "0")),
+            seed=int(seed) if seed else None,
+        )
+
+
+def _prompt_tokens(messages: list[dict]) -> int:
+    # ~4 characters per token is close enough for usage accounting in a mock
+    return sum(len(str(m.get("content") or "")) for m in messages) // 4 + 3 * len(messages)
+
+
+def create_app(config: MockConfig) -> FastAPI:
+    app = FastAPI(title="OpenAI mock")
+    rng = random.Random(config.seed)
+
+    def completion_words() -> list[str]:
+        n = max(1, round(config.completion_tokens.sample(rng)))
+        return [rng.choice(_WORDS) for _ in range(n)]
+
+    async def sleep_ms(distribution: Distribution) -> None:
+        await asyncio.sleep(distribution.sample(rng) / 1000)
+
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "mock"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        if rng.random() < config.error_rate:
+            return JSONResponse(
+                status_code=429,
+                content={"error": {"message": "Rate limited (mock)", "type": "rate_limit_error"}},
+            )
+        model = body.get("model", "mock")
+        words = completion_words()
+        prompt_tokens = _prompt_tokens(body.get("messages", []))
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+        }
+        completion_id = f"chatcmpl-mock-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+
+        if not body.get("stream"):
+            await sleep_ms(config.ttft_ms)
+            await asyncio.sleep(sum(config.token_interval_ms.sample(rng) for _ in words) / 1000)
+            return {
+                "id": completion_id,
+                "object": "chat.completion",
+                "created": created,
+                "model": model,
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": " ".join(words)},
+                        "finish_reason": "stop",
+                    }
+                ],
+                "usage": usage,
+            }
+
+        include_usage = bool((body.get("stream_options") or {}).get("include_usage"))
+
+        def chunk(delta: dict, finish_reason: str | None = None) -> str:
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": created,
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+            }
+            return f"data: {json.dumps(payload)}\n\n"
+
+        async def events() -> AsyncIterator[str]:
+            await sleep_ms(config.ttft_ms)
+            yield chunk({"role": "assistant", "content": ""})
+            for i, word in enumerate(words):
+                if i:
+                    await sleep_ms(config.token_interval_ms)
+                yield chunk({"content": word if i == 0 else f" {word}"})
+            yield chunk({}, finish_reason="stop")
+            if include_usage:
+                final = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [],
+                    "usage": usage,
+                }
+                yield f"data: {json.dumps(final)}\n\n"
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    return app
+
+
+# Module-level app for `uvicorn loadtest.mock_openai:app` (configured from the environment)
+app = create_app(MockConfig.from_env())
+
+
+def main() -> None:
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="OpenAI-compatible mock for load tests")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--ttft", help="time to first token, ms (MOCK_OPENAI_TTFT)")
+    parser.add_argument(
+        "--token-interval", help="ms per further token (MOCK_OPENAI_TOKEN_INTERVAL)"
+    )
+    parser.add_argument("--completion-tokens", help="tokens per answer")
+    parser.add_argument("--error-rate", type=float, help="fraction of requests answered with 429")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+
+    overrides = {
+        "MOCK_OPENAI_TTFT": args.ttft,
+        "MOCK_OPENAI_TOKEN_INTERVAL": args.token_interval,
+        "MOCK_OPENAI_COMPLETION_TOKENS": args.completion_tokens,
+        "MOCK_OPENAI_ERROR_RATE": args.error_rate,
+        "MOCK_OPENAI_SEED": args.seed,
+    }
+    for name, value in overrides.items():
+        if value is not None:
+            os.environ[name] = str(value)
+    MockConfig.from_env()  # fail fast on a bad distribution spec before spawning workers
+    uvicorn.run(
+        "loadtest.mock_openai:app",
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,148 @@
+"""
+Per-endpoint and per-stage latency percentiles from the traces Jaeger collected.
+
+Each trace's root span is the FastAPI server span, named after the route (e.g.
+"POST /ai/query"). Every span below it counts as a stage of that endpoint, e.g.
+embedding.query, retrieval.vector_search, llm.call or db.copy. Run it over the window of a
+load test:
+
+    poetry run task span-report --lookback 15m
+
+The share column is a stage's total time over its endpoint's total time. Nested stages overlap
+their parents, so shares do not sum to 100%.
+"""
+
+import argparse
+import json
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from pathlib import Path
+from typing import Any
+
+import numpy as np
+
+from app.core.settings import settings
+
+PERCENTILES = (50, 95, 99)
+
+# Per-message ASGI spans the FastAPI instrumentation adds under every request
+_SKIPPED_SUFFIXES = (" http send", " http receive")
+
+
+def parse_duration(text: str) -> float:
+    """Parse "90s", "15m" or "2h" into seconds."""
+    units = {"s": 1, "m": 60, "h": 3600}
+    if text and text[-1] in units:
+        return float(text[:-1]) * units[text[-1]]
+    return float(text)
+
+
+def fetch_traces(
+    jaeger_url: str, service: str, lookback_s: float, limit: int, operation: str | None = None
+) -> list[dict]:
+    end_us = int(time.time() * 1_000_000)
+    params = {
+        "service": service,
+        "start": end_us - int(lookback_s * 1_000_000),
+        "end": end_us,
+        "limit": limit,
+    }
+    if operation:
+        params["operation"] = operation
+    url = f"{jaeger_url.rstrip('/')}/api/traces?{urllib.parse.urlencode(params)}"
+    with urllib.request.urlopen(url, timeout=60) as response:
+        return json.load(response).get("data") or []
+
+
+def _stats(durations_ms: list[float]) -> dict[str, float]:
+    values = np.asarray(durations_ms)
+    stats: dict[str, float] = {"count": len(values)}
+    stats.update({f"p{p}": round(float(np.percentile(values, p)), 2) for p in PERCENTILES})
+    return stats
+
+
+def summarize(traces: list[dict]) -> dict[str, dict[str, Any]]:
+    """Group Jaeger traces by root operation into endpoint and stage latency percentiles."""
+    endpoint_ms: dict[str, list[float]] = defaultdict(list)
+    stage_ms: dict[str, dict[str, list[float]]] = defaultdict(lambda: defaultdict(list))
+    for trace in traces:
+        spans = trace.get("spans") or []
+        span_ids = {s["spanID"] for s in spans}
+        roots = [
+            s
+            for s in spans
+            if not any(
+                r.get("refType") == "CHILD_OF" and r.get("spanID") in span_ids
+                for r in s.get("references") or []
+            )
+        ]
+        if len(roots) != 1:
+            continue  # incomplete trace (spans still being exported) or several requests
+        endpoint = roots[0]["operationName"]
+        endpoint_ms[endpoint].append(roots[0]["duration"] / 1000)  # Jaeger reports microseconds
+        for span in spans:
+            name = span["operationName"]
+            if span is roots[0] or name.endswith(_SKIPPED_SUFFIXES):
+                continue
+            stage_ms[endpoint][name].append(span["duration"] / 1000)
+
+    report: dict[str, dict[str, Any]] = {}
+    for endpoint, durations in sorted(endpoint_ms.items()):
+        total = sum(durations)
+        stages = {}
+        for name, stage_durations in sorted(
+            stage_ms[endpoint].items(), key=lambda item: -sum(item[1])
+        ):
+            stages[name] = _stats(stage_durations)
+            stages[name]["share"] = round(sum(stage_durations) / total, 3) if total else 0.0
+        report[endpoint] = {**_stats(durations), "stages": stages}
+    return report
+
+
+def format_report(report: dict[str, dict[str, Any]]) -> str:
+    header = f"{'':<42}{'count':>8}" + "".join(f"{f'p{p} ms':>11}" for p in PERCENTILES)
+    lines = [header + f"{'share':>8}"]
+    for endpoint, stats in report.items():
+        lines.append(
+            f"{endpoint:<42}{stats['count']:>8}"
+            + "".join(f"{stats[f'p{p}']:>11.1f}" for p in PERCENTILES)
+        )
+        for name, stage in stats["stages"].items():
+            lines.append(
+                f"  {name:<40}{stage['count']:>8}"
+                + "".join(f"{stage[f'p{p}']:>11.1f}" for p in PERCENTILES)
+                + f"{stage['share']:>8.0%}"
+            )
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Latency percentiles per endpoint and stage")
+    parser.add_argument("--jaeger-url", default="http://localhost:16686")
+    parser.add_argument("--service", default=settings.otel_service_name)
+    parser.add_argument("--lookback", default="15m", help="window ending now, e.g. 90s, 15m, 1h")
+    parser.add_argument("--limit", type=int, default=5000, help="max traces per operation")
+    parser.add_argument(
+        "--operation", action="append", help="root operation(s) to fetch (default: all)"
+    )
+    parser.add_argument("--input", help="read a saved Jaeger /api/traces JSON instead")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args()
+
+    if args.input:
+        traces = json.loads(Path(args.input).read_text()).get("data") or []
+    else:
+        lookback_s = parse_duration(args.lookback)
+        traces = []
+        for operation in args.operation or [None]:
+            traces.extend(
+                fetch_traces(args.jaeger_url, args.service, lookback_s, args.limit, operation)
+            )
+    report = summarize(traces)
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
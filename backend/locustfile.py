@@ -1,15 +1,144 @@
+"""
+Weighted load-test scenarios for the RAG endpoints (see README: "Load Testing").
+
+    poetry run task mock-openai   # in one shell: stand-in for OpenAI
+    poetry run task loadtest      # in another: locust against http://localhost:8000
+
+Traffic mix (relative weights, overridable through LOCUST_*_WEIGHT):
+searches with varied top_k and mode, single-turn questions (plain and streamed), multi-turn
+conversations reusing conversation_id, and document ingestion.
+"""
+
+import os
+import random
+import uuid
+
 from locust import HttpUser, between, task
 
+HEADERS = {"X-API-Key": os.environ.get("LOCUST_API_KEY", "dev-secret-key")}
+
+TOP_K = [3, 5, 10, 20]
+MODES = ["vector", "vector", "hybrid", "lexical"]
+TICKERS = ["AAPL", "MSFT", "NVDA", "AMZN", "XOM", "JPM"]
+QUESTIONS = [
+    "What was {t}'s revenue growth in the last fiscal year?",
+    "Summarize the main risk factors {t} reports.",
+    "How did {t}'s operating margin change year over year?",
+    "What does {t} say about capital expenditures?",
+    "Is {t} exposed to interest rate changes?",
+    "What guidance did {t} give for next quarter?",
+]
+FOLLOW_UPS = [
+    "How does that compare with the prior year?",
+    "What are the main drivers behind that?",
+    "Which segment contributed most?",
+    "What risks could change that outlook?",
+]
+SENTENCES = [
+    "Revenue increased driven by strong demand in the cloud segment.",
+    "Operating margin contracted due to higher input costs and wage inflation.",
+    "The company repurchased shares and raised its quarterly dividend.",
+    "Management expects supply constraints to ease in the second half.",
+    "Capital expenditures rose as new data centers came online.",
+    "Foreign exchange headwinds reduced reported growth by two points.",
+]
+
+
+def _weight(name: str, default: int) -> int:
+    return int(os.environ.get(f"LOCUST_{name}_WEIGHT", default))
+
+
+def _question() -> str:
+    return random.choice(QUESTIONS).format(t=random.choice(TICKERS))
+
+
+class SearchUser(HttpUser):
+    """Retrieval only: /documents/search across top_k values and retrieval modes."""
+
+    weight = _weight("SEARCH", 5)
+    wait_time = between(0.5, 1.5)
 
-class FastAPIUser(HttpUser):
-    wait_time = between(1, 2)
+    @task
+    def search(self):
+        top_k = random.choice(TOP_K)
+        self.client.post(
+            "/documents/search",
+            json={"query": _question(), "top_k": top_k, "mode": random.choice(MODES)},
+            headers=HEADERS,
+            name=f"/documents/search [top_k={top_k}]",
+        )
+
+
+class QueryUser(HttpUser):
+    """Single-turn questions through the full RAG pipeline."""
+
+    weight = _weight("QUERY", 3)
+    wait_time = between(1, 3)
+
+    @task(3)
+    def query(self):
+        self.client.post(
+            "/ai/query",
+            json={"question": _question(), "mode": random.choice(MODES)},
+            headers=HEADERS,
+        )
 
     @task(1)
-    def ai_response_async(self):
-        prompt = "test prompt"
-        self.client.get("/ai-response", params={"prompt": prompt})
-
-    # @task(1)
-    # def ai_response_sync(self):
-    #     prompt = "test prompt"
-    #     self.client.get("/ai-response-sync", params={"prompt": prompt})
+    def query_stream(self):
+        # The body is read to the end, so the response time covers the whole stream
+        self.client.post("/ai/query/stream", json={"question": _question()}, headers=HEADERS)
+
+
+class ConversationUser(HttpUser):
+    """Multi-turn conversations: follow-ups reuse conversation_id and carry history."""
+
+    weight = _weight("CONVERSATION", 2)
+    wait_time = between(2, 5)
+
+    @task
+    def conversation(self):
+        payload = {"question": _question(), "max_history": 6}
+        for turn in range(random.randint(2, 4)):
+            with self.client.post(
+                "/ai/query",
+                json=payload,
+                headers=HEADERS,
+                name=f"/ai/query [turn {turn + 1}]",
+                catch_response=True,
+            ) as response:
+                if response.status_code != 200:
+                    response.failure(f"HTTP {response.status_code}")
+                    return
+                conversation_id = response.json()["conversation_id"]
+            payload = {
+                "question": random.choice(FOLLOW_UPS),
+                "conversation_id": conversation_id,
+                "max_history": 6,
+            }
+            self.wait()
+
+
+class IngestUser(HttpUser):
+    """Document ingestion; ids are prefixed with "loadtest-" so they are easy to clean up."""
+
+    weight = _weight("INGEST", 1)
+    wait_time = between(3, 8)
+
+    @task
+    def ingest(self):
+        docs = []
+        for _ in range(random.randint(1, 3)):
+            ticker = random.choice(TICKERS)
+            paragraphs = [
+                " ".join(random.choices(SENTENCES, k=random.randint(4, 10)))
+                for _ in range(random.randint(3, 12))
+            ]
+            docs.append(
+                {
+                    "id": f"loadtest-{uuid.uuid4().hex[:12]}",
+                    "title": f"{ticker} load-test filing",
+                    "text": "\n\n".join(paragraphs),
+                    "metadata": {"ticker": ticker, "source": "loadtest"},
+                }
+            )
+        self.client.post("/documents/", json={"docs": docs}, headers=HEADERS, name="/documents/")
@@ -1,20 +1,39 @@
 import os
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from loguru import logger
 
 from app.core.error_handlers import register_exception_handlers
-from app.core.middleware.logging import log_requests
+from app.core.middleware.logging import RequestLoggingMiddleware, request_log_writer
+from app.core.profiling import setup_profiling
 
 # Project-specific imports
 from app.core.settings import settings
 from app.core.telemetry import setup_otel
+from app.routes.admin import router as admin_router
 from app.routes.ai import router as ai_router
 from app.routes.core import router as core_router
+from app.routes.documents import index_router
 from app.routes.documents import router as documents_router
+from app.services.container import ServiceContainer
 
-app = FastAPI(title=settings.app_name)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # One set of services (model, pipeline, connection pool) per worker, shared by all routers
+    services = ServiceContainer()
+    app.state.services = services
+    request_log_writer.start()
+    await services.start()
+    yield
+    await services.stop()
+    request_log_writer.close()
+
+
+app = FastAPI(title=settings.app_name, lifespan=lifespan)
 register_exception_handlers(app)
 allowed_origins = [
     origin.strip() for origin in settings.allowed_origins.split(",") if origin.strip()
@@ -25,6 +44,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],  # GET /documents pagination
 )
 os.makedirs("logs", exist_ok=True)
 logger.add("logs/app.log", rotation="1 week", serialize=True)  # JSON logs
@@ -34,8 +54,14 @@ setup_otel(app)
 
 # Register routers
 app.include_router(documents_router)
+app.include_router(index_router)
 app.include_router(core_router)
 app.include_router(ai_router)
 
-# Enhanced structured logging middleware
-app.middleware("http")(log_requests)
+# On-demand profiling (admin key); without PROFILING_ENABLED neither routes nor middleware exist
+if settings.profiling_enabled:
+    setup_profiling(app)
+    app.include_router(admin_router)
+
+# Request logging (pure ASGI; records are written by a background thread)
+app.add_middleware(RequestLoggingMiddleware)
@@ -0,0 +1,60 @@
+import numpy as np
+
+from app.services.answer_cache import SemanticAnswerCache
+
+SOURCES = [("doc-1", 0), ("doc-2", 3)]
+
+
+def _cache(**overrides):
+    params = {"threshold": 0.95, "ttl_s": 60, "max_entries": 10}
+    params.update(overrides)
+    return SemanticAnswerCache(**params)
+
+
+def test_hit_requires_similar_question_and_same_sources():
+    cache = _cache()
+    question = np.array([1.0, 0.0, 0.0], dtype=np.float32)
+    cache.store("latest AAPL guidance?", question, SOURCES, "answer")
+
+    near = np.array([0.99, 0.05, 0.0], dtype=np.float32)
+    assert cache.lookup(near, reversed(SOURCES)) == "answer"
+    assert cache.lookup(near, SOURCES[:1]) is None
+    assert cache.lookup(np.array([0.0, 1.0, 0.0], dtype=np.float32), SOURCES) is None
+
+
+def test_invalidate_documents_drops_entries_citing_them():
+    cache = _cache()
+    cache.store("q1", np.array([1.0, 0.0]), SOURCES, "a1")
+    cache.store("q2", np.array([0.0, 1.0]), [("doc-3", 0)], "a2")
+    assert cache.invalidate_documents(["doc-2"]) == 1
+    assert cache.lookup(np.array([1.0, 0.0]), SOURCES) is None
+    assert cache.lookup(np.array([0.0, 1.0]), [("doc-3", 0)]) == "a2"
+
+
+def test_expired_and_overflowing_entries_are_dropped():
+    cache = _cache(ttl_s=-1)
+    cache.store("q", np.array([1.0, 0.0]), SOURCES, "a")
+    assert cache.lookup(np.array([1.0, 0.0]), SOURCES) is None
+    assert len(cache) == 0
+
+    cache = _cache(max_entries=1)
+    cache.store("q1", np.array([1.0, 0.0]), SOURCES, "a1")
+    cache.store("q2", np.array([0.0, 1.0]), SOURCES, "a2")
+    assert len(cache) == 1
+    assert cache.lookup(np.array([1.0, 0.0]), SOURCES) is None
+
+
+def test_full_cache_overwrites_the_oldest_entry_in_place():
+    cache = _cache(max_entries=2)
+    for i, vector in enumerate([[1.0, 0.0], [0.0, 1.0], [-1.0, 0.0]]):
+        cache.store(f"q{i}", np.array(vector), SOURCES, f"a{i}")
+    matrix = cache._matrix
+    assert len(cache) == 2 and matrix is not None and matrix.shape == (2, 2)
+    assert cache.lookup(np.array([1.0, 0.0]), SOURCES) is None
+    assert cache.lookup(np.array([-1.0, 0.0]), SOURCES) == "a2"
+
+    cache.store("q3", np.array([0.0, -1.0]), SOURCES, "a3")  # evicts q1
+    assert cache._matrix is matrix
+    assert cache.lookup(np.array([0.0, 1.0]), SOURCES) is None
+    assert cache.invalidate_documents(["doc-9"]) == 0
+    assert [cache.lookup(np.array(v), SOURCES) for v in ([-1.0, 0.0], [0.0, -1.0])] == ["a2", "a3"]
@@ -0,0 +1,38 @@
+import asyncio
+
+import pytest
+
+from app.core.settings import settings
+from app.services.container import ServiceContainer
+
+
+@pytest.fixture(autouse=True)
+def _openai_key(monkeypatch):
+    monkeypatch.setattr(settings, "openai_api_key", "test-key")  # AIService builds its client
+
+
+def test_model_loads_in_background_and_reports_timings():
+    services = ServiceContainer()
+    embedder = services.rag_pipeline.embedder
+    calls = []
+    embedder.load = lambda: calls.append(("load", services.status["model"]))
+    embedder.warmup = lambda: calls.append(("warmup", services.status["model"]))
+
+    asyncio.run(services._load_model())
+    assert calls == [("load", "loading"), ("warmup", "loading")]
+    assert services.status["model"] == "ready"
+    assert {"model_load", "model_warmup"} <= services.startup_seconds.keys()
+    assert all(seconds >= 0 for seconds in services.startup_seconds.values())
+    assert not services.ready  # pool and schema were never started
+
+
+def test_failed_model_load_is_reported_not_raised():
+    services = ServiceContainer()
+
+    def broken_load():
+        raise OSError("model files missing")
+
+    services.rag_pipeline.embedder.load = broken_load
+    asyncio.run(services._load_model())
+    assert services.status["model"] == "failed"
+    assert services.readiness()["ready"] is False
@@ -0,0 +1,38 @@
+import numpy as np
+
+from app.services.embedding_backends import EmbeddingBackend, cosine_drift, mean_pool, parity_check
+
+
+class FixedBackend(EmbeddingBackend):
+    def __init__(self, name: str, vectors: np.ndarray):
+        self.name = name
+        self.vectors = vectors
+
+    def encode(self, texts: list[str], batch_size: int = 32) -> np.ndarray:
+        return self.vectors[: len(texts)]
+
+
+def test_mean_pool_ignores_padding_and_normalizes():
+    hidden = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0]])
+    pooled = mean_pool(hidden, mask)
+    np.testing.assert_allclose(pooled, [[1.0, 0.0]])
+    assert pooled.dtype == np.float32
+
+
+def test_cosine_drift_reports_worst_row():
+    reference = np.array([[1.0, 0.0], [0.0, 1.0]])
+    candidate = np.array([[2.0, 0.0], [1.0, 1.0]])
+    drift = cosine_drift(reference, candidate)
+    assert np.isclose(drift["min_cosine"], np.sqrt(0.5))
+    assert np.isclose(drift["max_drift"], 1 - np.sqrt(0.5))
+    assert np.isclose(drift["mean_cosine"], (1 + np.sqrt(0.5)) / 2)
+
+
+def test_parity_check_includes_latency_per_backend():
+    vectors = np.eye(3, dtype=np.float32)
+    report = parity_check(
+        FixedBackend("torch", vectors), FixedBackend("onnx", vectors), ["a", "b", "c"], repeats=1
+    )
+    assert np.isclose(report["min_cosine"], 1.0)
+    assert {"torch_query_ms", "onnx_query_ms", "speedup"} <= report.keys()
@@ -0,0 +1,104 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import numpy as np
+
+from app.services import embedding_cache
+from app.services.embedding_cache import EVICT_BATCH, EmbeddingCache, content_key
+
+
+class FakeCursor:
+    def __init__(self, conn, rows=(), rowcount=0):
+        self.conn = conn
+        self.rows = list(rows)
+        self.rowcount = rowcount
+
+    async def fetchall(self):
+        return self.rows
+
+    async def fetchone(self):
+        return self.rows[0] if self.rows else None
+
+    async def executemany(self, query, params):
+        self.conn.inserted.extend(params)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+
+class FakeConnection:
+    """Serves stored rows the way the pgvector loader does: embeddings as numpy arrays."""
+
+    def __init__(self, rows, reltuples=0):
+        self.rows = rows
+        self.reltuples = reltuples
+        self.queries = []
+        self.inserted = []
+
+    async def execute(self, query, params=None):
+        self.queries.append((" ".join(query.split()), params))
+        if query.lstrip().startswith("SELECT key, embedding"):
+            wanted = set(params[0])
+            return FakeCursor(self, [(k, v) for k, v in self.rows.items() if k in wanted])
+        if "FROM pg_class" in query:
+            return FakeCursor(self, [(self.reltuples,)])
+        return FakeCursor(self, rowcount=3)
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+def _patch_connection(monkeypatch, conn):
+    @asynccontextmanager
+    async def connection():
+        yield conn
+
+    monkeypatch.setattr(embedding_cache, "connection", connection)
+
+
+def test_embed_serves_cached_rows_and_encodes_only_misses(monkeypatch):
+    cache = EmbeddingCache("model", max_entries=10)
+    stored = np.arange(384, dtype=np.float32)
+    conn = FakeConnection({content_key("model", "cached"): stored})
+    _patch_connection(monkeypatch, conn)
+    encoded = []
+
+    async def embed_fn(texts):
+        encoded.append(texts)
+        return np.ones((len(texts), 384), dtype=np.float32)
+
+    result = asyncio.run(cache.embed(["cached", "new", "cached"], embed_fn))
+
+    assert encoded == [["new"]]
+    assert result.dtype == np.float32 and result.shape == (3, 384)
+    np.testing.assert_array_equal(result[0], stored)
+    np.testing.assert_array_equal(result[1], np.ones(384))
+    assert [key for key, _, _ in conn.inserted] == [content_key("model", "new")]
+
+
+def test_evict_is_a_catalog_lookup_while_under_the_cap(monkeypatch):
+    conn = FakeConnection({}, reltuples=10)
+    _patch_connection(monkeypatch, conn)
+    assert asyncio.run(EmbeddingCache("model", max_entries=10).evict()) == 0
+    assert len(conn.queries) == 1
+
+
+def test_evict_deletes_a_bounded_batch_of_the_oldest_rows(monkeypatch):
+    conn = FakeConnection({}, reltuples=12)
+    _patch_connection(monkeypatch, conn)
+    assert asyncio.run(EmbeddingCache("model", max_entries=10).evict()) == 3
+    query, params = conn.queries[-1]
+    assert "ORDER BY last_used LIMIT %s" in query
+    assert params == (2,)
+
+    conn.reltuples = 10 + 5 * EVICT_BATCH
+    asyncio.run(EmbeddingCache("model", max_entries=10).evict())
+    assert conn.queries[-1][1] == (EVICT_BATCH,)
+
+
+def test_empty_batch_uses_the_configured_dimension():
+    cache = EmbeddingCache("model", max_entries=10, dimension=768)
+    assert asyncio.run(cache.embed([], None)).shape == (0, 768)
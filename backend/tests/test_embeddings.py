@@ -0,0 +1,69 @@
+import asyncio
+
+import numpy as np
+
+from app.services.embeddings import QueryEmbeddingBatcher, QueryEmbeddingCache
+
+MODEL = "test-model"
+
+
+def test_hit_returns_same_array_without_copy():
+    cache = QueryEmbeddingCache(max_entries=4, ttl_s=60)
+    embedding = np.ones(4, dtype=np.float32)
+    cache.put(MODEL, "latest AAPL guidance", embedding)
+    cached = cache.get(MODEL, "  latest   AAPL guidance ")
+    assert cached is embedding
+    assert not cached.flags.writeable
+
+
+def test_key_includes_model_name():
+    cache = QueryEmbeddingCache(max_entries=4, ttl_s=60)
+    cache.put(MODEL, "q", np.ones(4, dtype=np.float32))
+    assert cache.get("other-model", "q") is None
+
+
+def test_evicts_least_recently_used():
+    cache = QueryEmbeddingCache(max_entries=2, ttl_s=60)
+    cache.put(MODEL, "a", np.zeros(4, dtype=np.float32))
+    cache.put(MODEL, "b", np.zeros(4, dtype=np.float32))
+    assert cache.get(MODEL, "a") is not None  # "a" is now most recently used
+    cache.put(MODEL, "c", np.zeros(4, dtype=np.float32))
+    assert cache.get(MODEL, "b") is None
+    assert cache.get(MODEL, "a") is not None
+    assert len(cache) == 2
+
+
+def test_expired_entries_are_misses():
+    cache = QueryEmbeddingCache(max_entries=2, ttl_s=-1)
+    cache.put(MODEL, "a", np.zeros(4, dtype=np.float32))
+    assert cache.get(MODEL, "a") is None
+    assert len(cache) == 0
+
+
+def test_batcher_coalesces_concurrent_queries():
+    batch_sizes = []
+
+    def encode(texts):
+        batch_sizes.append(len(texts))
+        return np.array([[len(text)] * 4 for text in texts], dtype=np.float32)
+
+    batcher = QueryEmbeddingBatcher(encode, max_batch_size=8, max_wait_ms=2)
+
+    async def run():
+        return await asyncio.gather(*[batcher.embed("x" * i) for i in range(20)])
+
+    results = asyncio.run(run())
+    assert [int(r[0]) for r in results] == list(range(20))
+    assert batch_sizes == [8, 8, 4]
+
+
+def test_batcher_propagates_encoder_errors():
+    def encode(texts):
+        raise RuntimeError("boom")
+
+    batcher = QueryEmbeddingBatcher(encode, max_batch_size=4, max_wait_ms=0)
+
+    async def run():
+        return await asyncio.gather(batcher.embed("a"), batcher.embed("b"), return_exceptions=True)
+
+    assert all(isinstance(r, RuntimeError) for r in asyncio.run(run()))
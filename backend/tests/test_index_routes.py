@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.auth import get_api_key
+from app.core.settings import settings
+from app.routes import documents
+from app.services.container import get_services
+
+
+class FakeVectorDB:
+    def __init__(self):
+        self.dropped = []
+
+    async def index_info(self, quantization=None):
+        return {"name": "idx_documents_embedding_ann"}
+
+    async def drop_index(self, quantization=None):
+        self.dropped.append(quantization)
+        return True
+
+
+@pytest.fixture
+def vectordb(monkeypatch) -> FakeVectorDB:
+    monkeypatch.setattr(settings, "admin_api_key", "admin-secret")
+    return FakeVectorDB()
+
+
+@pytest.fixture
+def client(vectordb) -> TestClient:
+    app = FastAPI()
+    app.include_router(documents.router)
+    app.include_router(documents.index_router)
+    services = SimpleNamespace(rag_pipeline=SimpleNamespace(vectordb=vectordb))
+    app.dependency_overrides[get_services] = lambda: services
+    app.dependency_overrides[get_api_key] = lambda: "key"
+    return TestClient(app)
+
+
+def test_index_management_needs_the_admin_key(client, vectordb):
+    assert client.delete("/admin/index").status_code == 401
+    assert client.delete("/admin/index", headers={"X-API-Key": "key"}).status_code == 401
+    assert vectordb.dropped == []
+    response = client.delete("/admin/index", headers={"X-Admin-Key": "admin-secret"})
+    assert response.json() == {"dropped": True}
+
+
+def test_a_document_called_index_is_not_shadowed(client, monkeypatch):
+    async def get_document(doc_id):
+        return {"id": doc_id, "title": "t", "text": "x"}
+
+    monkeypatch.setattr(documents, "get_document", get_document)
+    assert client.get("/documents/index").json()["id"] == "index"
@@ -0,0 +1,87 @@
+import asyncio
+import random
+
+import httpx
+import openai
+import pytest
+
+from app.core.settings import settings
+from app.services.ai_service import AIService
+from loadtest.mock_openai import Distribution, MockConfig, create_app
+from loadtest.span_report import summarize
+
+
+@pytest.fixture
+def ai_service(monkeypatch):
+    """AIService talking to the mock in-process, with instant and fixed-length answers."""
+    monkeypatch.setattr(settings, "openai_api_key", "mock")
+    config = MockConfig(
+        ttft_ms=Distribution.parse("fixed:0"),
+        token_interval_ms=Distribution.parse("fixed:0"),
+        completion_tokens=Distribution.parse("fixed:5"),
+        seed=1,
+    )
+    service = AIService()
+    service.openai_client = openai.AsyncOpenAI(
+        api_key="mock",
+        base_url="http://mock/v1",
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=create_app(config))),
+    )
+    return service
+
+
+def test_distribution_specs():
+    rng = random.Random(0)
+    assert Distribution.parse("fixed:12").sample(rng) == 12
+    assert 5 <= Distribution.parse("uniform:5:10").sample(rng) <= 10
+    assert Distribution.parse("normal:-100:1").sample(rng) == 0  # latencies never go negative
+    with pytest.raises(ValueError):
+        Distribution.parse("lognormal:400")
+    with pytest.raises(ValueError):
+        Distribution.parse("gamma:1:2")
+
+
+def test_ai_service_against_mock(ai_service):
+    answer = asyncio.run(ai_service.query_llm("What was revenue growth?"))
+    assert len(answer.split()) == 5
+
+    async def stream() -> list[str]:
+        return [token async for token in ai_service.stream_llm("What was revenue growth?")]
+
+    tokens = asyncio.run(stream())
+    assert len(tokens) == 5
+    assert len("".join(tokens).split()) == 5
+
+
+def _span(span_id, name, duration_us, parent=None):
+    references = [{"refType": "CHILD_OF", "spanID": parent}] if parent else []
+    return {
+        "spanID": span_id,
+        "operationName": name,
+        "duration": duration_us,
+        "references": references,
+    }
+
+
+def test_span_report_groups_stages_by_endpoint():
+    traces = [
+        {
+            "spans": [
+                _span("a", "POST /ai/query", 100_000 * i),
+                _span("b", "embedding.query", 10_000 * i, "a"),
+                _span("c", "llm.call", 80_000 * i, "a"),
+                _span("d", "POST /ai/query http send", 100, "a"),
+            ]
+        }
+        for i in range(1, 5)
+    ]
+    traces.append({"spans": [_span("x", "llm.call", 5_000, "missing-root")]})
+
+    report = summarize(traces)
+    assert list(report) == ["POST /ai/query", "llm.call"]  # orphan spans form their own root
+    query = report["POST /ai/query"]
+    assert query["count"] == 4
+    assert query["p50"] == 250.0
+    assert list(query["stages"]) == ["llm.call", "embedding.query"]  # by total time
+    assert query["stages"]["llm.call"]["share"] == 0.8
+    assert "POST /ai/query http send" not in query["stages"]
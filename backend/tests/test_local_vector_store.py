@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+from app.services.local_vector_store import LocalVectorIndex, _checksum, top_k_rows
+
+
+def _row(row_id, version, doc_id, vector):
+    return (row_id, version, doc_id, 0, f"chunk {doc_id}", np.asarray(vector), {"t": doc_id}, 3)
+
+
+def test_top_k_rows_orders_best_first_and_skips_masked():
+    scores = np.array([0.1, 0.9, -np.inf, 0.5])
+    assert top_k_rows(scores, 2).tolist() == [1, 3]
+    assert top_k_rows(scores, 10).tolist() == [1, 3, 0]
+
+
+def test_apply_and_search_with_updates_and_deletes(tmp_path):
+    index = LocalVectorIndex(tmp_path, dim=2)
+    index.apply([_row(1, 1, "a", [1, 0]), _row(2, 2, "b", [0, 1]), _row(3, 3, "c", [0.7, 0.7])], [])
+    results = index.search(np.array([1.0, 0.0]), top_k=2)
+    assert [r.doc_id for r in results] == ["a", "c"]
+    assert results[0].distance == -1.0  # negative inner product, like pgvector's <#>
+    assert results[0].metadata == {"t": "a"}
+
+    # Row 1 moves away from the query and row 3 is deleted
+    index.apply([_row(1, 4, "a", [-1, 0])], [3])
+    assert [r.doc_id for r in index.search(np.array([1.0, 0.0]), top_k=3)] == ["b", "a"]
+    assert index.live_versions() == {1: 4, 2: 2}
+
+
+def test_apply_publishes_the_new_row_before_tombstoning_the_old_one(tmp_path):
+    index = LocalVectorIndex(tmp_path, dim=2)
+    index.apply([_row(1, 1, "a", [1, 0])], [])
+    write_manifest = index._write_manifest
+    seen = []
+
+    def record(manifest):
+        # Ids in the rows file at the moment the new count is published
+        seen.append(np.fromfile(tmp_path / "rows.0.i64", dtype=np.int64).reshape(-1, 2)[:, 0])
+        write_manifest(manifest)
+
+    index._write_manifest = record
+    index.apply([_row(1, 2, "a", [0, 1])], [])
+    assert seen[0].tolist() == [1, 1]  # old row not yet tombstoned, new row already appended
+    assert index.live_versions() == {1: 2}
+
+
+def test_hnsw_search_matches_exact_and_scans_rows_added_after_the_graph(tmp_path):
+    pytest.importorskip("hnswlib")
+    vectors = np.random.default_rng(0).standard_normal((50, 4)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    rows = [_row(i, i, f"d{i}", v) for i, v in enumerate(vectors, start=1)]
+    LocalVectorIndex(tmp_path, dim=4, use_hnsw=True).apply(rows[:40], [])
+    # Appended and deleted without touching the graph: d41..d50 exist only past hnsw_count
+    LocalVectorIndex(tmp_path, dim=4).apply(rows[40:], [1])
+
+    reader = LocalVectorIndex(tmp_path, dim=4, use_hnsw=True)
+    snap = reader.snapshot()
+    assert snap is not None and snap.hnsw is not None
+    assert (snap.hnsw_count, snap.count) == (40, 50)
+    for query in vectors[[0, 7, 45]]:
+        approx = reader.search(query, top_k=5, ef_search=100)
+        exact = reader.search(query, top_k=5, exact=True)
+        assert [r.doc_id for r in approx] == [r.doc_id for r in exact]
+        assert "d1" not in {r.doc_id for r in approx}
+    assert reader.search(vectors[45], top_k=1)[0].doc_id == "d46"
+
+
+def test_checksum_counts_inserts_updates_and_deletes():
+    local = {1: 1, 2: 2, 3: 3}
+    upserts = [_row(2, 5, "b", [0, 1]), _row(4, 6, "d", [1, 1])]
+    assert _checksum(local, upserts, [3]) == (3, 1 + 5 + 6)
+
+
+def test_compaction_drops_tombstones_and_a_fresh_reader_sees_the_same_rows(tmp_path):
+    writer = LocalVectorIndex(tmp_path, dim=2)
+    writer.apply([_row(i, i, f"d{i}", [1, i / 10]) for i in range(1, 5)], [])
+    writer.apply([], [1, 2])  # half the rows tombstoned -> compacted into generation 1
+    manifest = writer.read_manifest()
+    assert (manifest["generation"], manifest["count"]) == (1, 2)
+    assert not (tmp_path / "vectors.0.f32").exists()
+
+    reader = LocalVectorIndex(tmp_path, dim=2)
+    assert [r.doc_id for r in reader.search(np.array([0.0, 1.0]), top_k=5)] == ["d4", "d3"]
+    assert reader.live_versions() == {3: 3, 4: 4}
@@ -0,0 +1,47 @@
+import asyncio
+
+from app.services.memory import InMemoryConversationMemory
+
+
+def _memory(**overrides):
+    params = {"max_conversations": 10, "idle_ttl_s": 60, "max_messages": 3}
+    params.update(overrides)
+    return InMemoryConversationMemory(**params)
+
+
+def test_message_cap_keeps_newest_messages():
+    async def run():
+        memory = _memory()
+        conversation_id = await memory.create_conversation()
+        for i in range(5):
+            await memory.append(conversation_id, "user", f"m{i}")
+        assert [m["content"] for m in await memory.get(conversation_id)] == ["m2", "m3", "m4"]
+        assert [m["content"] for m in await memory.last_n(conversation_id, 2)] == ["m3", "m4"]
+        assert await memory.count(conversation_id) == 3
+
+    asyncio.run(run())
+
+
+def test_least_recently_active_conversation_is_evicted():
+    async def run():
+        memory = _memory(max_conversations=2)
+        first = await memory.create_conversation()
+        second = await memory.create_conversation()
+        await memory.append(first, "user", "still active")
+        await memory.create_conversation()
+        assert len(memory) == 2
+        assert await memory.count(first) == 1
+        assert await memory.get(second) == []
+
+    asyncio.run(run())
+
+
+def test_idle_conversations_expire():
+    async def run():
+        memory = _memory(idle_ttl_s=-1)
+        conversation_id = await memory.create_conversation()
+        await memory.append(conversation_id, "user", "hello")
+        assert await memory.get(conversation_id) == []
+        assert len(memory) == 0
+
+    asyncio.run(run())
@@ -0,0 +1,100 @@
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.profiling import MemoryProfiler, RequestProfilerMiddleware, StackSampler
+from app.core.settings import settings
+from app.routes.admin import router as admin_router
+
+ADMIN = {"X-Admin-Key": "admin-secret"}
+
+
+@pytest.fixture
+def client(monkeypatch) -> TestClient:
+    monkeypatch.setattr(settings, "admin_api_key", "admin-secret")
+    app = FastAPI()
+
+    @app.get("/work")
+    async def work():
+        return {"total": sum(i * i for i in range(20_000))}
+
+    app.include_router(admin_router)
+    app.add_middleware(RequestProfilerMiddleware)
+    return TestClient(app)
+
+
+def test_unprofiled_requests_pass_through(client):
+    response = client.get("/work")
+    assert response.status_code == 200
+    assert "total" in response.json()
+
+
+def test_profile_header_requires_admin_key(client):
+    assert client.get("/work", headers={"X-Profile": "speedscope"}).status_code == 401
+    bad_key = {"X-Profile": "speedscope", "X-Admin-Key": "wrong"}
+    assert client.get("/work", headers=bad_key).status_code == 401
+    non_ascii_key = {"X-Profile": "speedscope", "X-Admin-Key": "clé".encode("latin-1")}
+    assert client.get("/work", headers=non_ascii_key).status_code == 401
+    assert client.get("/admin/profiling/sampler", headers=non_ascii_key).status_code == 401
+
+
+def test_profile_header_returns_speedscope_profile(client):
+    pytest.importorskip("pyinstrument")
+    response = client.get("/work", headers={"X-Profile": "speedscope", **ADMIN})
+    assert response.status_code == 200
+    assert response.headers["X-Profiled-Status"] == "200"
+    assert "speedscope" in response.json()["$schema"]
+
+
+def test_admin_routes_need_the_admin_key(client):
+    assert client.get("/admin/profiling/sampler").status_code == 401
+    assert client.get("/admin/profiling/sampler", headers=ADMIN).json()["running"] is False
+
+
+def _busy_loop_for_sampler(seconds: float) -> None:
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        sum(range(1000))
+
+
+def test_stack_sampler_collects_collapsed_stacks():
+    sampler = StackSampler()
+    sampler.start(duration_s=5, interval_s=0.002)
+    _busy_loop_for_sampler(0.2)
+    sampler.stop()
+    assert not sampler.running
+    assert sampler.samples > 0
+    lines = sampler.collapsed().splitlines()
+    hot = [line for line in lines if "_busy_loop_for_sampler" in line]
+    assert hot and all(line.startswith("MainThread;") for line in hot)
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+
+
+def test_stack_sampler_runs_one_session_at_a_time():
+    sampler = StackSampler()
+    sampler.start(duration_s=5, interval_s=0.01)
+    try:
+        with pytest.raises(RuntimeError):
+            sampler.start(duration_s=5, interval_s=0.01)
+    finally:
+        sampler.stop()
+    sampler.start(duration_s=0.05, interval_s=0.01)  # time-boxed: ends without stop()
+    time.sleep(0.2)
+    assert not sampler.running
+
+
+def test_memory_profiler_reports_growth_since_baseline():
+    profiler = MemoryProfiler()
+    profiler.start()
+    try:
+        retained = [bytearray(1024) for _ in range(2000)]  # noqa: F841 - kept alive for the diff
+        report = profiler.diff(top=5)
+    finally:
+        profiler.stop()
+    top = report["top"][0]
+    assert "test_profiling.py" in top["location"]
+    assert top["size_diff_kb"] > 1000
+    with pytest.raises(RuntimeError):
+        profiler.diff()
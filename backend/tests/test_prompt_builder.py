@@ -0,0 +1,47 @@
+from app.services.prompt_builder import PromptBudget, PromptBuilder
+from app.services.tokens import count_tokens
+
+CHUNKS = [("alpha " * 40, None), ("beta " * 40, None), ("gamma " * 40, None)]
+
+
+def _builder(**overrides):
+    params = {"total": 10_000, "system": 0, "history": 1_000, "question": 100}
+    params.update(overrides)
+    return PromptBuilder(PromptBudget(**params))
+
+
+def test_everything_fits_a_generous_budget():
+    history = [{"role": "user", "content": "hi"}, {"role": "ai", "content": "hello"}]
+    built = _builder().build("What changed?", history, CHUNKS)
+    assert built.chunks_used == 3
+    assert built.history_used == 2
+    assert "USER: hi\nAI: hello" in built.prompt
+
+
+def test_lowest_ranked_chunks_are_dropped_first():
+    builder = _builder()
+    chunk_tokens = count_tokens(CHUNKS[0][0])
+    base = builder.system_tokens + count_tokens("q")
+    builder.budget.total = base + 2 * chunk_tokens + 1
+    built = builder.build("q", [], CHUNKS)
+    assert built.chunks_used == 2
+    assert "gamma" not in built.prompt
+    assert built.total_tokens <= builder.budget.total
+
+
+def test_oldest_history_is_dropped_first():
+    history = [
+        {"role": "user", "content": "old " * 50},
+        {"role": "ai", "content": "recent"},
+    ]
+    built = _builder(history=count_tokens("AI: recent") + 1).build("q", history, CHUNKS)
+    assert built.history_used == 1
+    assert "old" not in built.prompt
+
+
+def test_oversized_top_chunk_is_truncated_not_dropped():
+    builder = _builder()
+    builder.budget.total = builder.system_tokens + count_tokens("q") + 5
+    built = builder.build("q", [], [("delta " * 500, 500)])
+    assert built.chunks_used == 1
+    assert 0 < built.tokens["context"] <= 5
@@ -0,0 +1,93 @@
+import asyncio
+from contextlib import asynccontextmanager
+
+import numpy as np
+
+from app.models import Document
+from app.services import rag_pipeline
+from app.services.rag_pipeline import RAGPipeline
+from app.services.vectordb import chunk_hash
+
+
+def _stored(doc_id, chunks, legacy=()):
+    return [
+        (doc_id, row_id, None if row_id in legacy else chunk_hash(chunk))
+        for row_id, chunk in enumerate(chunks, start=100)
+    ]
+
+
+def test_diff_reuses_unchanged_chunks_and_replaces_the_rest():
+    doc = Document(id="doc-1", title="Q3", text="")
+    existing = _stored("doc-1", ["intro", "revenue", "outlook"])
+    diff = RAGPipeline.diff_chunks([(doc, ["new intro", "revenue", "outlook"])], existing)
+    assert [(row_id, idx) for row_id, idx, _ in diff.reused] == [(101, 1), (102, 2)]
+    assert [(doc_id, idx, chunk) for doc_id, idx, chunk, _ in diff.added] == [
+        ("doc-1", 0, "new intro")
+    ]
+    assert diff.removed == [100]
+    assert diff.stats() == {
+        "chunks_indexed": 3,
+        "chunks_reused": 2,
+        "chunks_added": 1,
+        "chunks_removed": 1,
+    }
+
+
+def test_diff_matches_duplicate_chunks_once_and_skips_unhashed_rows():
+    doc = Document(id="doc-1", title="Q3", text="")
+    existing = _stored("doc-1", ["same", "same", "legacy"], legacy={102})
+    diff = RAGPipeline.diff_chunks([(doc, ["same", "legacy"])], existing)
+    assert [row_id for row_id, _, _ in diff.reused] == [100]
+    assert [chunk for _, _, chunk, _ in diff.added] == ["legacy"]
+    assert sorted(diff.removed) == [101, 102]
+
+
+def test_index_documents_keeps_only_the_last_copy_of_a_repeated_id(monkeypatch):
+    written = {}
+
+    class FakeVectorDB:
+        async def chunk_hashes(self, conn, doc_ids):
+            written["doc_ids"] = doc_ids
+            return _stored("doc-1", ["intro"])
+
+        async def lock_documents(self, conn, doc_ids):
+            pass
+
+        async def delete_chunks(self, conn, row_ids):
+            written["removed"] = row_ids
+
+        async def update_chunk_positions(self, conn, updates):
+            written["reused"] = updates
+
+        async def copy_embeddings(self, conn, rows):
+            written["added"] = [(doc_id, idx, chunk) for doc_id, idx, chunk, *_ in rows]
+
+    @asynccontextmanager
+    async def connection():
+        yield None
+
+    async def copy_documents(conn, docs):
+        written["docs"] = [doc.text for doc in docs]
+
+    async def embed_chunks(texts):
+        return np.zeros((len(texts), 2), dtype=np.float32)
+
+    monkeypatch.setattr(rag_pipeline, "connection", connection)
+    monkeypatch.setattr(rag_pipeline, "copy_documents", copy_documents)
+    pipeline = RAGPipeline(chunk_size=10, chunk_overlap=0)
+    pipeline.vectordb = FakeVectorDB()
+    monkeypatch.setattr(pipeline, "embed_chunks", embed_chunks)
+    monkeypatch.setattr(
+        pipeline, "count_chunk_tokens", lambda texts: asyncio.sleep(0, [1] * len(texts))
+    )
+    monkeypatch.setattr(pipeline.chunker, "chunk_text", lambda text: text.split())
+
+    first = Document(id="doc-1", title="Q3", text="intro draft")
+    second = Document(id="doc-1", title="Q3", text="intro final")
+    stats = asyncio.run(pipeline.index_documents([first, second]))
+
+    assert written["doc_ids"] == ["doc-1"]
+    assert written["docs"] == ["intro final"]
+    assert [(row_id, idx) for row_id, idx, _ in written["reused"]] == [(100, 0)]
+    assert written["added"] == [("doc-1", 1, "final")]
+    assert stats["documents"] == 1 and stats["chunks_indexed"] == 2
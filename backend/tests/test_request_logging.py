@@ -0,0 +1,108 @@
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from loguru import logger
+
+from app.core import request_metrics
+from app.core.middleware.logging import RequestLoggingMiddleware, RequestLogWriter
+
+
+def _client(writer: RequestLogWriter, sample_rates: dict[str, float] | None = None) -> TestClient:
+    app = FastAPI()
+
+    @app.post("/upload")
+    async def upload(request: Request):
+        return {"bytes": len(await request.body())}
+
+    @app.get("/health")
+    async def health():
+        return {"status": "ok"}
+
+    @app.get("/staged")
+    async def staged():
+        with request_metrics.stage("embed"):
+            pass
+        with request_metrics.stage("llm"):
+            request_metrics.record(tokens_in=100, tokens_out=20)
+        request_metrics.record(tokens_in=5, retrieved_doc_ids=["a", "b"])
+        return {}
+
+    @app.get("/boom")
+    async def boom():
+        raise RuntimeError("boom")
+
+    app.add_middleware(RequestLoggingMiddleware, writer=writer, sample_rates=sample_rates or {})
+    return TestClient(app, raise_server_exceptions=False)
+
+
+def _queued(writer: RequestLogWriter) -> list[dict]:
+    return [writer.queue.get_nowait() for _ in range(writer.queue.qsize())]
+
+
+def test_logs_request_without_touching_the_body():
+    writer = RequestLogWriter()
+    client = _client(writer)
+    body = b"x" * 1_000_000
+    response = client.post("/upload", content=body, headers={"X-Request-Id": "abc123"})
+    assert response.json() == {"bytes": len(body)}  # the route still gets the whole body
+    assert response.headers["X-Request-ID"] == "abc123"
+
+    [record] = _queued(writer)
+    assert record["req_id"] == "abc123"
+    assert record["route"] == "upload"
+    assert record["status"] == 200
+    assert record["method"] == "POST"
+    assert "top_k" not in record
+
+
+def test_sampling_keeps_server_errors_and_generates_request_ids():
+    writer = RequestLogWriter()
+    client = _client(writer, sample_rates={"/health": 0, "/boom": 0})
+    assert client.get("/health").headers["X-Request-ID"]
+    assert client.get("/boom", params={"user_id": "u1"}).status_code == 500
+
+    [record] = _queued(writer)
+    assert record["route"] == "boom"
+    assert record["status"] == 500
+    assert record["user_id"] == "u1"
+
+
+def test_full_queue_drops_and_counts():
+    writer = RequestLogWriter(maxsize=1)
+    writer.submit({"n": 1})
+    writer.submit({"n": 2})
+    assert writer.dropped == 1
+    assert _queued(writer) == [{"n": 1}]
+
+
+def test_writer_thread_flushes_on_close():
+    lines = []
+    sink = logger.add(lambda message: lines.append(message.record["message"]))
+    try:
+        writer = RequestLogWriter()
+        writer.start()
+        for n in range(3):
+            writer.submit({"n": n})
+        writer.close()
+    finally:
+        logger.remove(sink)
+    assert lines == ['{"n": 0}', '{"n": 1}', '{"n": 2}']
+
+
+def test_stage_timings_go_to_server_timing_and_the_log():
+    writer = RequestLogWriter()
+    response = _client(writer).get("/staged")
+    names = [entry.split(";")[0] for entry in response.headers["Server-Timing"].split(", ")]
+    assert names == ["embed", "llm", "total"]
+
+    [record] = _queued(writer)
+    assert set(record["stages_ms"]) == {"embed", "llm"}
+    assert record["tokens_in"] == 105  # numbers add up across calls
+    assert record["tokens_out"] == 20
+    assert record["retrieved_doc_ids"] == ["a", "b"]
+
+
+def test_stage_and_record_are_no_ops_outside_a_request():
+    assert request_metrics.current() is None
+    with request_metrics.stage("embed"):
+        request_metrics.record(tokens_in=1)
+    assert request_metrics.current() is None
@@ -0,0 +1,23 @@
+import base64
+from datetime import UTC, datetime
+
+import pytest
+
+from app.services.storage import _escape_like, decode_cursor, encode_cursor
+
+
+def test_cursor_round_trips():
+    created_at = datetime(2025, 3, 2, 10, 30, 15, 123456, tzinfo=UTC)
+    assert decode_cursor(encode_cursor(created_at, "doc-1")) == (created_at, "doc-1")
+
+
+@pytest.mark.parametrize(
+    "cursor", ["not-a-cursor", base64.urlsafe_b64encode(b'["2025-03-02"]').decode()]
+)
+def test_invalid_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError):
+        decode_cursor(cursor)
+
+
+def test_like_wildcards_in_title_filter_are_literal():
+    assert _escape_like("10%_off\\") == "10\\%\\_off\\\\"
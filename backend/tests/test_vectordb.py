@@ -0,0 +1,80 @@
+from datetime import date
+
+import pytest
+
+from app.models import DateRange
+from app.services.vectordb import (
+    SearchResult,
+    VectorDBService,
+    ann_index_name,
+    compile_filters,
+    reciprocal_rank_fusion,
+)
+
+
+def _result(doc_id, chunk_idx=0):
+    return SearchResult(doc_id, chunk_idx, f"{doc_id}-{chunk_idx}", 0.0, {}, None)
+
+
+def test_rrf_favours_chunks_found_by_both_legs():
+    vector = [_result("a"), _result("b"), _result("c")]
+    lexical = [_result("c"), _result("d")]
+    fused = reciprocal_rank_fusion([vector, lexical], top_k=3)
+    assert [r.doc_id for r in fused] == ["c", "a", "b"]
+
+
+def test_rrf_keeps_single_leg_order_and_truncates():
+    vector = [_result("a", 0), _result("a", 1), _result("b", 0)]
+    fused = reciprocal_rank_fusion([vector, []], top_k=2)
+    assert [(r.doc_id, r.chunk_idx) for r in fused] == [("a", 0), ("a", 1)]
+
+
+def test_compile_filters_uses_containment_and_date_expressions():
+    filters = {
+        "ticker": "MSFT",
+        "sector": ["Tech", "Energy"],
+        "filed_at": DateRange(gte=date(2025, 1, 1), lt=date(2025, 7, 1)),
+    }
+    where, params = compile_filters(filters)
+    assert where.as_string(None) == (
+        "metadata @> %(filter_0)s AND (metadata @> %(filter_1)s OR metadata @> %(filter_2)s) "
+        "AND metadata->>'filed_at' >= %(filter_3)s AND metadata->>'filed_at' < %(filter_4)s"
+    )
+    assert params["filter_0"].obj == {"ticker": "MSFT"}
+    assert params["filter_2"].obj == {"sector": "Energy"}
+    assert (params["filter_3"], params["filter_4"]) == ("2025-01-01", "2025-07-01")
+
+
+def test_compile_filters_closes_date_bounds_on_whole_days():
+    where, params = compile_filters(
+        {"filed_at": DateRange(gt=date(2024, 1, 31), lte=date(2024, 3, 31))}
+    )
+    assert where.as_string(None) == (
+        "metadata->>'filed_at' >= %(filter_0)s AND metadata->>'filed_at' < %(filter_1)s"
+    )
+    assert params == {"filter_0": "2024-02-01", "filter_1": "2024-04-01"}
+    # A timestamp on the lte date sorts before the exclusive bound, as it should
+    assert "2024-03-31T10:00:00" < params["filter_1"] and "2024-01-31T23:59" < params["filter_0"]
+
+
+def test_compile_filters_without_filters_matches_everything():
+    where, params = compile_filters(None)
+    assert where.as_string(None) == "TRUE"
+    assert params == {}
+
+
+def test_quantized_indexes_are_expression_indexes_with_their_own_name():
+    ddl = VectorDBService(quantization="none")._index_ddl(
+        "hnsw", m=16, ef_construction=64, quantization="binary", concurrently=False
+    )
+    assert ddl.as_string(None) == (
+        'CREATE INDEX  IF NOT EXISTS "idx_documents_embedding_ann_binary" ON documents '
+        "USING hnsw ((binary_quantize(embedding)::bit(384)) bit_hamming_ops) "
+        "WITH (m = 16, ef_construction = 64)"
+    )
+    assert ann_index_name("none") == "idx_documents_embedding_ann"
+
+
+def test_unknown_quantization_is_rejected():
+    with pytest.raises(ValueError):
+        VectorDBService(quantization="int4")